@@ -0,0 +1,86 @@
+"""
+attachment_cache.py
+
+Cache de anexos já codificados em MIME: cada arquivo é lido (via mmap) e
+convertido para base64 uma única vez por campanha, e a mesma parte MIME é
+compartilhada por todas as mensagens.
+"""
+
+import base64
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from email.message import MIMEPart
+from typing import Optional, Tuple
+
+
+def build_attachment_part(path: str) -> MIMEPart:
+    """Lê o arquivo e monta a parte MIME equivalente a ``add_attachment`` (octet-stream, base64)."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            encoded = b""
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                encoded = base64.encodebytes(mm)
+
+    part = MIMEPart()
+    part['Content-Type'] = 'application/octet-stream'
+    part.add_header('Content-Disposition', 'attachment', filename=os.path.basename(path))
+    part['Content-Transfer-Encoding'] = 'base64'
+    part.set_payload(encoded.decode('ascii'))
+    return part
+
+
+class AttachmentCache:
+    """LRU limitado por bytes codificados, invalidado quando mtime/tamanho do arquivo mudam."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, Tuple[int, int, MIMEPart, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[MIMEPart]:
+        key = os.path.abspath(path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            self.invalidate(key)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                mtime_ns, size, part, _ = entry
+                if (mtime_ns, size) == (st.st_mtime_ns, st.st_size):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return part
+                logging.info("Anexo alterado durante a execução, recodificando: %s", path)
+                self.invalidations += 1
+                self._discard(key)
+            self.misses += 1
+
+            part = build_attachment_part(key)
+            encoded_size = len(part.get_payload())
+            # Arquivos maiores que o cache inteiro são codificados sem serem guardados
+            if encoded_size <= self.max_bytes:
+                self._entries[key] = (st.st_mtime_ns, st.st_size, part, encoded_size)
+                self.total_bytes += encoded_size
+                while self.total_bytes > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+            return part
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[3]
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            self._discard(os.path.abspath(path))
@@ -0,0 +1,352 @@
+"""
+benchmark.py
+
+Medições de desempenho do pipeline de envio.
+
+Uso:
+    python benchmark.py render --n 20000
+    python benchmark.py pipeline --tamanho 100k --workers 8 --saida resultados.json
+    python benchmark.py pipeline --tamanho 1k --template-build
+    python benchmark.py comparar antes.json depois.json
+    python benchmark.py json --mb 300
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, Optional
+
+from jinja2 import Environment, FileSystemLoader
+
+from contact_sources import iter_contacts
+from json_revisor import TAMANHO_BLOCO, reparar_fluxo
+from smtp_sink import SMTPSink
+from template_renderer import TemplateRenderer
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+BENCH_ACCOUNT = "bench@example.com"
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+
+def _rate(fn: Callable[[int], None], n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - start)
+
+
+def bench_render(template_file: str = "email_template.html", n: int = 20000) -> Dict[str, float]:
+    """Renderizações/s do caminho antigo (get_template a cada contato) versus o TemplateRenderer."""
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+
+    def antes(i: int) -> None:
+        env.get_template(template_file).render(nome=f"Contato {i}")
+
+    renderer = TemplateRenderer(TEMPLATE_DIR, template_file, fast_path=False)
+    rapido = TemplateRenderer(TEMPLATE_DIR, template_file)
+
+    return {
+        "antes": _rate(antes, n),
+        "template_em_cache": _rate(lambda i: renderer.render({"nome": f"Contato {i}"}), n),
+        "caminho_rapido": _rate(lambda i: rapido.render({"nome": f"Contato {i}"}), n),
+        "caminho_rapido_ativo": float(rapido.uses_fast_path),
+    }
+
+
+def generate_contacts(path: str, n: int) -> None:
+    """Grava ``n`` contatos sintéticos em NDJSON, um domínio a cada 100 contatos."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(n):
+            f.write(json.dumps({"name": f"Contato {i}", "email": f"contato{i}@dominio{i % 100}.com.br"}))
+            f.write("\n")
+
+
+def generate_media_json(path: str, mb: float) -> int:
+    """Grava um diretório de mídia no formato de contacts_midia.json com ~``mb`` MB e defeitos típicos.
+
+    Os defeitos (chaves sem aspas, vírgulas sobrando, NaN, aspas simples e
+    quebras de linha cruas em strings) aparecem a cada poucos registros.
+    """
+    alvo = int(mb * 1024 * 1024)
+    escritos = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n  "solicitacao": "Benchmark do revisor de JSON",\n  "estados": [\n')
+        i = 0
+        while escritos < alvo:
+            registros = []
+            for j in range(50):
+                k = i * 50 + j
+                contato = "NaN" if k % 7 == 0 else f'"(11) 9{k % 10000:04d}-0000"'
+                registro = (
+                    '        {\n'
+                    f'          "nome": "Portal {k}",\n'
+                    f'          cidade: "Cidade {k % 500}",\n'
+                    f"          \"url\": 'https://portal{k}.com.br/',\n"
+                    f'          "contato": {contato},\n'
+                    f'          "email": "redacao@portal{k}.com.br",\n'
+                    f'          "endereco": "Rua {k}\nCentro",\n'
+                    '        }'
+                )
+                registros.append(registro)
+            bloco = f'    {{\n      "estado": "Estado {i}",\n      "portais_de_noticias": [\n' \
+                    + ',\n'.join(registros) + ',\n      ]\n    },\n'
+            f.write(bloco)
+            escritos += len(bloco)
+            i += 1
+        f.write('  ]\n}\n')
+    return os.path.getsize(path)
+
+
+def bench_json_repair(mb: float = 200, arquivo: Optional[str] = None,
+                      tamanho_bloco: int = TAMANHO_BLOCO) -> Dict[str, Any]:
+    """MB/s e memória do reparador em blocos do json_revisor sobre um arquivo grande."""
+    with tempfile.TemporaryDirectory() as tmp:
+        if arquivo is None:
+            arquivo = os.path.join(tmp, "midia_defeituosa.json")
+            generate_media_json(arquivo, mb)
+        tamanho = os.path.getsize(arquivo)
+        rss_antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        start = time.perf_counter()
+        with open(arquivo, 'r', encoding='utf-8') as entrada, \
+                open(os.path.join(tmp, "reparado.json"), 'w', encoding='utf-8') as saida:
+            correcoes = reparar_fluxo(entrada, saida, tamanho_bloco)
+        elapsed = time.perf_counter() - start
+
+        return {
+            "commit": _git_commit(),
+            "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "arquivo_mb": round(tamanho / 1024 / 1024, 1),
+            "duracao_s": round(elapsed, 3),
+            "mb_por_segundo": round(tamanho / 1024 / 1024 / elapsed, 1) if elapsed else 0.0,
+            # Crescimento do pico de memória durante o reparo (ru_maxrss em KB no Linux)
+            "memoria_extra_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_antes) / 1024, 1),
+            "correcoes": correcoes,
+        }
+
+
+def _percentile(samples: array, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _StageTimer:
+    """Embrulha um método de instância somando o tempo gasto em cada chamada."""
+
+    def __init__(self, obj: Any, method: str, samples: Optional[array] = None) -> None:
+        self.total = 0.0
+        self.calls = 0
+        self.samples = samples
+        lock = threading.Lock()
+        original = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with lock:
+                    self.total += elapsed
+                    self.calls += 1
+                    if self.samples is not None:
+                        self.samples.append(elapsed)
+
+        setattr(obj, method, timed)
+
+    def report(self) -> Dict[str, float]:
+        return {
+            "chamadas": self.calls,
+            "total_s": round(self.total, 4),
+            "por_segundo": round(self.calls / self.total, 1) if self.total else 0.0,
+        }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_pipeline(
+    n: int,
+    workers: int = 1,
+    attachments: Optional[list] = None,
+    config_overrides: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Executa ``send_bulk_emails`` contra um SMTP local e mede cada estágio separadamente."""
+    from email_sender import EmailSender
+
+    with tempfile.TemporaryDirectory() as tmp, SMTPSink() as sink:
+        contacts_path = os.path.join(tmp, "contatos.ndjson")
+        generate_contacts(contacts_path, n)
+
+        config = {
+            "smtp_server": sink.address[0],
+            "smtp_port": sink.address[1],
+            "smtp_security": "none",
+            "subject": "Benchmark",
+            "template_file": "email_template.html",
+            "sleep_time": 0,
+            "check_deliverability": False,
+            "max_workers": workers,
+            "smtp_max_messages_per_session": 0,
+        }
+        config.update(config_overrides or {})
+        config_path = os.path.join(tmp, "config.json")
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+
+        # A conta falsa só existe durante a construção do EmailSender
+        previous_accounts = os.environ.get("EMAILS_JSON")
+        os.environ["EMAILS_JSON"] = json.dumps({BENCH_ACCOUNT: "senha"})
+        try:
+            sender = EmailSender(config_path=config_path, env_path=os.devnull, selected_email=BENCH_ACCOUNT)
+        finally:
+            if previous_accounts is None:
+                del os.environ["EMAILS_JSON"]
+            else:
+                os.environ["EMAILS_JSON"] = previous_accounts
+
+        # Estágio de leitura medido à parte, sem envio
+        start = time.perf_counter()
+        loaded = sum(1 for _ in iter_contacts(contacts_path))
+        load_s = time.perf_counter() - start
+
+        latencies = array('d')
+        timers = {
+            "validar": _StageTimer(sender.validation, "validate"),
+            "renderizar": _StageTimer(sender, "render_template"),
+            "montar_mime": _StageTimer(sender, "create_email"),
+            "smtp": _StageTimer(sender, "send_email"),
+        }
+        per_message = _StageTimer(sender, "_process_contact", latencies)
+
+        previous_level = logging.root.manager.disable
+        logging.disable(logging.INFO)
+        try:
+            start = time.perf_counter()
+            sender.send_bulk_emails(iter_contacts(contacts_path), attachments=attachments)
+            elapsed = time.perf_counter() - start
+        finally:
+            logging.disable(previous_level)
+
+        return {
+            "commit": _git_commit(),
+            "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "contatos": n,
+            "workers": workers,
+            "mensagens_recebidas": sink.messages,
+            "conexoes_smtp": sink.connections,
+            "duracao_s": round(elapsed, 3),
+            "msgs_por_segundo": round(sink.messages / elapsed, 1) if elapsed else 0.0,
+            "bytes_por_mensagem": round(sink.bytes_received / sink.messages) if sink.messages else 0,
+            "latencia_ms": {
+                "p50": round(_percentile(latencies, 0.50) * 1000, 3),
+                "p99": round(_percentile(latencies, 0.99) * 1000, 3),
+            },
+            # ru_maxrss é em KB no Linux
+            "pico_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "estagios": {
+                "carregar": {
+                    "chamadas": loaded,
+                    "total_s": round(load_s, 4),
+                    "por_segundo": round(loaded / load_s, 1) if load_s else 0.0,
+                },
+                **{name: timer.report() for name, timer in timers.items()},
+                "mensagem": per_message.report(),
+            },
+        }
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> None:
+    def delta(a: float, b: float) -> str:
+        return f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+
+    print(f"{'métrica':<28}{'antes':>14}{'depois':>14}{'variação':>12}")
+    rows = [
+        ("msgs/s", before["msgs_por_segundo"], after["msgs_por_segundo"]),
+        ("latência p50 (ms)", before["latencia_ms"]["p50"], after["latencia_ms"]["p50"]),
+        ("latência p99 (ms)", before["latencia_ms"]["p99"], after["latencia_ms"]["p99"]),
+        ("pico RSS (MB)", before["pico_rss_mb"], after["pico_rss_mb"]),
+    ]
+    # Resultados salvos antes desta métrica não têm o tamanho das mensagens
+    if "bytes_por_mensagem" in before and "bytes_por_mensagem" in after:
+        rows.append(("bytes por mensagem", before["bytes_por_mensagem"], after["bytes_por_mensagem"]))
+    for stage in before["estagios"]:
+        if stage in after["estagios"]:
+            rows.append((f"{stage} (chamadas/s)", before["estagios"][stage]["por_segundo"],
+                         after["estagios"][stage]["por_segundo"]))
+    for label, a, b in rows:
+        print(f"{label:<28}{a:>14,.1f}{b:>14,.1f}{delta(a, b):>12}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks do sistema de envio de e-mails.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    render = sub.add_parser("render", help="Renderizações de template por segundo")
+    render.add_argument("--template", default="email_template.html")
+    render.add_argument("--n", type=int, default=20000)
+
+    pipeline = sub.add_parser("pipeline", help="Pipeline completo contra um SMTP local")
+    pipeline.add_argument("--tamanho", choices=sorted(SIZES), default="1k")
+    pipeline.add_argument("--n", type=int, default=None, help="Número exato de contatos (sobrepõe --tamanho)")
+    pipeline.add_argument("--workers", type=int, default=1)
+    pipeline.add_argument("--anexo", action="append", dest="anexos")
+    pipeline.add_argument("--saida", help="Arquivo JSON para salvar o resultado")
+    pipeline.add_argument("--template-build", action="store_true",
+                          help="Ativa o build do template (CSS aplicado, HTML minificado e texto puro)")
+
+    reparo = sub.add_parser("json", help="Reparo em blocos do json_revisor em um arquivo grande")
+    reparo.add_argument("--mb", type=float, default=200, help="Tamanho do arquivo sintético em MB")
+    reparo.add_argument("--arquivo", help="Usa um arquivo existente em vez do sintético")
+    reparo.add_argument("--saida", help="Arquivo JSON para salvar o resultado")
+
+    comparar = sub.add_parser("comparar", help="Compara dois resultados salvos")
+    comparar.add_argument("antes")
+    comparar.add_argument("depois")
+
+    args = parser.parse_args()
+
+    if args.comando == "pipeline":
+        overrides = {"template_build": {"enabled": True}} if args.template_build else None
+        resultado = bench_pipeline(args.n or SIZES[args.tamanho], args.workers, args.anexos, overrides)
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        if args.saida:
+            with open(args.saida, 'w', encoding='utf-8') as f:
+                json.dump(resultado, f, indent=2, ensure_ascii=False)
+    elif args.comando == "json":
+        resultado = bench_json_repair(args.mb, args.arquivo)
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        if args.saida:
+            with open(args.saida, 'w', encoding='utf-8') as f:
+                json.dump(resultado, f, indent=2, ensure_ascii=False)
+    elif args.comando == "comparar":
+        with open(args.antes, encoding='utf-8') as fa, open(args.depois, encoding='utf-8') as fb:
+            compare(json.load(fa), json.load(fb))
+    elif args.comando == "render":
+        resultado = bench_render(args.template, args.n)
+        print(f"Template: {args.template} ({args.n} renderizações)")
+        print(f"  antes (get_template por contato): {resultado['antes']:>12,.0f} renders/s")
+        print(f"  template compilado em cache:      {resultado['template_em_cache']:>12,.0f} renders/s")
+        print(f"  caminho rápido prefixo/sufixo:    {resultado['caminho_rapido']:>12,.0f} renders/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+contact_sources.py
+
+Leitura preguiçosa de listas de contatos: array JSON (parse incremental, no
+estilo do ijson), NDJSON e CSV. Os contatos são entregues um a um para
+``EmailSender.send_bulk_emails``, com memória constante e sem esperar o fim do
+parse para começar a enviar.
+
+Também achata diretórios de mídia aninhados (``contacts_midia.json``, as
+saídas ``crypto_media_<pais>.json`` do ``gemini_media.py`` e o arquivo mestre
+``.jsonl`` do ``media_extractor``) em contatos ``{name, email}`` sem duplicatas.
+"""
+
+import csv
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+CHUNK_SIZE = 64 * 1024
+# Um contato nunca chega perto disso; acima do limite o item é tratado como malformado
+MAX_ITEM_SIZE = 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(path: str, chunk_size: int = CHUNK_SIZE, max_item_size: int = MAX_ITEM_SIZE) -> Iterator[Dict]:
+    """Percorre os itens de um array JSON no topo do arquivo, lendo em blocos.
+
+    Um item que não fecha em ``max_item_size`` caracteres levanta ``ValueError``
+    com a posição onde começa, em vez de acumular o resto do arquivo no buffer.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        pos = 0
+        offset = 0  # caracteres do arquivo já descartados antes do buffer
+        eof = False
+        started = False
+
+        def fill() -> bool:
+            nonlocal buffer, pos, offset, eof
+            if len(buffer) - pos > max_item_size:
+                raise ValueError(
+                    f"Item maior que {max_item_size} caracteres (ou malformado) na posição {offset + pos} de '{path}'."
+                )
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            offset += pos
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buffer):
+                if eof or not fill():
+                    raise ValueError(f"Array JSON incompleto em '{path}'.")
+                continue
+
+            char = buffer[pos]
+            if not started:
+                if char != '[':
+                    raise ValueError(f"O arquivo '{path}' não contém um array JSON no topo.")
+                started = True
+                pos += 1
+                expect_value = True
+                continue
+            if char == ']':
+                return
+            if not expect_value:
+                if char != ',':
+                    raise ValueError(f"Vírgula esperada na posição {offset + pos} de '{path}'.")
+                pos += 1
+                expect_value = True
+                continue
+
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof or not fill():
+                    raise
+                continue
+            # Um valor que termina exatamente no fim do buffer pode estar cortado (ex.: números)
+            if end == len(buffer) and not eof:
+                fill()
+                continue
+            pos = end
+            expect_value = False
+            yield item
+
+
+def iter_ndjson(path: str) -> Iterator[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                logging.warning("Linha %s inválida em '%s': %s", line_number, path, e)
+
+
+def iter_csv(path: str) -> Iterator[Dict]:
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            # Aceita cabeçalhos em português ou inglês
+            yield {
+                'name': (row.get('name') or row.get('nome') or '').strip(),
+                'email': (row.get('email') or '').strip(),
+            }
+
+
+def iter_contacts(path: str) -> Iterator[Dict]:
+    """Escolhe o leitor pela extensão: .json, .ndjson/.jsonl ou .csv."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ndjson', '.jsonl'):
+        return iter_ndjson(path)
+    if extension == '.csv':
+        return iter_csv(path)
+    return iter_json_array(path)
+
+
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+
+
+def extract_emails(value: Any) -> Iterator[str]:
+    """Extrai endereços de um campo livre ("a@x.com, b@y.com (Redação)");
+    textos como "Não disponível publicamente" não produzem nada."""
+    if isinstance(value, list):
+        for item in value:
+            yield from extract_emails(item)
+    elif isinstance(value, str):
+        yield from EMAIL_PATTERN.findall(value)
+
+
+def _walk_media(node: Any, info: Dict[str, str]) -> Iterator[Dict[str, Any]]:
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk_media(item, info)
+        return
+    if not isinstance(node, dict):
+        return
+    if 'nome' in node and 'email' in node:
+        yield dict(info, **node)
+        return
+
+    # Campos escalares como "estado" e "pais" acompanham os registros abaixo deles
+    scope = dict(info)
+    for key, value in node.items():
+        if isinstance(value, str):
+            scope[key] = value
+    for key, value in node.items():
+        if isinstance(value, (list, dict)):
+            yield from _walk_media(value, dict(scope, categoria=key))
+
+
+def _iter_media_records(path: str) -> Iterator[Dict[str, Any]]:
+    if os.path.splitext(path)[1].lower() in ('.ndjson', '.jsonl'):
+        if os.path.exists(f"{path}.indice.json"):
+            # Mestre do media_extractor: só a versão atual de cada registro, não as anteriores
+            from media_extractor import MasterMidia
+            items: Iterable[Any] = MasterMidia(path)
+        else:
+            items = iter_ndjson(path)
+        for item in items:
+            yield from _walk_media(item, {})
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    yield from _walk_media(data, {})
+
+
+class MediaContactIndex:
+    """Índice case-folded dos e-mails já entregues, compartilhado entre arquivos."""
+
+    def __init__(self) -> None:
+        self.seen: Set[str] = set()
+        self.records = 0
+        self.duplicates = 0
+        self.without_email = 0
+
+    def add(self, email: str) -> bool:
+        key = email.casefold()
+        if key in self.seen:
+            self.duplicates += 1
+            return False
+        self.seen.add(key)
+        return True
+
+
+def iter_media_contacts(
+    paths: Iterable[str],
+    index: Optional[MediaContactIndex] = None
+) -> Iterator[Dict[str, Any]]:
+    """Achata diretórios de mídia aninhados em contatos ``{name, email, ...}`` sem repetir e-mails."""
+    index = index or MediaContactIndex()
+    for path in paths:
+        for record in _iter_media_records(path):
+            index.records += 1
+            emails = list(extract_emails(record.get('email')))
+            if not emails:
+                index.without_email += 1
+                continue
+            for email in emails:
+                if not index.add(email):
+                    continue
+                contact = {k: v for k, v in record.items() if k not in ('nome', 'email') and not k.startswith('_')}
+                contact['name'] = record['nome']
+                contact['email'] = email
+                yield contact
+
+    logging.info(
+        "Diretório de mídia: %s registros, %s e-mails únicos, %s duplicados e %s sem e-mail utilizável ignorados.",
+        index.records, len(index.seen), index.duplicates, index.without_email
+    )
@@ -1,25 +1,91 @@
+import argparse
+import functools
+import itertools
 import smtplib
-import ssl
 import json
-import time
 import os
-from typing import List, Dict, Optional
+import sys
+import threading
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Iterable, Iterator, List, Dict, Optional, Set, Tuple
 from email.message import EmailMessage
-from jinja2 import Environment, FileSystemLoader, TemplateNotFound
-from tenacity import retry, stop_after_attempt, wait_fixed
+from jinja2 import TemplateNotFound
 from dotenv import load_dotenv
 import logging
-from email_validator import validate_email, EmailNotValidError
-
-# Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("email_sender.log"),
-        logging.StreamHandler()
-    ]
-)
+from smtp_pool import SMTPSessionPool, connect_smtp
+from rate_limiter import RateLimiter
+from template_renderer import TemplateRenderer
+from attachment_cache import AttachmentCache
+from contact_sources import iter_contacts, iter_media_contacts
+from validation import EmailValidationStage
+from send_journal import SendJournal, QUEUED, SENT, FAILED
+from retry_queue import RetryScheduler, classify_smtp_error, TRANSIENT
+from metrics import Metrics, MetricsReporter, NullMetrics
+from logging_setup import EventLog, configurar_logging
+
+# Respostas SMTP que indicam limitação ou bloqueio da conta remetente
+ACCOUNT_THROTTLE_CODES = {421, 450, 451, 452, 454, 535}
+
+
+def is_account_throttled(error: BaseException) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPAuthenticationError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code in ACCOUNT_THROTTLE_CODES
+    # Falhas de conexão também tiram a conta de circulação temporariamente
+    return isinstance(error, (smtplib.SMTPServerDisconnected, OSError))
+
+
+class SenderAccount:
+    """Conta remetente com limitador, sessão SMTP e cota diária próprios."""
+
+    def __init__(
+        self,
+        user: str,
+        password: str,
+        rate_limiter: RateLimiter,
+        daily_quota: Optional[int] = None,
+        sent_today: int = 0
+    ) -> None:
+        self.user = user
+        self.password = password
+        self.rate_limiter = rate_limiter
+        self.daily_quota = daily_quota
+        self.sent_today = sent_today
+        self.pool: Optional[SMTPSessionPool] = None
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def try_reserve(self, count: bool = True) -> bool:
+        """Reserva uma mensagem da cota, se a conta não estiver bloqueada nem esgotada.
+
+        Com ``count=False`` (dry run) só verifica, sem gastar a cota.
+        """
+        with self._lock:
+            if self.is_blocked:
+                return False
+            if self.daily_quota is not None and self.sent_today >= self.daily_quota:
+                return False
+            if count:
+                self.sent_today += 1
+            return True
+
+    @property
+    def is_blocked(self) -> bool:
+        return time.monotonic() < self.blocked_until
+
+    def release(self) -> None:
+        with self._lock:
+            self.sent_today -= 1
+
+    def block(self, seconds: float) -> None:
+        with self._lock:
+            self.blocked_until = time.monotonic() + seconds
+
 
 class EmailSender:
     def __init__(
@@ -27,7 +93,8 @@ class EmailSender:
         config_path: str = "config.json",
         env_path: str = ".env",
         dry_run: bool = False,
-        selected_email: Optional[str] = None
+        selected_email: Optional[str] = None,
+        shard_accounts: bool = False
     ) -> None:
         # Carrega configurações gerais
         self.config = self._load_config(config_path)
@@ -41,11 +108,26 @@ class EmailSender:
         try:
             email_options: Dict[str, str] = json.loads(emails_raw)
         except json.JSONDecodeError as e:
-            logging.error(f"Erro ao interpretar EMAILS_JSON como JSON: {e}")
+            logging.error("Erro ao interpretar EMAILS_JSON como JSON: %s", e)
             raise
 
+        # No modo de fatiamento todas as contas enviam, sem seleção interativa
+        shard_accounts = shard_accounts or self.config.get('shard_accounts', False)
+        if shard_accounts:
+            if not email_options:
+                raise ValueError("EMAILS_JSON não contém nenhuma conta.")
+            selected_email = selected_email or next(iter(email_options))
+            if selected_email not in email_options:
+                logging.error("O e-mail selecionado '%s' não está presente nas opções.", selected_email)
+                raise ValueError("E-mail selecionado inválido.")
+        # Com uma única conta, ou fora de um terminal, não há o que perguntar
+        elif not selected_email and len(email_options) == 1:
+            selected_email = next(iter(email_options))
+        elif not selected_email and not sys.stdin.isatty():
+            logging.error("Várias contas em EMAILS_JSON e nenhuma selecionada em modo não interativo.")
+            raise ValueError("Informe selected_email ou use shard_accounts=True.")
         # Seleção interativa de conta, caso não seja fornecida como argumento
-        if not selected_email:
+        elif not selected_email:
             print("\n📧 Contas de e-mail disponíveis para envio:")
             for i, email in enumerate(email_options.keys(), start=1):
                 print(f"{i}. {email}")
@@ -56,7 +138,7 @@ class EmailSender:
                 logging.error("Escolha inválida para o e-mail.")
                 raise ValueError("Escolha inválida.")
         elif selected_email not in email_options:
-            logging.error(f"O e-mail selecionado '{selected_email}' não está presente nas opções.")
+            logging.error("O e-mail selecionado '%s' não está presente nas opções.", selected_email)
             raise ValueError("E-mail selecionado inválido.")
 
         # Define credenciais e parâmetros
@@ -64,149 +146,590 @@ class EmailSender:
         self.email_password: str = email_options[self.email_user]
         self.smtp_server: str = self.config.get('smtp_server')
         self.smtp_port: int = self.config.get('smtp_port')
+        self.smtp_security: str = self.config.get('smtp_security', 'ssl')
+        self.smtp_timeout: float = self.config.get('smtp_timeout', 30)
+        self.max_workers: int = max(1, self.config.get('max_workers', 1))
+        self.smtp_pool_size: int = self.config.get('smtp_pool_size', self.max_workers)
+        self.smtp_max_messages_per_session: int = self.config.get('smtp_max_messages_per_session', 100)
         self.subject: str = self.config.get('subject')
         self.template_file: str = self.config.get('template_file')
         self.sleep_time: int = self.config.get('sleep_time', 1)
+        self.account_cooldown: float = self.config.get('account_cooldown', 300)
+        self.quota_state_file: Optional[str] = self.config.get('quota_state_file')
+        account_users = list(email_options) if shard_accounts else [self.email_user]
+        # A conta selecionada é sempre a primeira do rodízio
+        account_users.sort(key=lambda user: user != self.email_user)
+        sent_today = self._load_quota_state()
+        self.accounts: List[SenderAccount] = [
+            SenderAccount(
+                user,
+                email_options[user],
+                self._create_rate_limiter(user),
+                self._account_setting(user, 'daily_quota'),
+                sent_today.get(user, 0)
+            )
+            for user in account_users
+        ]
+        self._accounts_by_user: Dict[str, SenderAccount] = {a.user: a for a in self.accounts}
+        self.rate_limiter: RateLimiter = self.accounts[0].rate_limiter
         self.default_body: str = self.config.get(
             'default_body',
             'Confira nossa oferta exclusiva!'
         )
         self.dry_run: bool = dry_run
+        # Métricas desativadas por padrão: NullMetrics não custa nada no caminho quente
+        self.metrics_config: Dict = self.config.get('metrics', {})
+        self.metrics = Metrics() if self.metrics_config.get('enabled') else NullMetrics()
+        self._journal: Optional[SendJournal] = None
+        # Log JSON lines por destinatário, opcional
+        self.event_log_file: Optional[str] = self.config.get('event_log_file')
+        self._event_log: Optional[EventLog] = None
+        self._skipped_count = 0
+        self.retry_scheduler: Optional[RetryScheduler] = None
+        self._retry_lock = threading.Lock()
+        self._retry_outcomes = [0, 0]
+        self.validation = EmailValidationStage(
+            check_deliverability=self.config.get('check_deliverability', True),
+            workers=self.config.get('validation_workers', 8),
+            domain_ttl=self.config.get('dns_cache_ttl', 3600),
+            cache_path=self.config.get('validation_cache_path')
+        )
+        self.attachment_cache = AttachmentCache(
+            self.config.get('attachment_cache_max_bytes', 64 * 1024 * 1024)
+        )
 
         if self.dry_run:
             logging.info("Modo Dry Run ativado - Nenhum e-mail será enviado.")
 
         
-        # Caminho absoluto para templates HTML
+        # Caminho absoluto para templates HTML; o template é compilado uma vez por execução
         template_dir = os.path.join(os.path.dirname(__file__), "templates")
-        self.env = Environment(loader=FileSystemLoader(template_dir))
-        
+        # Build opcional: CSS nos elementos, HTML minificado e texto puro gerado do HTML
+        build_config: Dict = self.config.get('template_build', {})
+        self.renderer = TemplateRenderer(
+            template_dir,
+            self.template_file,
+            bytecode_cache_dir=self.config.get('template_bytecode_cache'),
+            fast_path=self.config.get('template_fast_path', True),
+            build=build_config.get('enabled', False),
+            build_cache_dir=build_config.get('cache_dir'),
+            inline_css=build_config.get('inline_css', True),
+            minify=build_config.get('minify', True),
+            plain_text=build_config.get('plain_text', True)
+        )
+        self.env = self.renderer.env
 
     def _load_config(self, path: str) -> Dict:
         try:
             with open(path, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except (FileNotFoundError, json.JSONDecodeError) as e:
-            logging.error(f"Erro ao carregar configuração: {e}")
+            logging.error("Erro ao carregar configuração: %s", e)
             raise
 
-    def validate_email_address(self, email: str) -> bool:
+    def _account_setting(self, user: str, key: str):
+        # Limites por conta em "account_limits" sobrepõem os valores globais
+        overrides: Dict = self.config.get('account_limits', {}).get(user, {})
+        return overrides.get(key, self.config.get(key))
+
+    def _create_rate_limiter(self, user: str) -> RateLimiter:
+        per_second: Optional[float] = self._account_setting(user, 'rate_per_second')
+        per_hour: Optional[int] = self._account_setting(user, 'rate_per_hour')
+        burst: Optional[float] = self._account_setting(user, 'rate_burst')
+        # Sem limites explícitos, o antigo sleep_time vira uma taxa equivalente
+        if per_second is None and per_hour is None and self.sleep_time:
+            per_second, burst = 1.0 / self.sleep_time, 1.0
+        return RateLimiter(per_second=per_second, per_hour=per_hour, burst=burst)
+
+    def _load_quota_state(self) -> Dict[str, int]:
+        if not self.quota_state_file or not os.path.exists(self.quota_state_file):
+            return {}
         try:
-            validate_email(email)
-            return True
-        except EmailNotValidError as e:
-            logging.warning(f"Email inválido: {email} - {e}")
-            return False
+            with open(self.quota_state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning("Não foi possível ler o estado das cotas diárias: %s", e)
+            return {}
+        return state.get(date.today().isoformat(), {})
+
+    def _save_quota_state(self) -> None:
+        # Um ensaio (dry run) não consome a cota real do dia
+        if not self.quota_state_file or self.dry_run:
+            return
+        state = {date.today().isoformat(): {a.user: a.sent_today for a in self.accounts}}
+        try:
+            with open(self.quota_state_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2)
+        except OSError as e:
+            logging.warning("Não foi possível salvar o estado das cotas diárias: %s", e)
+
+    def validate_email_address(self, email: str) -> bool:
+        ok, reason = self.validation.validate(email)
+        if not ok:
+            logging.warning("Email inválido: %s - %s", email, reason)
+        return ok
 
     def render_template(self, context: Dict[str, str]) -> str:
         try:
-            template = self.env.get_template(self.template_file)
-            return template.render(**context)
-        except TemplateNotFound as e:
-            logging.error(f"Template '{self.template_file}' não encontrado no diretório de templates.")
+            with self.metrics.timer('render_seconds'):
+                return self.renderer.render(context)
+        except TemplateNotFound:
+            logging.error("Template '%s' não encontrado no diretório de templates.", self.template_file)
             raise
 
+    def render_text(self, context: Dict[str, str]) -> Optional[str]:
+        if not (self.renderer.build and self.renderer.plain_text):
+            return None
+        with self.metrics.timer('render_seconds'):
+            return self.renderer.render_text(context)
+
     def create_email(
         self,
         recipient: str,
         name: str,
         body_html: str,
-        attachments: Optional[List[str]] = None
+        attachments: Optional[List[str]] = None,
+        sender: Optional[str] = None,
+        body_text: Optional[str] = None
+    ) -> EmailMessage:
+        with self.metrics.timer('mime_build_seconds'):
+            return self._build_message(recipient, name, body_html, attachments, sender, body_text)
+
+    def _build_message(
+        self,
+        recipient: str,
+        name: str,
+        body_html: str,
+        attachments: Optional[List[str]],
+        sender: Optional[str],
+        body_text: Optional[str] = None
     ) -> EmailMessage:
         msg = EmailMessage()
         msg['Subject'] = self.subject
-        msg['From'] = self.email_user
+        msg['From'] = sender or self.email_user
         msg['To'] = recipient
-        msg.set_content(f"Olá {name},\n\n{self.default_body}")
+        # Sem o texto gerado pelo build do template, usa a mensagem curta padrão
+        msg.set_content(body_text if body_text is not None else f"Olá {name},\n\n{self.default_body}")
         msg.add_alternative(body_html, subtype='html')
 
         if attachments:
             for file_path in attachments:
-                if not os.path.exists(file_path):
-                    logging.warning(f"Anexo não encontrado: {file_path}")
+                # Parte MIME lida e codificada uma vez, compartilhada entre as mensagens
+                part = self.attachment_cache.get(file_path)
+                if part is None:
+                    logging.warning("Anexo não encontrado: %s", file_path)
                     continue
-                with open(file_path, 'rb') as f:
-                    file_data = f.read()
-                    file_name = os.path.basename(file_path)
-                    msg.add_attachment(
-                        file_data,
-                        maintype='application',
-                        subtype='octet-stream',
-                        filename=file_name
-                    )
+                if msg.get_content_subtype() != 'mixed':
+                    msg.make_mixed()
+                msg.attach(part)
         return msg
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
     def send_email(self, msg: EmailMessage) -> None:
         if self.dry_run:
-            logging.info(f"[Dry Run] Simulação de envio para: {msg['To']}")
+            logging.info("[Dry Run] Simulação de envio para: %s", msg['To'])
             return
 
-        context = ssl.create_default_context()
+        account = self._accounts_by_user.get(msg['From'], self.accounts[0])
         try:
-            with smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, context=context) as server:
-                server.login(self.email_user, self.email_password)
-                server.send_message(msg)
-                logging.info(f"E-mail enviado para {msg['To']}")
+            if account.pool is not None:
+                account.pool.send_message(msg)
+            else:
+                with self.metrics.timer('smtp_connect_seconds'):
+                    server = connect_smtp(self.smtp_server, self.smtp_port, self.smtp_security, self.smtp_timeout)
+                with server:
+                    with self.metrics.timer('smtp_login_seconds'):
+                        server.login(account.user, account.password)
+                    with self.metrics.timer('smtp_send_seconds'):
+                        server.send_message(msg)
+            logging.info("E-mail enviado para %s", msg['To'])
         except smtplib.SMTPException as e:
-            logging.error(f"Erro SMTP ao enviar e-mail para {msg['To']}: {e}")
+            logging.error("Erro SMTP ao enviar e-mail para %s: %s", msg['To'], e)
             raise
 
+    def create_session_pool(self, account: SenderAccount) -> SMTPSessionPool:
+        return SMTPSessionPool(
+            self.smtp_server,
+            self.smtp_port,
+            account.user,
+            account.password,
+            size=self.smtp_pool_size,
+            max_messages_per_session=self.smtp_max_messages_per_session,
+            security=self.smtp_security,
+            timeout=self.smtp_timeout,
+            metrics=self.metrics
+        )
+
     def send_bulk_emails(
         self,
-        contacts: List[Dict[str, str]],
-        attachments: Optional[List[str]] = None
+        contacts: Iterable[Dict[str, str]],
+        attachments: Optional[List[str]] = None,
+        journal: Optional[SendJournal] = None,
+        resume: bool = False,
+        total: Optional[int] = None
     ) -> None:
-        success_count = 0
-        fail_count = 0
+        skipped_count = 0
+        if total is None and hasattr(contacts, '__len__'):
+            total = len(contacts)
+        if journal is not None:
+            self._journal = journal
+            if resume:
+                completed = journal.load_completed()
+                logging.info("Retomando a campanha '%s': %s destinatários já concluídos.", journal.campaign, completed)
+            contacts = self._journaled(contacts, journal, resume)
 
         if attachments:
             valid_attachments = [f for f in attachments if os.path.exists(f)]
             invalid_attachments = [f for f in attachments if not os.path.exists(f)]
             for f in invalid_attachments:
-                logging.warning(f"Arquivo de anexo não encontrado e será ignorado: {f}")
+                logging.warning("Arquivo de anexo não encontrado e será ignorado: %s", f)
             attachments = valid_attachments
 
-        for contact in contacts:
-            name: Optional[str] = contact.get('name')
-            email: Optional[str] = contact.get('email')
-            if not name or not email:
-                logging.warning(f"Contato malformado: {contact}")
-                fail_count += 1
-                continue
-            if not self.validate_email_address(email):
-                fail_count += 1
+        self.open_sessions()
+        reporter = self.start_metrics_reporter(total)
+        try:
+            # A validação corre à frente do envio, em paralelo
+            success_count, fail_count = self._send_all(self.validation.run(contacts), attachments)
+            self.retry_scheduler.drain()
+            self.metrics.set_gauge('retry_queue_depth', self.retry_scheduler.pending())
+            success_count += self._retry_outcomes[0]
+            fail_count += self._retry_outcomes[1]
+        finally:
+            if reporter is not None:
+                reporter.stop()
+                logging.info(reporter.progress_line())
+            self.close_sessions()
+            if journal is not None:
+                skipped_count = self._skipped_count
+                self._journal = None
+                journal.flush()
+
+        logging.info("\nResumo do envio: %s enviados com sucesso, %s falharam.", success_count, fail_count)
+        if skipped_count:
+            logging.info("%s destinatários já concluídos foram pulados.", skipped_count)
+
+    def open_sessions(self) -> None:
+        """Abre o que fica quente entre envios: sessões SMTP, fila de reenvio e log de eventos."""
+        # Sessões SMTP mantidas abertas durante toda a campanha, uma por conta
+        if not self.dry_run:
+            for account in self.accounts:
+                account.pool = self.create_session_pool(account)
+        # Falhas temporárias vão para uma fila de reenvio adiado com backoff
+        self.retry_scheduler = RetryScheduler(
+            max_attempts=self.config.get('retry_max_attempts', 3),
+            base_delay=self.config.get('retry_base_delay', 2),
+            max_delay=self.config.get('retry_max_delay', 300)
+        )
+        self._retry_outcomes = [0, 0]
+        if self.event_log_file:
+            self._event_log = EventLog(self.event_log_file)
+
+    def close_sessions(self) -> None:
+        scheduler = self.retry_scheduler
+        if scheduler is not None:
+            self.retry_scheduler = None
+            scheduler.close()
+            logging.info(
+                "Reenvios: %s agendados, %s recuperados, %s esgotados, %s falhas permanentes sem reenvio, %.1fs de backoff acumulado.",
+                scheduler.scheduled, scheduler.recovered, scheduler.exhausted, scheduler.permanent, scheduler.total_delay
+            )
+        self.validation.save()
+        logging.info(
+            "Validação: %s endereços validados, %s vindos do cache, %s consultas DNS de domínio.",
+            self.validation.validated, self.validation.address_hits, self.validation.domains.lookups
+        )
+        for account in self.accounts:
+            pool = account.pool
+            if pool is None:
                 continue
+            account.pool = None
+            pool.close()
+            logging.info(
+                "Sessões SMTP de %s: %s conexões abertas, %s reconexões, %s rotações, %s handshakes economizados.",
+                account.user, pool.connections_opened, pool.reconnects, pool.rotations, pool.handshakes_saved
+            )
+        self._save_quota_state()
+        if self._event_log is not None:
+            event_log, self._event_log = self._event_log, None
+            event_log.close()
+
+    def set_journal(self, journal: Optional[SendJournal]) -> None:
+        """Define o diário que recebe o estado de cada destinatário em ``process_contact`` (None desliga)."""
+        self._journal = journal
+
+    def start_metrics_reporter(self, total: Optional[int]) -> Optional[MetricsReporter]:
+        """Inicia a exposição de métricas configurada; devolve None se estiver desativada."""
+        if not self.metrics.enabled:
+            return None
+        try:
+            return MetricsReporter(
+                self.metrics,
+                prometheus_port=self.metrics_config.get('prometheus_port'),
+                stats_file=self.metrics_config.get('stats_file'),
+                interval=self.metrics_config.get('interval', 10),
+                total=total
+            ).start()
+        except OSError as e:
+            logging.warning("Não foi possível iniciar a exposição de métricas: %s", e)
+            return None
+
+    def _count_outcome(self, outcome: Optional[bool]) -> None:
+        if outcome:
+            self.metrics.inc('messages_sent_total')
+        elif outcome is False:
+            self.metrics.inc('messages_failed_total')
+
+    def _journaled(
+        self,
+        contacts: Iterable[Dict[str, str]],
+        journal: SendJournal,
+        resume: bool
+    ) -> Iterator[Dict[str, str]]:
+        self._skipped_count = 0
+        for contact in contacts:
+            email = contact.get('email')
+            if email:
+                if resume and journal.is_completed(email):
+                    self._skipped_count += 1
+                    continue
+                journal.record(email, QUEUED)
+            yield contact
+
+    def _record(
+        self,
+        email: str,
+        state: str,
+        reason: Optional[str] = None,
+        attempted: Optional[bool] = None,
+        account: Optional[str] = None,
+        attempt: Optional[int] = None
+    ) -> None:
+        if self._journal is not None:
+            self._journal.record(email, state, reason, attempted)
+        if self._event_log is not None:
+            self._event_log.emit(state, email=email, account=account, attempt=attempt, reason=reason)
+
+    def process_contact(
+        self,
+        contact: Dict[str, str],
+        attachments: Optional[List[str]] = None,
+        shard: int = 0
+    ) -> Optional[bool]:
+        """Valida e envia um único contato com as sessões já abertas por ``open_sessions``."""
+        email = contact.get('email')
+        valid = bool(email) and self.validate_email_address(email)
+        outcome = self._process_contact(contact, valid, attachments, shard)
+        self._count_outcome(outcome)
+        return outcome
+
+    def _process_contact(
+        self,
+        contact: Dict[str, str],
+        valid: bool,
+        attachments: Optional[List[str]],
+        shard: int = 0
+    ) -> Optional[bool]:
+        name: Optional[str] = contact.get('name')
+        email: Optional[str] = contact.get('email')
+        if not name or not email:
+            logging.warning("Contato malformado: %s", contact)
+            # Com e-mail, o contato já entrou no diário como QUEUED e precisa ser encerrado
+            if email:
+                self._record(email, FAILED, "contato malformado")
+            return False
+        if not valid:
+            self._record(email, FAILED, "endereço inválido")
+            return False
+
+        context = {'name': name}
+        try:
+            body_html = self.render_template(context)
+            body_text = self.render_text(context)
+        except Exception as e:
+            logging.error("Erro ao processar %s: %s", email, e, exc_info=True)
+            self._record(email, FAILED, str(e))
+            return False
 
-            context = {'name': name}
+        return self._deliver(email, name, body_html, attachments, shard, attempt=1, body_text=body_text)
+
+    def _deliver(
+        self,
+        email: str,
+        name: str,
+        body_html: str,
+        attachments: Optional[List[str]],
+        shard: int,
+        attempt: int,
+        body_text: Optional[str] = None
+    ) -> Optional[bool]:
+        """Tenta enviar; devolve True (enviado), False (falha definitiva) ou None (reenvio agendado)."""
+        # Cada contato tem uma conta preferida; as demais servem de failover
+        n = len(self.accounts)
+        last_error: Optional[Exception] = None
+        last_account: Optional[str] = None
+        for account in (self.accounts[(shard + i) % n] for i in range(n)):
+            if not account.try_reserve(count=not self.dry_run):
+                continue
             try:
-                body_html = self.render_template(context)
-                msg = self.create_email(email, name, body_html, attachments)
+                msg = self.create_email(email, name, body_html, attachments, sender=account.user, body_text=body_text)
+                waited = account.rate_limiter.acquire()
+                if waited:
+                    self.metrics.inc('rate_limit_wait_seconds_total', waited)
                 self.send_email(msg)
-                success_count += 1
+                self._record(email, SENT, account=account.user, attempt=attempt)
+                if attempt > 1:
+                    self.retry_scheduler.note_recovered()
+                return True
             except Exception as e:
-                logging.error(f"Erro ao processar {email}: {e}", exc_info=True)
-                fail_count += 1
+                if not self.dry_run:
+                    account.release()
+                last_error = e
+                last_account = account.user
+                if n > 1 and is_account_throttled(e):
+                    logging.warning(
+                        "Conta %s limitada ou bloqueada (%s); pausando por %ss e redirecionando %s.",
+                        account.user, e, self.account_cooldown, email
+                    )
+                    account.block(self.account_cooldown)
+                    continue
+                break
+
+        if last_error is None:
+            # Contas em pausa voltam a enviar depois do cooldown; cota esgotada não
+            reason = "nenhuma conta disponível (cota esgotada ou bloqueada)"
+            transient = any(account.is_blocked for account in self.accounts)
+        else:
+            reason = str(last_error)
+            transient = classify_smtp_error(last_error) == TRANSIENT or is_account_throttled(last_error)
+
+        if transient:
+            retry = functools.partial(
+                self._retry, email, name, body_html, attachments, shard, attempt + 1, body_text
+            )
+            if self.retry_scheduler is not None and self.retry_scheduler.schedule(retry, attempt):
+                self.metrics.inc('retries_scheduled_total')
+                self.metrics.set_gauge('retry_queue_depth', self.retry_scheduler.pending())
+                logging.warning(
+                    "Falha temporária ao enviar para %s (tentativa %s): %s; reenvio agendado.",
+                    email, attempt, reason
+                )
+                self._record(email, QUEUED, reason, attempted=True, account=last_account, attempt=attempt)
+                return None
+        elif self.retry_scheduler is not None:
+            self.retry_scheduler.note_permanent()
+
+        # Traceback só para erros inesperados; recusas SMTP e falhas de rede já dizem tudo na mensagem
+        expected = isinstance(last_error, (smtplib.SMTPException, OSError))
+        logging.error("Erro ao processar %s: %s", email, reason, exc_info=None if expected else last_error)
+        self._record(email, FAILED, reason, account=last_account, attempt=attempt)
+        return False
+
+    def _retry(
+        self,
+        email: str,
+        name: str,
+        body_html: str,
+        attachments: Optional[List[str]],
+        shard: int,
+        attempt: int,
+        body_text: Optional[str] = None
+    ) -> None:
+        outcome = self._deliver(email, name, body_html, attachments, shard, attempt, body_text)
+        self._count_outcome(outcome)
+        scheduler = self.retry_scheduler
+        if scheduler is not None:
+            # Esta tentativa ainda conta como em andamento no agendador
+            self.metrics.set_gauge('retry_queue_depth', max(0, scheduler.pending() - 1))
+        if outcome is not None:
+            with self._retry_lock:
+                self._retry_outcomes[0 if outcome else 1] += 1
+
+    def _send_all(
+        self,
+        contacts: Iterable[Tuple[Dict[str, str], bool]],
+        attachments: Optional[List[str]]
+    ) -> Tuple[int, int]:
+        success_count = 0
+        fail_count = 0
+
+        if self.max_workers == 1:
+            for shard, (contact, valid) in enumerate(contacts):
+                outcome = self._process_contact(contact, valid, attachments, shard)
+                self._count_outcome(outcome)
+                if outcome:
+                    success_count += 1
+                elif outcome is False:
+                    fail_count += 1
+            return success_count, fail_count
 
-            time.sleep(self.sleep_time)
+        # Janela limitada de tarefas em andamento para não materializar a lista toda
+        max_pending = self.max_workers * 2
+        pending: Set = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="email-worker") as executor:
+            for shard, (contact, valid) in enumerate(contacts):
+                pending.add(executor.submit(self._process_contact, contact, valid, attachments, shard))
+                if len(pending) < max_pending:
+                    continue
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                self.metrics.set_gauge('in_flight', len(pending))
+                for future in done:
+                    self._count_outcome(future.result())
+                    if future.result():
+                        success_count += 1
+                    elif future.result() is False:
+                        fail_count += 1
+            for future in pending:
+                self._count_outcome(future.result())
+                if future.result():
+                    success_count += 1
+                elif future.result() is False:
+                    fail_count += 1
 
-        logging.info(f"\nResumo do envio: {success_count} enviados com sucesso, {fail_count} falharam.")
+        return success_count, fail_count
 
 
 # 🚀 Ponto de entrada
 if __name__ == "__main__":
-    try:
-        with open('contacts.json', 'r', encoding='utf-8') as f:
-            contacts = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        logging.error(f"Erro ao carregar lista de contatos: {e}")
-        contacts = []
-
-    try:
-        email_sender = EmailSender(dry_run=False)
-        email_sender.send_bulk_emails(
-            contacts,
-            attachments=['attachments/Art.pdf']
-        )
-    except Exception as e:
-        logging.critical(f"Falha ao inicializar o envio de e-mails: {e}", exc_info=True)
+    parser = argparse.ArgumentParser(description="Envio de e-mails personalizados em massa.")
+    parser.add_argument("contatos", nargs="*", default=["contacts.json"],
+                        help="Listas de contatos (.json, .ndjson/.jsonl ou .csv)")
+    parser.add_argument("--midia", action="store_true",
+                        help="Trata os arquivos como diretórios de mídia aninhados (contacts_midia.json, crypto_media_<pais>.json)")
+    parser.add_argument("--anexo", action="append", dest="anexos",
+                        help="Arquivo a anexar (pode ser repetido; padrão: attachments/Art.pdf)")
+    parser.add_argument("--dry-run", action="store_true", help="Simula o envio sem enviar e-mails")
+    parser.add_argument("--todas-contas", action="store_true",
+                        help="Distribui a campanha entre todas as contas de EMAILS_JSON")
+    parser.add_argument("--journal", default="send_journal.db",
+                        help="Diário SQLite com o estado de cada destinatário (padrão: send_journal.db)")
+    parser.add_argument("--campanha", default=None,
+                        help="Identificador da campanha no diário (padrão: arquivos de contatos + assunto)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Pula os destinatários já enviados nesta campanha")
+    parser.add_argument("--log", default="email_sender.log",
+                        help="Arquivo de log (padrão: email_sender.log)")
+    parser.add_argument("--log-sincrono", action="store_true",
+                        help="Grava o log na própria thread de envio, sem a fila assíncrona")
+    args = parser.parse_args()
+    configurar_logging(args.log, assincrono=not args.log_sincrono)
+
+    missing = [path for path in args.contatos if not os.path.exists(path)]
+    if missing:
+        logging.error("Erro ao carregar lista de contatos: arquivo(s) não encontrado(s): %s", ', '.join(missing))
+    else:
+        if args.midia:
+            contacts = iter_media_contacts(args.contatos)
+        else:
+            contacts = itertools.chain.from_iterable(iter_contacts(path) for path in args.contatos)
+        try:
+            email_sender = EmailSender(dry_run=args.dry_run, shard_accounts=args.todas_contas)
+            campaign = args.campanha or f"{'+'.join(os.path.basename(p) for p in args.contatos)}:{email_sender.subject}"
+            with SendJournal(args.journal, campaign) as journal:
+                # Contatos lidos de forma preguiçosa: o envio começa antes do fim do parse
+                email_sender.send_bulk_emails(
+                    contacts,
+                    attachments=args.anexos or ['attachments/Art.pdf'],
+                    journal=journal,
+                    resume=args.resume
+                )
+        except Exception as e:
+            logging.critical("Falha ao inicializar o envio de e-mails: %s", e, exc_info=True)
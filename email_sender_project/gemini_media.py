@@ -4,83 +4,334 @@ gemini_media.py
 Script para consultar e coletar informações sobre jornais, portais de notícias e blogs relacionados a criptomoedas
 em qualquer país, utilizando a API Gemini (Google AI).
 
+Vários países podem ser coletados de uma vez: os prompts rodam em paralelo em um pool limitado de threads,
+compartilhando uma ``requests.Session``, com limite de taxa, nova tentativa com espera em respostas 429/5xx e
+um cache em disco das respostas (chave: hash do prompt), para que nenhuma consulta seja paga duas vezes.
+Os registros são extraídos do texto livre e normalizados por ``media_extractor`` e podem ser mesclados em um
+arquivo mestre indexado (``--mestre``).
+
 Autor: [Seu Nome]
 Data: 2025
 """
 
+import os
 import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
+from requests.adapters import HTTPAdapter
 
-# Insira sua chave da API Gemini aqui
-API_KEY = "SUA_CHAVE_DA_API_GEMINI"
-ENDPOINT = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
+from media_extractor import ExtratorJSON, MasterMidia, normalizar_registro
+from rate_limiter import RateLimiter
 
-# Consulta à API Gemini com um prompt customizado
-def consultar_api_gemini(prompt):
-    headers = {
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "contents": [
-            {"parts": [{"text": prompt}]}
-        ]
-    }
+# Chave e endpoint podem vir do ambiente (GEMINI_ENDPOINT permite apontar para um servidor local de testes)
+API_KEY = os.getenv("GEMINI_API_KEY", "SUA_CHAVE_DA_API_GEMINI")
+ENDPOINT = os.getenv(
+    "GEMINI_ENDPOINT", "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
+)
+TIMEOUT = 60
+CACHE_PADRAO = ".gemini_cache"
+CATEGORIAS = ("jornais", "portais_de_noticias", "blogs_e_sites_independentes")
 
-    try:
-        response = requests.post(f"{ENDPOINT}?key={API_KEY}", headers=headers, json=payload)
-        response.raise_for_status()
-        data = response.json()
-        return data['candidates'][0]['content']['parts'][0]['text']
-    except Exception as e:
-        print(f"[ERRO] Falha na consulta à API Gemini: {e}")
-        return None
 
-# Coleta de dados para o país especificado
-def coletar_dados_crypto_pais(pais):
-    dados = {
-        "pais": pais,
-        "jornais": [],
-        "portais_de_noticias": [],
-        "blogs_e_sites_independentes": []
-    }
-
-    # Prompts dinâmicos por país
-    prompts = {
+# Prompts dinâmicos por país
+def montar_prompts(pais):
+    return {
         "jornais": f"Liste os principais jornais de {pais} que já publicaram matérias sobre criptomoedas. Inclua nome, cidade, URL, email, telefone e endereço, se disponível. Formato JSON.",
         "portais_de_noticias": f"Liste portais de notícias digitais de {pais} voltados para fintechs e criptomoedas. Formato JSON com nome, cidade, URL, email, telefone e endereço.",
         "blogs_e_sites_independentes": f"Liste blogs ou sites independentes de {pais} que tratam de criptomoedas. Responda em JSON estruturado com nome, cidade, URL, email, telefone e endereço se houver."
     }
 
-    for categoria, prompt in prompts.items():
-        print(f"[INFO] Consultando API Gemini para categoria: {categoria} ({pais})...")
-        resposta = consultar_api_gemini(prompt)
-        if resposta:
+
+def _texto_da_resposta(data):
+    return data['candidates'][0]['content']['parts'][0]['text']
+
+
+def _interpretar_resposta(categoria, resposta):
+    """Extrai os registros do texto da Gemini (com ou sem cercas de markdown, prosa ou corte
+    no meio) já no esquema de ``contacts_midia.json``; None se nenhum registro for encontrado."""
+    extrator = ExtratorJSON()
+    registros = [r for r in map(normalizar_registro, extrator.alimentar(resposta)) if r is not None]
+    extrator.finalizar()
+    if extrator.truncados:
+        print(f"[AVISO] Resposta truncada para {categoria}: {len(registros)} registros completos aproveitados.")
+    if not registros:
+        print(f"[ERRO] Nenhum registro JSON encontrado na resposta para categoria {categoria}.")
+        return None
+    return registros
+
+
+class ColetorGemini:
+    """Consulta a Gemini em paralelo, com sessão HTTP compartilhada, limite de taxa e cache em disco."""
+
+    def __init__(self, api_key=API_KEY, endpoint=ENDPOINT, max_workers=4, por_segundo=1.0, por_hora=None,
+                 diretorio_cache=CACHE_PADRAO, timeout=TIMEOUT, tentativas=5, espera_base=2.0, espera_maxima=60.0,
+                 sleep=time.sleep):
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.max_workers = max_workers
+        self.diretorio_cache = diretorio_cache
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self._sleep = sleep
+        self.limitador = RateLimiter(per_second=por_segundo, per_hour=por_hora, sleep=sleep)
+
+        # Uma conexão keep-alive por thread do pool, reaproveitada entre os prompts
+        self.session = requests.Session()
+        self.session.headers["Content-Type"] = "application/json"
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adaptador)
+        self.session.mount("http://", adaptador)
+
+        self._lock = threading.Lock()
+        self.estatisticas = {"consultas": 0, "cache": 0, "respostas_429": 0, "novas_tentativas": 0, "falhas": 0}
+
+    def _contar(self, chave):
+        with self._lock:
+            self.estatisticas[chave] += 1
+
+    # --- Cache em disco -------------------------------------------------
+
+    def _caminho_cache(self, prompt):
+        chave = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return os.path.join(self.diretorio_cache, chave[:2], f"{chave}.json")
+
+    def _ler_cache(self, prompt):
+        if not self.diretorio_cache:
+            return None
+        try:
+            with open(self._caminho_cache(prompt), "r", encoding="utf-8") as f:
+                return json.load(f)["texto"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _gravar_cache(self, prompt, texto):
+        if not self.diretorio_cache:
+            return
+        caminho = self._caminho_cache(prompt)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        caminho_tmp = f"{caminho}.{threading.get_ident()}.tmp"
+        try:
+            with open(caminho_tmp, "w", encoding="utf-8") as f:
+                json.dump({"prompt": prompt, "texto": texto, "data": time.time()}, f, ensure_ascii=False)
+            os.replace(caminho_tmp, caminho)
+        except OSError as e:
+            print(f"[AVISO] Falha ao gravar o cache de respostas: {e}")
+
+    def _apagar_cache(self, prompt):
+        if not self.diretorio_cache:
+            return
+        try:
+            os.remove(self._caminho_cache(prompt))
+        except FileNotFoundError:
+            pass
+
+    # --- Consulta -------------------------------------------------------
+
+    def _espera(self, tentativa, resposta=None):
+        # Retry-After (em segundos) tem prioridade; senão, backoff exponencial com jitter
+        if resposta is not None:
             try:
-                dados_extraidos = json.loads(resposta)
-                if isinstance(dados_extraidos, list):
-                    dados[categoria] = dados_extraidos
-                    print(f"[SUCESSO] {len(dados_extraidos)} registros adicionados à categoria '{categoria}'.")
+                return min(self.espera_maxima, float(resposta.headers["Retry-After"]))
+            except (KeyError, ValueError):
+                pass
+        espera = min(self.espera_maxima, self.espera_base * (2 ** (tentativa - 1)))
+        return espera / 2 + random.random() * espera / 2
+
+    def consultar(self, prompt):
+        """Texto gerado para o prompt (do cache, se já consultado); None em caso de falha."""
+        return self._consultar(prompt)[0]
+
+    def _consultar(self, prompt):
+        # Devolve (texto, veio_do_cache). Gravar no cache fica com quem valida o texto
+        texto = self._ler_cache(prompt)
+        if texto is not None:
+            self._contar("cache")
+            return texto, True
+
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        for tentativa in range(1, self.tentativas + 1):
+            self.limitador.acquire()
+            self._contar("consultas")
+            motivo, resposta = None, None
+            try:
+                resposta = self.session.post(
+                    self.endpoint, params={"key": self.api_key}, json=payload, timeout=self.timeout
+                )
+                if resposta.status_code == 429 or resposta.status_code >= 500:
+                    if resposta.status_code == 429:
+                        self._contar("respostas_429")
+                    motivo = f"HTTP {resposta.status_code}"
                 else:
-                    print(f"[AVISO] Resposta inesperada da Gemini para {categoria}.")
-            except json.JSONDecodeError:
-                print(f"[ERRO] Falha ao interpretar JSON para categoria {categoria}.")
-        else:
-            print(f"[FALHA] Nenhuma informação obtida para categoria '{categoria}'.")
+                    resposta.raise_for_status()
+                    return _texto_da_resposta(resposta.json()), False
+            except (requests.ConnectionError, requests.Timeout) as e:
+                motivo, resposta = str(e), None
+            except (requests.RequestException, ValueError, KeyError, IndexError) as e:
+                # Erro do cliente (4xx) ou resposta fora do formato esperado: repetir não adianta
+                print(f"[ERRO] Falha na consulta à API Gemini: {e}")
+                break
+
+            if tentativa < self.tentativas:
+                espera = self._espera(tentativa, resposta)
+                self._contar("novas_tentativas")
+                print(f"[AVISO] {motivo}; nova tentativa em {espera:.1f}s ({tentativa}/{self.tentativas}).")
+                self._sleep(espera)
+            else:
+                print(f"[ERRO] Falha na consulta à API Gemini após {self.tentativas} tentativas: {motivo}")
+        self._contar("falhas")
+        return None, False
+
+    def _coletar_categoria(self, pais, categoria, prompt):
+        print(f"[INFO] Consultando API Gemini para categoria: {categoria} ({pais})...")
+        resposta, do_cache = self._consultar(prompt)
+        registros = _interpretar_resposta(categoria, resposta) if resposta else None
+        if registros is None:
+            # Resposta vazia, recusa ou texto sem registros: a próxima execução consulta de novo
+            if do_cache:
+                self._apagar_cache(prompt)
+            if resposta:
+                # Falhas de HTTP já foram contadas em _consultar
+                self._contar("falhas")
+            else:
+                print(f"[FALHA] Nenhuma informação obtida para categoria '{categoria}' ({pais}).")
+            return None
+        if not do_cache:
+            self._gravar_cache(prompt, resposta)
+        print(f"[SUCESSO] {len(registros)} registros adicionados à categoria '{categoria}' ({pais}).")
+        return registros
+
+    def coletar_lote(self, paises, ao_concluir=None):
+        """Coleta todos os países em paralelo; devolve ``{pais: dados}``.
+
+        ``ao_concluir(pais, dados)`` é chamado assim que as categorias de um país terminam,
+        para que os resultados sejam salvos sem esperar o lote inteiro.
+        """
+        paises = list(dict.fromkeys(paises))
+        resultados = {
+            pais: {"pais": pais, **{categoria: [] for categoria in CATEGORIAS}} for pais in paises
+        }
+        faltando = {pais: len(CATEGORIAS) for pais in paises}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gemini") as executor:
+            futuros = {
+                executor.submit(self._coletar_categoria, pais, categoria, prompt): (pais, categoria)
+                for pais in paises
+                for categoria, prompt in montar_prompts(pais).items()
+            }
+            for futuro in as_completed(futuros):
+                pais, categoria = futuros[futuro]
+                registros = futuro.result()
+                if registros is not None:
+                    resultados[pais][categoria] = registros
+                faltando[pais] -= 1
+                if faltando[pais] == 0 and ao_concluir is not None:
+                    ao_concluir(pais, resultados[pais])
+        return resultados
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Consulta à API Gemini com um prompt customizado
+def consultar_api_gemini(prompt):
+    with ColetorGemini(diretorio_cache=None, tentativas=1) as coletor:
+        return coletor.consultar(prompt)
+
+
+# Coleta de dados para o país especificado
+def coletar_dados_crypto_pais(pais):
+    with ColetorGemini() as coletor:
+        return coletor.coletar_lote([pais])[pais]
+
+
+def nome_arquivo_pais(pais, diretorio="."):
+    return os.path.join(diretorio, f"crypto_media_{pais.lower().replace(' ', '_')}.json")
+
+
+def salvar_dados(pais, dados_coletados, diretorio="."):
+    nome_arquivo = nome_arquivo_pais(pais, diretorio)
+    try:
+        with open(nome_arquivo, "w", encoding="utf-8") as f:
+            json.dump(dados_coletados, f, indent=2, ensure_ascii=False)
+        print(f"[FINALIZADO] Dados salvos com sucesso em '{nome_arquivo}'")
+    except Exception as e:
+        print(f"[ERRO] Falha ao salvar o arquivo: {e}")
+
+
+def mesclar_no_mestre(mestre, pais, dados_coletados):
+    for categoria in CATEGORIAS:
+        contagem = mestre.mesclar(dados_coletados[categoria], pais=pais, categoria=categoria)
+        if any(contagem.values()):
+            print(f"[MESTRE] {pais}/{categoria}: {contagem['novos']} novos, {contagem['atualizados']} atualizados, "
+                  f"{contagem['inalterados']} já conhecidos.")
+
+
+def ler_lista_paises(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        return [linha.strip() for linha in f if linha.strip() and not linha.startswith("#")]
 
-    return dados
 
 # Execução principal
-if __name__ == "__main__":
-    pais = input("Digite o nome do país que deseja consultar (ex: Nigéria, Brasil, Índia): ").strip()
-    if not pais:
-        print("[ERRO] País não informado. Encerrando execução.")
-    else:
-        dados_coletados = coletar_dados_crypto_pais(pais)
+def main():
+    parser = argparse.ArgumentParser(description="Coleta veículos de mídia sobre criptomoedas por país via Gemini")
+    parser.add_argument("paises", nargs="*", help="Países a consultar (sem nenhum, o país é perguntado no terminal)")
+    parser.add_argument("--lista", help="Arquivo com um país por linha")
+    parser.add_argument("-j", "--workers", type=int, default=4, help="Consultas simultâneas (padrão: 4)")
+    parser.add_argument("--por-segundo", type=float, default=1.0, help="Limite de consultas por segundo (padrão: 1)")
+    parser.add_argument("--por-hora", type=int, default=None, help="Limite de consultas por hora")
+    parser.add_argument("--cache", default=CACHE_PADRAO,
+                        help=f"Diretório do cache de respostas (padrão: {CACHE_PADRAO}; '' desativa)")
+    parser.add_argument("--endpoint", default=ENDPOINT, help="URL do generateContent (padrão: GEMINI_ENDPOINT)")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help=f"Timeout de cada requisição (padrão: {TIMEOUT}s)")
+    parser.add_argument("--saida", default=".", help="Diretório dos arquivos crypto_media_<pais>.json")
+    parser.add_argument("--mestre", help="Arquivo mestre (JSON lines indexado) onde os registros são mesclados")
+    args = parser.parse_args()
 
-        nome_arquivo = f"crypto_media_{pais.lower().replace(' ', '_')}.json"
-        try:
-            with open(nome_arquivo, "w", encoding="utf-8") as f:
-                json.dump(dados_coletados, f, indent=2, ensure_ascii=False)
-            print(f"[FINALIZADO] Dados salvos com sucesso em '{nome_arquivo}'")
-        except Exception as e:
-            print(f"[ERRO] Falha ao salvar o arquivo: {e}")
+    paises = list(args.paises)
+    if args.lista:
+        paises.extend(ler_lista_paises(args.lista))
+    if not paises:
+        pais = input("Digite o nome do país que deseja consultar (ex: Nigéria, Brasil, Índia): ").strip()
+        if not pais:
+            print("[ERRO] País não informado. Encerrando execução.")
+            return
+        paises = [pais]
+
+    os.makedirs(args.saida, exist_ok=True)
+    mestre = MasterMidia(args.mestre) if args.mestre else None
+
+    # Chamado na thread principal (as_completed), então o mestre não é escrito em paralelo
+    def ao_concluir(pais, dados):
+        salvar_dados(pais, dados, args.saida)
+        if mestre is not None:
+            mesclar_no_mestre(mestre, pais, dados)
+
+    inicio = time.monotonic()
+    with ColetorGemini(
+        endpoint=args.endpoint, max_workers=args.workers, por_segundo=args.por_segundo, por_hora=args.por_hora,
+        diretorio_cache=args.cache or None, timeout=args.timeout
+    ) as coletor:
+        coletor.coletar_lote(paises, ao_concluir=ao_concluir)
+        e = coletor.estatisticas
+    print(
+        f"[RESUMO] {len(paises)} países em {time.monotonic() - inicio:.1f}s: {e['consultas']} requisições, "
+        f"{e['cache']} respostas do cache, {e['respostas_429']} respostas 429, {e['falhas']} falhas."
+    )
+
+
+if __name__ == "__main__":
+    main()
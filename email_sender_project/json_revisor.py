@@ -1,9 +1,16 @@
 import json
 import os
 import re
+import glob
+import time
+import gzip
+import hashlib
 import logging
 import shutil
 import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 
 try:
@@ -11,6 +18,12 @@ try:
 except ImportError:
     import json as json_parser
 
+# zstd é opcional: sem ele os backups usam gzip
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
 def configurar_logger(log_path=None):
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
@@ -39,63 +52,393 @@ def verificar_permissoes(caminho_arquivo):
         return False
     return True
 
-def fazer_backup(caminho_arquivo):
-    nome_arquivo, extensao = os.path.splitext(caminho_arquivo)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    caminho_backup = f"{nome_arquivo}_backup_{timestamp}{extensao}"
+DIRETORIO_BACKUPS = ".json_backups"
+BACKUPS_MANTIDOS = 10
+
+
+def _salvar_json_atomico(caminho, dados):
+    # Nome temporário único: processos do lote podem gravar no mesmo diretório ao mesmo tempo
+    descritor, caminho_tmp = tempfile.mkstemp(prefix=os.path.basename(caminho) + '.',
+                                              suffix='.tmp', dir=os.path.dirname(caminho) or '.')
     try:
-        shutil.copy2(caminho_arquivo, caminho_backup)
-        logging.info(f"Backup criado com sucesso: {caminho_backup}")
+        with os.fdopen(descritor, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, indent=2, ensure_ascii=False)
+        os.replace(caminho_tmp, caminho)
+    except BaseException:
+        os.remove(caminho_tmp)
+        raise
+
+
+def _diretorio_backups(caminho_arquivo, diretorio=None):
+    return diretorio or os.path.join(os.path.dirname(os.path.abspath(caminho_arquivo)), DIRETORIO_BACKUPS)
+
+
+def _caminho_indice(caminho_arquivo, diretorio=None):
+    # O caminho absoluto entra na chave: com um --backups compartilhado, a/contatos.json
+    # e b/contatos.json precisam de índices separados
+    caminho_absoluto = os.path.abspath(caminho_arquivo)
+    chave = hashlib.sha256(caminho_absoluto.encode('utf-8')).hexdigest()[:16]
+    nome = f"{os.path.basename(caminho_absoluto)}.{chave}.indice.json"
+    return os.path.join(_diretorio_backups(caminho_arquivo, diretorio), nome)
+
+
+def listar_backups(caminho_arquivo, diretorio=None):
+    """Versões guardadas do arquivo, da mais antiga para a mais recente."""
+    caminho_indice = _caminho_indice(caminho_arquivo, diretorio)
+    if not os.path.exists(caminho_indice):
+        return []
+    with open(caminho_indice, 'r', encoding='utf-8') as f:
+        return json.load(f)["versoes"]
+
+
+def _comprimir(origem, destino):
+    with open(origem, 'rb') as entrada, open(destino, 'wb') as saida:
+        if zstd is not None:
+            zstd.ZstdCompressor(level=10).copy_stream(entrada, saida)
+        else:
+            with gzip.GzipFile(fileobj=saida, mode='wb', mtime=0) as comprimido:
+                shutil.copyfileobj(entrada, comprimido, TAMANHO_BLOCO)
+
+
+def _descomprimir(objeto, destino):
+    with open(objeto, 'rb') as entrada, open(destino, 'wb') as saida:
+        if objeto.endswith('.zst'):
+            if zstd is None:
+                raise RuntimeError("Backup em zstd, mas o pacote 'zstandard' não está instalado.")
+            zstd.ZstdDecompressor().copy_stream(entrada, saida)
+        else:
+            with gzip.GzipFile(fileobj=entrada, mode='rb') as comprimido:
+                shutil.copyfileobj(comprimido, saida, TAMANHO_BLOCO)
+
+
+def _objetos_em_uso(diretorio):
+    em_uso = set()
+    for indice in glob.glob(os.path.join(diretorio, '*.indice.json')):
+        try:
+            with open(indice, 'r', encoding='utf-8') as f:
+                em_uso.update(v["objeto"] for v in json.load(f)["versoes"])
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning("Índice de backups ilegível (%s): %s", indice, e)
+            # Sem saber o que o índice referencia, nada é apagado
+            return None
+    return em_uso
+
+
+@contextmanager
+def _travar_backups(diretorio, espera=60.0):
+    """Trava entre processos (arquivo criado com O_EXCL) para gravar objetos, índices e a coleta.
+
+    Uma trava mais velha que ``espera`` segundos é de um processo que morreu e é descartada.
+    """
+    caminho = os.path.join(diretorio, ".trava")
+    limite = time.monotonic() + espera
+    while True:
+        try:
+            descritor = os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(caminho) > espera:
+                    os.remove(caminho)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > limite:
+                raise TimeoutError(f"trava dos backups ocupada: {caminho}")
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(descritor)
+        os.remove(caminho)
+
+
+def fazer_backup(caminho_arquivo, sha256=None, diretorio=None, manter=BACKUPS_MANTIDOS):
+    """Guarda o conteúdo atual do arquivo como um objeto comprimido endereçado pelo hash.
+
+    Se o conteúdo é igual ao do último backup, nada é gravado. Conteúdos iguais
+    (mesmo de arquivos diferentes) compartilham o mesmo objeto, e só as últimas
+    ``manter`` versões de cada arquivo são mantidas. A compressão corre em
+    paralelo; gravar o objeto, o índice e a coleta de objetos sem uso acontece
+    sob uma trava, para que um processo do lote não apague um objeto que outro
+    acabou de referenciar.
+    """
+    caminho_tmp = None
+    try:
+        sha256 = sha256 or hash_arquivo(caminho_arquivo)
+        versoes = listar_backups(caminho_arquivo, diretorio)
+        if versoes and versoes[-1]["sha256"] == sha256:
+            logging.info("Backup ignorado: conteúdo igual ao da versão %s.", versoes[-1]["versao"])
+            return versoes[-1]
+
+        diretorio = _diretorio_backups(caminho_arquivo, diretorio)
+        extensao = ".json.zst" if zstd is not None else ".json.gz"
+        objeto = os.path.join("objetos", sha256[:2], sha256 + extensao)
+        caminho_objeto = os.path.join(diretorio, objeto)
+        os.makedirs(os.path.dirname(caminho_objeto), exist_ok=True)
+        if not os.path.exists(caminho_objeto):
+            caminho_tmp = f"{caminho_objeto}.{os.getpid()}.tmp"
+            _comprimir(caminho_arquivo, caminho_tmp)
+
+        with _travar_backups(diretorio):
+            # Sob a trava: o objeto pode ter sido coletado desde a verificação acima
+            if not os.path.exists(caminho_objeto):
+                if caminho_tmp is None:
+                    caminho_tmp = f"{caminho_objeto}.{os.getpid()}.tmp"
+                    _comprimir(caminho_arquivo, caminho_tmp)
+                os.replace(caminho_tmp, caminho_objeto)
+
+            versoes = listar_backups(caminho_arquivo, diretorio)
+            versao = {
+                "versao": versoes[-1]["versao"] + 1 if versoes else 1,
+                "sha256": sha256,
+                "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "tamanho": os.path.getsize(caminho_arquivo),
+                "objeto": objeto,
+            }
+            versoes.append(versao)
+            descartadas, versoes = versoes[:-manter], versoes[-manter:]
+            _salvar_json_atomico(_caminho_indice(caminho_arquivo, diretorio),
+                                 {"arquivo": os.path.abspath(caminho_arquivo), "versoes": versoes})
+
+            if descartadas:
+                em_uso = _objetos_em_uso(diretorio)
+                for antiga in descartadas:
+                    if em_uso is not None and antiga["objeto"] not in em_uso:
+                        try:
+                            os.remove(os.path.join(diretorio, antiga["objeto"]))
+                        except FileNotFoundError:
+                            pass
+        logging.info("Backup criado com sucesso: versão %s (%s)", versao["versao"], caminho_objeto)
+        return versao
     except Exception as e:
-        logging.warning(f"Falha ao criar backup: {e}")
+        logging.warning("Falha ao criar backup: %s", e)
+        return None
+    finally:
+        if caminho_tmp is not None and os.path.exists(caminho_tmp):
+            os.remove(caminho_tmp)
+
+
+def restaurar_backup(caminho_arquivo, versao=None, diretorio=None, manter=BACKUPS_MANTIDOS):
+    """Reconstrói o arquivo a partir de uma versão (a mais recente se ``versao`` for None).
+
+    O conteúdo atual ganha um backup antes, então a restauração também pode ser desfeita.
+    """
+    versoes = listar_backups(caminho_arquivo, diretorio)
+    if versao is None:
+        escolhida = versoes[-1] if versoes else None
+    else:
+        escolhida = next((v for v in versoes if v["versao"] == versao), None)
+    if escolhida is None:
+        logging.error("Versão %s não encontrada nos backups de '%s'.", versao, caminho_arquivo)
+        return False
+
+    caminho_objeto = os.path.join(_diretorio_backups(caminho_arquivo, diretorio), escolhida["objeto"])
+    caminho_tmp = f"{caminho_arquivo}.restauracao.tmp"
+    try:
+        # Descomprime antes do backup do conteúdo atual: com a retenção cheia, esse
+        # backup pode descartar justamente a versão escolhida
+        _descomprimir(caminho_objeto, caminho_tmp)
+        if hash_arquivo(caminho_tmp) != escolhida["sha256"]:
+            raise ValueError("conteúdo do backup não confere com o hash registrado")
+        if os.path.exists(caminho_arquivo):
+            fazer_backup(caminho_arquivo, diretorio=diretorio, manter=manter)
+        os.replace(caminho_tmp, caminho_arquivo)
+    except (OSError, ValueError, RuntimeError) as e:
+        logging.error("Falha ao restaurar '%s': %s", caminho_arquivo, e)
+        return False
+    finally:
+        if os.path.exists(caminho_tmp):
+            os.remove(caminho_tmp)
+    logging.info("Arquivo '%s' restaurado para a versão %s (%s).", caminho_arquivo, escolhida["versao"], escolhida["data"])
+    return True
+
+
+TAMANHO_BLOCO = 1024 * 1024
+
+# Um único padrão reconhece todos os tokens. "seguro" agrupa até 4096 átomos que
+# não precisam de correção (strings válidas, números, literais, espaços, ':' e
+# vírgulas seguidas de valor), para que JSON válido avance em poucos passos.
+_TOKEN = re.compile(r"""
+    (?P<seguro>(?:"[^"\\\x00-\x1f]*(?:\\.[^"\\\x00-\x1f]*)*"|[\s:]+|-?\d[\d.eE+\-]*|(?:true|false|null)\b|,(?=\s*["\-\d\[{tfn])){1,4096})
+  | (?P<string>"[^"\\]*(?:\\.[^"\\]*)*")
+  | (?P<simples>'[^'\\]*(?:\\.[^'\\]*)*')
+  | (?P<abre>[\[{])
+  | (?P<fecha>[\]}])
+  | (?P<virgula>,)
+  | (?P<menos_infinito>-Infinity\b)
+  | (?P<chave>[A-Za-z_$][\w$]*)(?=\s*:)
+  | (?P<palavra>[A-Za-z_$][\w$]*)(?![\w$])(?=\s*[^\s:])
+  | (?P<incompleto>[A-Za-z_$][\w$]*\s*\Z)
+  | (?P<outro>.)
+""", re.VERBOSE | re.DOTALL)
+
+_CONTROLE = re.compile(r'[\x00-\x1f]')
+_ESCAPES = {'\n': '\\n', '\t': '\\t', '\r': '\\r', '\b': '\\b', '\f': '\\f'}
+_INVALIDOS = {'NaN', 'undefined', 'Infinity'}
+_FECHAMENTO = {'{': '}', '[': ']'}
+
+
+def _escapar_controle(caractere):
+    c = caractere.group()
+    return _ESCAPES.get(c) or f"\\u{ord(c):04x}"
+
+
+class ReparadorJSON:
+    """Corrige JSON em uma única passada, em blocos, acompanhando o estado de strings e escapes.
+
+    Só o texto ainda não decidido (no máximo um token) e a pilha de chaves e
+    colchetes abertos ficam em memória. Correções aplicadas:
+
+    - NaN, undefined, Infinity e -Infinity fora de strings → null
+    - vírgulas antes de ``}``/``]`` e vírgulas duplicadas são removidas
+    - chaves sem aspas recebem aspas; strings com aspas simples passam a duplas
+    - quebras de linha e tabulações cruas dentro de strings são escapadas
+    - fechamentos trocados ou sobrando são ajustados e os que faltam, acrescentados
+    """
+
+    def __init__(self):
+        self._pendente = ''
+        self._pilha = []
+        self._virgula = False
+        self._espaco = ''
+        self._contagem = {}
+
+    @property
+    def correcoes(self):
+        return [m if n == 1 else f"{m} ({n}x)" for m, n in self._contagem.items()]
+
+    def _corrigir(self, mensagem, n=1):
+        self._contagem[mensagem] = self._contagem.get(mensagem, 0) + n
+
+    def alimentar(self, bloco, final=False):
+        """Processa mais um bloco de texto e devolve o trecho já corrigido."""
+        texto = self._pendente + bloco
+        tamanho = len(texto)
+        saida = []
+        emitir = saida.append
+        pos = 0
+        casar = _TOKEN.match
+
+        while pos < tamanho:
+            m = casar(texto, pos)
+            tipo = m.lastgroup
+            fim = m.end()
+            # Um token que encosta no fim do bloco pode continuar no próximo
+            if (fim == tamanho or tipo == 'incompleto') and not final:
+                break
+            # "-" ou "-Inf" no fim do bloco pode ser o começo de -Infinity
+            if tipo == 'outro' and not final and '-Infinity'.startswith(texto[pos:]):
+                break
+            if tipo == 'outro' and m.group() in '"\'':
+                if not final:
+                    break
+                # String sem aspas de fechamento até o fim do arquivo
+                conteudo = texto[pos + 1:]
+                self._valor(emitir, '"' + _CONTROLE.sub(_escapar_controle, conteudo.replace('"', '\\"')) + '"')
+                self._corrigir("Fechamento de string sem aspas finais.")
+                pos = tamanho
+                break
+            pos = fim
+            token = m.group(tipo)
+
+            if tipo == 'seguro':
+                if self._virgula:
+                    inicio = token.lstrip()
+                    if not inicio:
+                        self._espaco += token
+                        continue
+                    if inicio[0] == ',':
+                        self._corrigir("Remoção de vírgulas duplicadas.")
+                        self._espaco += token[:len(token) - len(inicio)]
+                        token = inicio[1:]
+                self._valor(emitir, token)
+            elif tipo == 'abre':
+                self._valor(emitir, token)
+                self._pilha.append(_FECHAMENTO[token])
+            elif tipo == 'fecha':
+                self._fechar(emitir, token)
+            elif tipo == 'virgula':
+                if self._virgula:
+                    self._corrigir("Remoção de vírgulas duplicadas.")
+                self._virgula = True
+            elif tipo == 'string':
+                self._corrigir("Escape de quebras de linha e tabulações.")
+                self._valor(emitir, _CONTROLE.sub(_escapar_controle, token))
+            elif tipo == 'simples':
+                self._corrigir("Substituição de aspas simples por duplas.")
+                interno = token[1:-1].replace("\\'", "'").replace('"', '\\"')
+                self._valor(emitir, '"' + _CONTROLE.sub(_escapar_controle, interno) + '"')
+            elif tipo == 'chave':
+                self._corrigir("Adição de aspas em chaves não entre aspas.")
+                self._valor(emitir, f'"{token}"')
+            elif tipo == 'menos_infinito' or (tipo in ('palavra', 'incompleto') and token.strip() in _INVALIDOS):
+                palavra = token.strip()
+                self._corrigir(f"Substituição de valor inválido: {palavra} → null")
+                self._valor(emitir, 'null' + token[len(palavra):])
+            else:
+                self._valor(emitir, token)
+
+        self._pendente = texto[pos:]
+        if final:
+            self._finalizar(emitir)
+        return ''.join(saida)
+
+    def _valor(self, emitir, token):
+        if self._virgula:
+            emitir(',' + self._espaco)
+            self._virgula = False
+            self._espaco = ''
+        emitir(token)
+
+    def _fechar(self, emitir, token):
+        if self._virgula:
+            self._corrigir("Remoção de vírgulas extras antes de fechamento.")
+            emitir(self._espaco)
+            self._virgula = False
+            self._espaco = ''
+        if token not in self._pilha:
+            self._corrigir(f"Remoção de '{token}' sem abertura correspondente.")
+            return
+        # Fecha o que ficou aberto entre a abertura correspondente e este fechamento
+        while self._pilha[-1] != token:
+            self._contar_fechamento(self._pilha[-1])
+            emitir(self._pilha.pop())
+        emitir(self._pilha.pop())
+
+    def _contar_fechamento(self, fechamento):
+        self._corrigir("Fechamento automático de chaves." if fechamento == '}' else "Fechamento automático de colchetes.")
+
+    def _finalizar(self, emitir):
+        if self._virgula:
+            self._corrigir("Remoção de vírgulas extras antes de fechamento.")
+            emitir(self._espaco)
+            self._virgula = False
+        while self._pilha:
+            fechamento = self._pilha.pop()
+            self._contar_fechamento(fechamento)
+            emitir(fechamento)
+
+    def finalizar(self):
+        return self.alimentar('', final=True)
+
+
+def reparar_fluxo(entrada, saida, tamanho_bloco=TAMANHO_BLOCO):
+    """Corrige de um arquivo de texto para outro, bloco a bloco; devolve as correções."""
+    reparador = ReparadorJSON()
+    while True:
+        bloco = entrada.read(tamanho_bloco)
+        if not bloco:
+            break
+        saida.write(reparador.alimentar(bloco))
+    saida.write(reparador.finalizar())
+    return reparador.correcoes
 
-def contar_abrir_fechar(texto):
-    return texto.count('{'), texto.count('}'), texto.count('['), texto.count(']')
 
 def aplicar_correcoes_json(conteudo_original):
-    conteudo_corrigido = conteudo_original
-    correcoes_aplicadas = []
-
-    for invalido in [r'\bNaN\b', r'\bundefined\b', r'\bInfinity\b', r'\b-Infinity\b']:
-        nova_versao = re.sub(invalido, 'null', conteudo_corrigido)
-        if nova_versao != conteudo_corrigido:
-            correcoes_aplicadas.append(f"Substituição de valor inválido: {invalido} → null")
-            conteudo_corrigido = nova_versao
-
-    nova_versao = re.sub(r',\s*([}\]])', r'\1', conteudo_corrigido)
-    if nova_versao != conteudo_corrigido:
-        correcoes_aplicadas.append("Remoção de vírgulas extras antes de fechamento.")
-        conteudo_corrigido = nova_versao
-
-    nova_versao = re.sub(r',\s*,+', ',', conteudo_corrigido)
-    if nova_versao != conteudo_corrigido:
-        correcoes_aplicadas.append("Remoção de vírgulas duplicadas.")
-        conteudo_corrigido = nova_versao
-
-    nova_versao = re.sub(r'([{,]\s*)([a-zA-Z_][a-zA-Z0-9_]*)\s*:', r'\1"\2":', conteudo_corrigido)
-    if nova_versao != conteudo_corrigido:
-        correcoes_aplicadas.append("Adição de aspas em chaves não entre aspas.")
-        conteudo_corrigido = nova_versao
-
-    nova_versao = re.sub(r"\'([^']*)\'", r'"\1"', conteudo_corrigido)
-    if nova_versao != conteudo_corrigido:
-        correcoes_aplicadas.append("Substituição de aspas simples por duplas.")
-        conteudo_corrigido = nova_versao
-
-    nova_versao = conteudo_corrigido.replace('\n', '\\n').replace('\t', '\\t')
-    if nova_versao != conteudo_corrigido:
-        correcoes_aplicadas.append("Escape de quebras de linha e tabulações.")
-        conteudo_corrigido = nova_versao
-
-    a1, f1, a2, f2 = contar_abrir_fechar(conteudo_corrigido)
-    if a1 > f1:
-        conteudo_corrigido += '}' * (a1 - f1)
-        correcoes_aplicadas.append(f"Fechamento automático de {a1 - f1} chaves.")
-    if a2 > f2:
-        conteudo_corrigido += ']' * (a2 - f2)
-        correcoes_aplicadas.append(f"Fechamento automático de {a2 - f2} colchetes.")
-
-    return conteudo_corrigido, correcoes_aplicadas
+    reparador = ReparadorJSON()
+    conteudo_corrigido = reparador.alimentar(conteudo_original, final=True)
+    return conteudo_corrigido, reparador.correcoes
 
 def perguntar_confirmacao(mensagens):
     print("\nCorreções sugeridas:")
@@ -107,57 +450,135 @@ def perguntar_confirmacao(mensagens):
             return resposta == 's'
         print("Por favor, responda com 's' ou 'n'.")
 
-def revisar_e_corrigir_json(caminho_arquivo, aplicar_corrigir):
-    logging.info(f"Iniciando revisão do arquivo: {caminho_arquivo}")
+# Resultados possíveis da revisão de um arquivo
+VALIDO = "valido"
+REFORMATADO = "reformatado"
+CORRIGIDO = "corrigido"
+REPARAVEL = "reparavel"
+IRREPARAVEL = "irreparavel"
+CANCELADO = "cancelado"
+IGNORADO = "ignorado"
+ERRO = "erro"
+SUCESSOS = (VALIDO, REFORMATADO, CORRIGIDO, IGNORADO)
 
-    if not verificar_permissoes(caminho_arquivo):
+# perguntar: confirma cada escrita no terminal; reparar: aplica sem perguntar; validar: nunca escreve
+POLITICAS = ("perguntar", "reparar", "validar")
+
+CACHE_PADRAO = ".json_revisor_cache.json"
+
+
+def hash_arquivo(caminho_arquivo):
+    sha = hashlib.sha256()
+    with open(caminho_arquivo, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _confirmar(politica, mensagens):
+    if politica == "reparar":
+        return True
+    if politica == "validar":
         return False
+    return perguntar_confirmacao(mensagens)
+
 
+def revisar_arquivo(caminho_arquivo, aplicar_corrigir=False, politica="perguntar", hash_conhecido=None,
+                    diretorio_backups=None, manter_backups=BACKUPS_MANTIDOS):
+    """Revisa (e, conforme a política, corrige) um arquivo; devolve um resumo para o relatório.
+
+    Com ``hash_conhecido`` igual ao hash atual do arquivo, ele é ignorado: já
+    passou limpo por uma revisão anterior.
+    """
+    resultado = {"arquivo": caminho_arquivo, "status": ERRO, "correcoes": [], "sha256": None, "erro": None}
+    inicio = time.perf_counter()
     try:
-        with open(caminho_arquivo, 'r', encoding='utf-8') as f:
-            conteudo_original = f.read()
+        _revisar(caminho_arquivo, aplicar_corrigir, politica, hash_conhecido, resultado,
+                 diretorio_backups, manter_backups)
     except Exception as e:
-        logging.error(f"Erro ao ler o arquivo: {e}")
-        return False
+        logging.error("Falha inesperada ao revisar '%s': %s", caminho_arquivo, e)
+        resultado["status"], resultado["erro"] = ERRO, str(e)
+    resultado["duracao_s"] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def _revisar(caminho_arquivo, aplicar_corrigir, politica, hash_conhecido, resultado, diretorio_backups, manter_backups):
+    logging.info("Iniciando revisão do arquivo: %s", caminho_arquivo)
+
+    if not verificar_permissoes(caminho_arquivo):
+        resultado["erro"] = "arquivo inexistente ou sem permissão"
+        return
 
     try:
-        dados = json_parser.loads(conteudo_original)
+        resultado["sha256"] = hash_arquivo(caminho_arquivo)
+        if hash_conhecido and resultado["sha256"] == hash_conhecido:
+            logging.info("Arquivo inalterado desde a última revisão limpa, ignorado: %s", caminho_arquivo)
+            resultado["status"] = IGNORADO
+            return
+        with open(caminho_arquivo, 'r', encoding='utf-8') as f:
+            dados = json_parser.load(f)
         logging.info("O arquivo JSON é sintaticamente válido.")
+        resultado["status"] = VALIDO
         # Mesmo válido, pergunta se quer continuar?
         if aplicar_corrigir:
-            print("\nO arquivo JSON é válido. Deseja sobrescrevê-lo com formatação padrão? (s/n): ")
-            if not perguntar_confirmacao(["Reformatação do JSON válido"]):
-                logging.error("Processo cancelado pelo usuário.")
-                return False
-            else:
-                fazer_backup(caminho_arquivo)
-                with open(caminho_arquivo, 'w', encoding='utf-8') as f:
-                    json.dump(dados, f, indent=2, ensure_ascii=False)
-                logging.info("Arquivo JSON salvo com sucesso com nova formatação.")
-                return True
-        return True
+            if politica == "perguntar":
+                print("\nO arquivo JSON é válido. Deseja sobrescrevê-lo com formatação padrão? (s/n): ")
+            if not _confirmar(politica, ["Reformatação do JSON válido"]):
+                if politica == "perguntar":
+                    logging.error("Processo cancelado pelo usuário.")
+                    resultado["status"] = CANCELADO
+                return
+            fazer_backup(caminho_arquivo, resultado["sha256"], diretorio_backups, manter_backups)
+            with open(caminho_arquivo, 'w', encoding='utf-8') as f:
+                json.dump(dados, f, indent=2, ensure_ascii=False)
+            logging.info("Arquivo JSON salvo com sucesso com nova formatação.")
+            resultado["status"] = REFORMATADO
+            resultado["sha256"] = hash_arquivo(caminho_arquivo)
+        return
+    except (OSError, UnicodeDecodeError) as e:
+        logging.error("Erro ao ler o arquivo: %s", e)
+        resultado["erro"] = str(e)
+        return
     except json.JSONDecodeError as e:
-        logging.warning(f"Erro de sintaxe JSON: {e}")
-        conteudo_corrigido, correcoes_aplicadas = aplicar_correcoes_json(conteudo_original)
+        logging.warning("Erro de sintaxe JSON: %s", e)
+        resultado["erro"] = str(e)
+
+    # A correção é feita em blocos para um arquivo temporário, sem carregar o original inteiro
+    caminho_reparo = f"{caminho_arquivo}.reparo.tmp"
+    try:
+        try:
+            with open(caminho_arquivo, 'r', encoding='utf-8') as entrada, \
+                    open(caminho_reparo, 'w', encoding='utf-8') as saida:
+                correcoes_aplicadas = reparar_fluxo(entrada, saida)
+        except (OSError, UnicodeDecodeError) as e:
+            logging.error("Erro ao ler o arquivo: %s", e)
+            resultado["erro"] = str(e)
+            return
+        resultado["correcoes"] = correcoes_aplicadas
 
         if not correcoes_aplicadas:
             logging.error("Nenhuma correção foi sugerida, mas o JSON é inválido.")
-            return False
+            resultado["status"] = IRREPARAVEL
+            return
 
         logging.info("Correções sugeridas:")
         for c in correcoes_aplicadas:
-            logging.info(f" - {c}")
-
-        if not perguntar_confirmacao(correcoes_aplicadas):
-            logging.error("Processo cancelado pelo usuário.")
-            return False
+            logging.info(" - %s", c)
 
         try:
-            dados = json_parser.loads(conteudo_corrigido)
-            logging.info("JSON corrigido com sucesso.")
+            with open(caminho_reparo, 'r', encoding='utf-8') as f:
+                dados = json_parser.load(f)
         except json.JSONDecodeError as e2:
-            logging.error(f"Erro após tentativa de correção: {e2}")
-            return False
+            logging.error("Erro após tentativa de correção: %s", e2)
+            resultado["status"], resultado["erro"] = IRREPARAVEL, str(e2)
+            return
+
+        if not _confirmar(politica, correcoes_aplicadas):
+            if politica == "perguntar":
+                logging.error("Processo cancelado pelo usuário.")
+            resultado["status"] = CANCELADO if politica == "perguntar" else REPARAVEL
+            return
+        logging.info("JSON corrigido com sucesso.")
 
         # Inserir campo "versao" no dicionário raiz, se for dict
         if isinstance(dados, dict):
@@ -165,30 +586,189 @@ def revisar_e_corrigir_json(caminho_arquivo, aplicar_corrigir):
         else:
             logging.warning("Arquivo JSON não é um objeto/dicionário no topo, não foi possível adicionar campo 'versao'.")
 
-        fazer_backup(caminho_arquivo)
+        fazer_backup(caminho_arquivo, resultado["sha256"], diretorio_backups, manter_backups)
 
         try:
             with open(caminho_arquivo, 'w', encoding='utf-8') as f:
                 json.dump(dados, f, indent=2, ensure_ascii=False)
             logging.info("Arquivo JSON salvo com sucesso.")
-            return True
+            resultado["status"], resultado["erro"] = CORRIGIDO, None
+            resultado["sha256"] = hash_arquivo(caminho_arquivo)
         except Exception as e:
-            logging.error(f"Erro ao salvar o arquivo: {e}")
-            return False
+            logging.error("Erro ao salvar o arquivo: %s", e)
+            resultado["erro"] = str(e)
+    finally:
+        if os.path.exists(caminho_reparo):
+            os.remove(caminho_reparo)
+
+
+def revisar_e_corrigir_json(caminho_arquivo, aplicar_corrigir, diretorio_backups=None, manter_backups=BACKUPS_MANTIDOS):
+    resultado = revisar_arquivo(caminho_arquivo, aplicar_corrigir,
+                                diretorio_backups=diretorio_backups, manter_backups=manter_backups)
+    return resultado["status"] in SUCESSOS
+
+
+def expandir_entradas(entradas):
+    """Resolve arquivos, diretórios (busca recursiva por *.json) e globs, sem repetições."""
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            encontrados = sorted(glob.glob(os.path.join(entrada, '**', '*.json'), recursive=True))
+        elif glob.has_magic(entrada):
+            encontrados = sorted(glob.glob(entrada, recursive=True))
+        else:
+            encontrados = [entrada]
+        arquivos.extend(encontrados)
+    vistos = set()
+    unicos = []
+    for arquivo in arquivos:
+        chave = os.path.abspath(arquivo)
+        # Temporários e backups do próprio revisor não são revisados
+        if chave in vistos or chave.endswith(('.tmp', '.indice.json')) \
+                or DIRETORIO_BACKUPS in chave.split(os.sep):
+            continue
+        vistos.add(chave)
+        unicos.append(arquivo)
+    return unicos
+
+
+def carregar_cache(caminho_cache):
+    if not caminho_cache or not os.path.exists(caminho_cache):
+        return {}
+    try:
+        with open(caminho_cache, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning("Cache de revisões ignorado (%s): %s", caminho_cache, e)
+        return {}
+
+
+def salvar_cache(caminho_cache, cache):
+    if not caminho_cache:
+        return
+    try:
+        _salvar_json_atomico(caminho_cache, cache)
+    except OSError as e:
+        logging.warning("Não foi possível salvar o cache de revisões: %s", e)
+
+
+def revisar_lote(arquivos, aplicar_corrigir=False, politica="reparar", processos=None, caminho_cache=CACHE_PADRAO,
+                 diretorio_backups=None, manter_backups=BACKUPS_MANTIDOS):
+    """Revisa vários arquivos em paralelo (um processo por núcleo) e devolve os resultados na ordem de entrada.
+
+    No cache ficam os hashes dos arquivos que terminaram limpos (válidos ou já
+    corrigidos); na próxima execução, arquivos com o mesmo conteúdo são ignorados.
+    """
+    cache = carregar_cache(caminho_cache)
+    conhecidos = [cache.get(os.path.abspath(a)) for a in arquivos]
+
+    # A política interativa precisa do terminal: roda no processo principal, um arquivo por vez
+    if politica == "perguntar" or processos == 1 or len(arquivos) <= 1:
+        resultados = [
+            revisar_arquivo(a, aplicar_corrigir, politica, h, diretorio_backups, manter_backups)
+            for a, h in zip(arquivos, conhecidos)
+        ]
+    else:
+        n = len(arquivos)
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            resultados = list(executor.map(
+                revisar_arquivo, arquivos, [aplicar_corrigir] * n, [politica] * n, conhecidos,
+                [diretorio_backups] * n, [manter_backups] * n,
+                chunksize=max(1, n // ((processos or os.cpu_count() or 1) * 4))
+            ))
+
+    for resultado in resultados:
+        chave = os.path.abspath(resultado["arquivo"])
+        if resultado["status"] in SUCESSOS and resultado["sha256"]:
+            cache[chave] = resultado["sha256"]
+        else:
+            cache.pop(chave, None)
+    salvar_cache(caminho_cache, cache)
+    return resultados
+
+
+def resumir(resultados):
+    contagem = {}
+    for resultado in resultados:
+        contagem[resultado["status"]] = contagem.get(resultado["status"], 0) + 1
+    return {
+        "gerado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "total": len(resultados),
+        "por_status": contagem,
+        "arquivos": resultados,
+    }
+
+
+def imprimir_relatorio(relatorio):
+    print(f"\nRelatório da revisão: {relatorio['total']} arquivo(s)")
+    for status, quantidade in sorted(relatorio["por_status"].items()):
+        print(f"  {status:<12}{quantidade:>6}")
+    problemas = [r for r in relatorio["arquivos"] if r["status"] not in (VALIDO, IGNORADO)]
+    if problemas:
+        print("\nArquivos com alterações ou problemas:")
+        for r in problemas:
+            detalhe = "; ".join(r["correcoes"]) or r["erro"] or ""
+            print(f"  [{r['status']}] {r['arquivo']}: {detalhe}")
+
 
 def main():
-    parser = argparse.ArgumentParser(description="Revisar e corrigir arquivo JSON.")
-    parser.add_argument("arquivo", help="Caminho do arquivo JSON a ser revisado")
+    parser = argparse.ArgumentParser(description="Revisar e corrigir arquivos JSON.")
+    parser.add_argument("arquivos", nargs="+", help="Arquivos, diretórios (busca *.json recursiva) ou globs")
     parser.add_argument("-l", "--log", help="Caminho para salvar o arquivo de log", default=None)
-    parser.add_argument("--corrigir", action="store_true", help="Aplicar correções após confirmação")
+    parser.add_argument("--corrigir", action="store_true", help="Reformatar também os arquivos já válidos")
+    parser.add_argument("--politica", choices=POLITICAS, default=None,
+                        help="perguntar (padrão para um único arquivo), reparar ou validar (padrão em lote)")
+    parser.add_argument("-y", "--yes", action="store_true", help="Aplica as correções sem perguntar (= --politica reparar)")
+    parser.add_argument("-j", "--processos", type=int, default=None, help="Processos em paralelo (padrão: núcleos)")
+    parser.add_argument("--cache", default=CACHE_PADRAO,
+                        help=f"Cache de hashes de arquivos já limpos (padrão: {CACHE_PADRAO}; '' desativa)")
+    parser.add_argument("--relatorio", help="Salva o relatório em JSON")
+    parser.add_argument("--backups", default=None,
+                        help=f"Diretório dos backups (padrão: {DIRETORIO_BACKUPS}/ ao lado de cada arquivo)")
+    parser.add_argument("--manter", type=int, default=BACKUPS_MANTIDOS,
+                        help=f"Versões mantidas por arquivo (padrão: {BACKUPS_MANTIDOS})")
+    parser.add_argument("--listar-backups", action="store_true", help="Lista as versões guardadas de cada arquivo")
+    parser.add_argument("--restaurar", nargs="?", type=int, const=0, default=None, metavar="VERSAO",
+                        help="Restaura o arquivo para a versão indicada (sem número: a mais recente)")
     args = parser.parse_args()
 
     configurar_logger(args.log)
 
-    if revisar_e_corrigir_json(args.arquivo, args.corrigir):
-        logging.info("Processo concluído com sucesso.")
-    else:
-        logging.error("Processo encerrado com erros ou cancelado.")
+    if args.listar_backups or args.restaurar is not None:
+        # Aqui as entradas são os arquivos originais, que podem nem existir mais
+        for arquivo in args.arquivos:
+            if args.restaurar is not None:
+                restaurar_backup(arquivo, args.restaurar or None, args.backups, args.manter)
+                continue
+            print(f"\n{arquivo}:")
+            for v in listar_backups(arquivo, args.backups):
+                print(f"  versão {v['versao']:>4}  {v['data']}  {v['tamanho']:>12,} bytes  {v['sha256'][:12]}")
+        return
+
+    arquivos = expandir_entradas(args.arquivos)
+    if not arquivos:
+        logging.error("Nenhum arquivo JSON encontrado nas entradas informadas.")
+        return
+
+    politica = "reparar" if args.yes else args.politica
+    if politica is None:
+        politica = "perguntar" if len(arquivos) == 1 else "validar"
+
+    # Um único arquivo sem cache mantém o comportamento original
+    if len(arquivos) == 1 and politica == "perguntar":
+        if revisar_e_corrigir_json(arquivos[0], args.corrigir, args.backups, args.manter):
+            logging.info("Processo concluído com sucesso.")
+        else:
+            logging.error("Processo encerrado com erros ou cancelado.")
+        return
+
+    relatorio = resumir(revisar_lote(arquivos, args.corrigir, politica, args.processos, args.cache or None,
+                                     args.backups, args.manter))
+    imprimir_relatorio(relatorio)
+    if args.relatorio:
+        with open(args.relatorio, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        logging.info("Relatório salvo em %s", args.relatorio)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,143 @@
+"""
+logging_setup.py
+
+Configuração do logging do envio. No modo assíncrono as threads de envio só
+enfileiram o registro; formatação e escrita em arquivo/terminal acontecem em
+uma thread própria (``QueueListener``), fora do caminho quente.
+
+``EventLog`` grava um evento JSON por linha para cada mudança de estado de um
+destinatário, em lotes, por uma thread de fundo.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Enfileira o registro sem formatá-lo: a mensagem é montada pelo listener.
+
+    O ``QueueHandler`` padrão formata a mensagem (e o traceback) na thread que
+    loga, pensando em filas entre processos; aqui a fila é local ao processo.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configurar_logging(
+    log_file: Optional[str] = "email_sender.log",
+    assincrono: bool = True,
+    nivel: int = logging.INFO
+) -> Optional[QueueListener]:
+    """Configura o logger raiz com arquivo e terminal; devolve o listener no modo assíncrono."""
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(nivel)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    if not assincrono:
+        for handler in handlers:
+            root.addHandler(handler)
+        return None
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Esvazia a fila antes de o processo terminar
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener: QueueListener) -> None:
+    # stop() não é idempotente: falha se o listener já foi parado
+    if listener._thread is not None:
+        listener.stop()
+
+
+class EventLog:
+    """Log estruturado (JSON lines) por destinatário, gravado em lotes por uma thread de fundo."""
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 1000,
+        flush_interval: float = 1.0
+    ) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+
+        self._file = open(path, 'a', encoding='utf-8')
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._flush_loop, name="event-log", daemon=True)
+        self._writer.start()
+
+    def emit(self, event: str, **fields: Any) -> None:
+        """Acrescenta um evento ao lote; a serialização fica para a thread de fundo."""
+        fields['ts'] = time.time()
+        fields['event'] = event
+        with self._buffer_lock:
+            self._buffer.append(fields)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        # Mesmo esquema do diário de envio: a troca do buffer fica sob o lock do arquivo
+        with self._file_lock:
+            with self._buffer_lock:
+                events, self._buffer = self._buffer, []
+            if not events or self._file.closed:
+                return
+            self._file.write(''.join(
+                json.dumps(e, ensure_ascii=False, separators=(',', ':')) + '\n' for e in events
+            ))
+            self._file.flush()
+            self.written += len(events)
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except (OSError, TypeError, ValueError) as e:
+                logging.error("Falha ao gravar o log de eventos: %s", e)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join()
+        self.flush()
+        with self._file_lock:
+            self._file.close()
+
+    def __enter__(self) -> "EventLog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
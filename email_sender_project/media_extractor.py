@@ -0,0 +1,394 @@
+"""
+media_extractor.py
+
+Extração dos registros de mídia das respostas em texto livre da Gemini e
+consolidação em um arquivo mestre indexado.
+
+- ``ExtratorJSON`` recebe o texto em blocos e entrega cada objeto de um array
+  assim que ele fecha, ignorando cercas de markdown e prosa ao redor. Em uma
+  resposta truncada, os registros completos são aproveitados e só o último,
+  incompleto, é descartado.
+- ``normalizar_registro`` leva os campos ao esquema de ``contacts_midia.json``
+  (nome, cidade, url, contato, email, endereco).
+- ``MasterMidia`` guarda os registros em JSON lines com um índice
+  chave → posição: uma mescla só acrescenta linhas ao fim do arquivo.
+"""
+
+import json
+import logging
+import os
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from contact_sources import extract_emails
+from json_revisor import aplicar_correcoes_json
+
+NAO_DISPONIVEL = "Não disponível publicamente"
+CAMPOS = ("nome", "cidade", "url", "contato", "email", "endereco")
+
+# Nomes alternativos que o modelo costuma usar para cada campo do esquema
+_SINONIMOS = {
+    "nome": ("nome", "name", "veiculo", "titulo", "title", "jornal", "portal", "blog", "site_name"),
+    "cidade": ("cidade", "city", "localizacao", "local", "sede", "location"),
+    "url": ("url", "site", "website", "link", "endereco_eletronico", "pagina"),
+    "contato": ("contato", "telefone", "telefones", "phone", "tel", "fone", "contact"),
+    "email": ("email", "e_mail", "emails", "mail", "correio_eletronico"),
+    "endereco": ("endereco", "address", "endereco_fisico", "endereco_postal"),
+}
+_CAMPO_POR_SINONIMO = {sinonimo: campo for campo, sinonimos in _SINONIMOS.items() for sinonimo in sinonimos}
+
+# Já na forma de _chave_campo ("N/A" → "n a", "-" → "")
+_VAZIOS = {"", "n a", "na", "null", "none", "desconhecido", "unknown"}
+
+# Fora de strings só importam colchetes, chaves e aspas; dentro, aspas e barras
+_ESTRUTURA = re.compile(r'[\[\]{}"]')
+_FIM_STRING = re.compile(r'["\\]')
+
+
+def _chave_campo(chave: str) -> str:
+    sem_acento = unicodedata.normalize("NFKD", chave).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", sem_acento.lower()).strip("_")
+
+
+class ExtratorJSON:
+    """Encontra arrays JSON em texto livre e entrega seus objetos à medida que ficam completos.
+
+    Um objeto que não está dentro de um array (ex.: resposta com um único
+    registro) também é entregue, desde que nenhum registro tenha saído de dentro dele.
+    """
+
+    def __init__(self) -> None:
+        self._texto = ""
+        self._pos = 0
+        self._pilha: List[str] = []
+        self._em_string = False
+        self._inicio: Optional[int] = None
+        self._profundidade_registro = 0
+        self._inicio_solto: Optional[int] = None
+        self.registros = 0
+        self.invalidos = 0
+        self.truncados = 0
+
+    def alimentar(self, bloco: str) -> Iterator[Dict[str, Any]]:
+        self._texto += bloco
+        texto = self._texto
+        pos = self._pos
+        while True:
+            if self._em_string:
+                m = _FIM_STRING.search(texto, pos)
+                if m is None:
+                    pos = len(texto)
+                    break
+                if m.group() == "\\":
+                    if m.end() >= len(texto):
+                        pos = m.start()
+                        break
+                    pos = m.end() + 1
+                    continue
+                self._em_string = False
+                pos = m.end()
+                continue
+
+            m = _ESTRUTURA.search(texto, pos)
+            if m is None:
+                pos = len(texto)
+                break
+            caractere, pos = m.group(), m.end()
+            if caractere == '"':
+                # Aspas só abrem string dentro de uma estrutura; na prosa são texto comum
+                self._em_string = bool(self._pilha)
+            elif caractere in "[{":
+                if caractere == "{" and self._inicio is None:
+                    if self._pilha and self._pilha[-1] == "[":
+                        self._inicio = m.start()
+                        self._profundidade_registro = len(self._pilha) + 1
+                    elif not self._pilha:
+                        self._inicio_solto = m.start()
+                self._pilha.append(caractere)
+            else:
+                abertura = "[" if caractere == "]" else "{"
+                if abertura not in self._pilha:
+                    # Fechamento sem abertura (prosa como "1]"): ignorado
+                    continue
+                while self._pilha.pop() != abertura:
+                    pass
+                registro = None
+                if self._inicio is not None and len(self._pilha) < self._profundidade_registro:
+                    registro = self._decodificar(texto[self._inicio:pos])
+                    self._inicio = None
+                    # O objeto externo é só um envelope dos registros
+                    self._inicio_solto = None
+                elif self._inicio_solto is not None and not self._pilha:
+                    registro = self._decodificar(texto[self._inicio_solto:pos])
+                    if registro is not None and not any(_chave_campo(k) in _CAMPO_POR_SINONIMO for k in registro):
+                        registro = None
+                    self._inicio_solto = None
+                if registro is not None:
+                    self.registros += 1
+                    yield registro
+
+        # Só o trecho de um registro ainda aberto precisa ficar em memória
+        inicio = min((i for i in (self._inicio, self._inicio_solto) if i is not None), default=pos)
+        self._texto = texto[inicio:]
+        self._pos = pos - inicio
+        if self._inicio is not None:
+            self._inicio -= inicio
+        if self._inicio_solto is not None:
+            self._inicio_solto -= inicio
+
+    def finalizar(self) -> None:
+        """Conta como truncado o registro que ficou aberto no fim do texto."""
+        if self._inicio is not None:
+            self.truncados += 1
+            logging.info("Registro incompleto no fim da resposta descartado (%s caracteres).",
+                         len(self._texto) - self._inicio)
+        self._texto, self._pos, self._pilha, self._em_string = "", 0, [], False
+        self._inicio = self._inicio_solto = None
+
+    def _decodificar(self, trecho: str) -> Optional[Dict[str, Any]]:
+        try:
+            valor = json.loads(trecho)
+        except json.JSONDecodeError:
+            # Aspas simples, chaves sem aspas, vírgulas sobrando...
+            try:
+                valor = json.loads(aplicar_correcoes_json(trecho)[0])
+            except json.JSONDecodeError:
+                self.invalidos += 1
+                return None
+        if not isinstance(valor, dict):
+            self.invalidos += 1
+            return None
+        return valor
+
+
+def extrair_registros(texto: str) -> List[Dict[str, Any]]:
+    """Todos os objetos completos dos arrays JSON encontrados no texto."""
+    extrator = ExtratorJSON()
+    registros = list(extrator.alimentar(texto))
+    extrator.finalizar()
+    return registros
+
+
+def _texto_campo(valor: Any) -> str:
+    if isinstance(valor, (list, tuple)):
+        return ", ".join(t for t in (_texto_campo(v) for v in valor) if t)
+    if isinstance(valor, dict):
+        return ", ".join(t for t in (_texto_campo(v) for v in valor.values()) if t)
+    if valor is None:
+        return ""
+    return str(valor).strip()
+
+
+def _vazio(texto: str) -> bool:
+    chave = _chave_campo(texto).replace("_", " ")
+    return chave in _VAZIOS or chave.startswith(("nao disponivel", "nao informado"))
+
+
+def normalizar_url(url: str) -> str:
+    url = url.strip().rstrip(".,;")
+    if url and not _vazio(url) and not re.match(r"^[a-z][a-z0-9+.-]*://", url, re.I):
+        url = "https://" + url.lstrip("/")
+    return url
+
+
+def normalizar_registro(registro: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """Leva um registro ao esquema de ``contacts_midia.json``; None se não houver nome."""
+    normalizado: Dict[str, Any] = {}
+    extras: Dict[str, Any] = {}
+    for chave, valor in registro.items():
+        campo = _CAMPO_POR_SINONIMO.get(_chave_campo(chave))
+        texto = _texto_campo(valor)
+        if campo is None:
+            if texto and not _vazio(texto):
+                extras[_chave_campo(chave)] = valor
+        elif texto and not _vazio(texto):
+            # Vários campos para o mesmo destino (ex.: telefone e whatsapp) são somados
+            normalizado[campo] = f"{normalizado[campo]}, {texto}" if campo in normalizado else texto
+
+    if not normalizado.get("nome"):
+        return None
+    if "url" in normalizado:
+        normalizado["url"] = normalizar_url(normalizado["url"])
+    if "email" in normalizado:
+        emails = list(dict.fromkeys(e.lower() for e in extract_emails(normalizado["email"])))
+        if emails:
+            normalizado["email"] = ", ".join(emails)
+        else:
+            del normalizado["email"]
+
+    resultado = {campo: normalizado.get(campo, NAO_DISPONIVEL) for campo in CAMPOS}
+    resultado.update(extras)
+    return resultado
+
+
+def identidades_registro(registro: Dict[str, Any], pais: str = "") -> List[str]:
+    """Todas as identidades de um veículo: cada e-mail, o site e país + nome, da mais forte para a mais fraca."""
+    identidades = ["email:" + e.casefold() for e in extract_emails(registro.get("email"))]
+    url = registro.get("url") or ""
+    if url and url != NAO_DISPONIVEL:
+        sem_esquema = re.sub(r"^[a-z][a-z0-9+.-]*://(www\.)?", "", url.strip().lower())
+        identidades.append("url:" + sem_esquema.rstrip("/"))
+    identidades.append(f"nome:{pais.casefold()}:{_chave_campo(registro.get('nome', ''))}")
+    return list(dict.fromkeys(identidades))
+
+
+def chave_registro(registro: Dict[str, Any], pais: str = "") -> str:
+    """Identidade principal de um veículo: o primeiro e-mail, senão o site, senão país + nome."""
+    return identidades_registro(registro, pais)[0]
+
+
+class MasterMidia:
+    """Arquivo mestre em JSON lines com índice ``chave → posição da última versão``.
+
+    Uma mescla lê do disco apenas os registros que já existem (por ``seek``),
+    completa os campos que faltavam e acrescenta a nova versão no fim. A chave
+    de um registro é fixada na primeira gravação; cada identidade conhecida
+    (e-mails, site, país + nome) aponta para ela em ``apelidos``, então um
+    e-mail que aparece depois completa o registro em vez de criar outro. O
+    índice guarda o tamanho do arquivo que descreve; se não bater (ex.: linhas
+    acrescentadas por fora), ele é reconstruído com uma leitura sequencial.
+    """
+
+    def __init__(self, caminho: str) -> None:
+        self.caminho = caminho
+        self.caminho_indice = f"{caminho}.indice.json"
+        self.indice: Dict[str, int] = {}
+        self.apelidos: Dict[str, str] = {}
+        self.tamanho = 0
+        self._carregar_indice()
+
+    def _carregar_indice(self) -> None:
+        tamanho = os.path.getsize(self.caminho) if os.path.exists(self.caminho) else 0
+        try:
+            with open(self.caminho_indice, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            if dados["tamanho"] == tamanho:
+                self.indice, self.apelidos, self.tamanho = dados["posicoes"], dados["apelidos"], tamanho
+                return
+            logging.info("Índice de '%s' desatualizado; reconstruindo.", self.caminho)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning("Índice de '%s' ilegível (%s); reconstruindo.", self.caminho, e)
+        self.reconstruir_indice()
+
+    def reconstruir_indice(self) -> None:
+        self.indice, self.apelidos = {}, {}
+        if not os.path.exists(self.caminho):
+            self.tamanho = 0
+            return
+        with open(self.caminho, "rb") as f:
+            posicao = 0
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                    self.indice[registro["_chave"]] = posicao
+                    self._registrar_apelidos(registro, registro["_chave"])
+                except (ValueError, KeyError):
+                    logging.warning("Linha inválida em '%s' na posição %s ignorada.", self.caminho, posicao)
+                posicao += len(linha)
+        self.tamanho = posicao
+        self._salvar_indice()
+
+    def _salvar_indice(self) -> None:
+        caminho_tmp = f"{self.caminho_indice}.tmp"
+        with open(caminho_tmp, "w", encoding="utf-8") as f:
+            json.dump({"tamanho": self.tamanho, "posicoes": self.indice, "apelidos": self.apelidos},
+                      f, separators=(",", ":"))
+        os.replace(caminho_tmp, self.caminho_indice)
+
+    def _registrar_apelidos(self, registro: Dict[str, Any], chave: str) -> None:
+        # Uma identidade que já pertence a outro registro continua com ele
+        for identidade in identidades_registro(registro, registro.get("pais", "")):
+            self.apelidos.setdefault(identidade, chave)
+        self.apelidos[chave] = chave
+
+    def _localizar(self, registro: Dict[str, Any]) -> Optional[str]:
+        for identidade in identidades_registro(registro, registro.get("pais", "")):
+            chave = self.apelidos.get(identidade)
+            if chave is not None:
+                return chave
+        return None
+
+    def __len__(self) -> int:
+        return len(self.indice)
+
+    def __contains__(self, chave: str) -> bool:
+        return self.apelidos.get(chave, chave) in self.indice
+
+    def obter(self, chave: str) -> Optional[Dict[str, Any]]:
+        """Versão atual do registro com essa chave ou com qualquer uma de suas identidades."""
+        posicao = self.indice.get(self.apelidos.get(chave, chave))
+        if posicao is None:
+            return None
+        with open(self.caminho, "rb") as f:
+            f.seek(posicao)
+            return json.loads(f.readline())
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Versão atual de cada registro, na ordem do arquivo."""
+        atuais = set(self.indice.values())
+        with open(self.caminho, "rb") as f:
+            posicao = 0
+            for linha in f:
+                if posicao in atuais:
+                    yield json.loads(linha)
+                posicao += len(linha)
+
+    def mesclar(self, registros: Iterable[Dict[str, Any]], pais: str = "", categoria: str = "") -> Dict[str, int]:
+        """Acrescenta registros novos e completa os existentes; devolve as contagens."""
+        contagem = {"novos": 0, "atualizados": 0, "inalterados": 0}
+        pendentes: Dict[str, Dict[str, Any]] = {}
+        # a+b: a leitura usa seek e a escrita sempre vai para o fim
+        with open(self.caminho, "a+b") as f:
+            for registro in registros:
+                registro = dict(registro, pais=registro.get("pais") or pais,
+                                categoria=registro.get("categoria") or categoria)
+                chave = self._localizar(registro)
+                atual = pendentes.get(chave) if chave is not None else None
+                if atual is None and chave in self.indice:
+                    f.seek(self.indice[chave])
+                    atual = json.loads(f.readline())
+                if atual is None:
+                    contagem["novos"] += 1
+                    chave = chave_registro(registro, registro["pais"])
+                    pendentes[chave] = dict(registro, _chave=chave)
+                    self._registrar_apelidos(registro, chave)
+                    continue
+
+                # Só preenche o que faltava; o que já estava no mestre é mantido
+                mesclado = dict(atual)
+                for campo, valor in registro.items():
+                    if mesclado.get(campo) in (None, "", NAO_DISPONIVEL) and valor not in (None, "", NAO_DISPONIVEL):
+                        mesclado[campo] = valor
+                if mesclado == atual:
+                    contagem["inalterados"] += 1
+                    continue
+                if chave not in pendentes:
+                    contagem["atualizados"] += 1
+                pendentes[chave] = mesclado
+                self._registrar_apelidos(mesclado, chave)
+
+            if not pendentes:
+                return contagem
+            posicao = self.tamanho
+            linhas = []
+            for chave, registro in pendentes.items():
+                linha = (json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8")
+                self.indice[chave] = posicao
+                posicao += len(linha)
+                linhas.append(linha)
+            f.write(b"".join(linhas))
+        self.tamanho = posicao
+        self._salvar_indice()
+        return contagem
+
+    def compactar(self) -> None:
+        """Reescreve o arquivo só com a versão atual de cada registro."""
+        caminho_tmp = f"{self.caminho}.tmp"
+        with open(caminho_tmp, "w", encoding="utf-8") as f:
+            for registro in self:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        os.replace(caminho_tmp, self.caminho)
+        self.reconstruir_indice()
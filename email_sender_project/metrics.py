@@ -0,0 +1,254 @@
+"""
+metrics.py
+
+Métricas do envio: contadores, gauges e histogramas de latência por estágio,
+expostos em formato texto do Prometheus (endpoint HTTP) e/ou em um arquivo
+JSON periódico, além de uma linha de progresso com ETA.
+
+Quando desativadas, ``NullMetrics`` mantém a mesma interface com operações
+vazias, então o custo no caminho quente é desprezível.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+PREFIX = "email_sender"
+
+# Limites dos baldes em segundos, do render (µs) ao SMTP (segundos)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts: List[int] = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """Estimativa pelo limite superior do balde que contém o quantil."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, name: str) -> _Timer:
+        return _Timer(self, name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {
+                    name: {
+                        "count": h.count,
+                        "sum_s": round(h.sum, 6),
+                        "p50_s": h.quantile(0.5),
+                        "p99_s": h.quantile(0.99),
+                    }
+                    for name, h in self.histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines += [f"# TYPE {PREFIX}_{name} counter", f"{PREFIX}_{name} {value}"]
+            for name, value in sorted(self.gauges.items()):
+                lines += [f"# TYPE {PREFIX}_{name} gauge", f"{PREFIX}_{name} {value}"]
+            for name, h in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {PREFIX}_{name} histogram")
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f'{PREFIX}_{name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{PREFIX}_{name}_bucket{{le="+Inf"}} {h.count}')
+                lines.append(f"{PREFIX}_{name}_sum {h.sum}")
+                lines.append(f"{PREFIX}_{name}_count {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+class NullMetrics:
+    """Mesma interface de ``Metrics``, sem custo: usada quando as métricas estão desativadas."""
+
+    enabled = False
+    _null_timer = nullcontext()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        pass
+
+    def set_gauge(self, name: str, value: float) -> None:
+        pass
+
+    def observe(self, name: str, seconds: float) -> None:
+        pass
+
+    def timer(self, name: str) -> nullcontext:
+        return self._null_timer
+
+
+def _metrics_handler(metrics: Metrics):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+class MetricsReporter:
+    """Threads de exposição: endpoint Prometheus, arquivo JSON periódico e linha de progresso."""
+
+    def __init__(
+        self,
+        metrics: Metrics,
+        prometheus_port: Optional[int] = None,
+        prometheus_host: str = "127.0.0.1",
+        stats_file: Optional[str] = None,
+        interval: float = 10.0,
+        total: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.metrics = metrics
+        self.stats_file = stats_file
+        self.interval = interval
+        self.total = total
+        self._clock = clock
+        # Taxa e ETA contam a partir do start(), não da criação das métricas
+        self._started_at: Optional[float] = None
+        self._done_at_start = 0.0
+        self._stop = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._threads: List[threading.Thread] = []
+
+        if prometheus_port is not None:
+            self._server = ThreadingHTTPServer((prometheus_host, prometheus_port), _metrics_handler(metrics))
+            self._threads.append(threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True))
+        self._threads.append(threading.Thread(target=self._loop, name="metrics-report", daemon=True))
+
+    @property
+    def address(self):
+        return self._server.server_address[:2] if self._server else None
+
+    def _done(self) -> float:
+        counters = self.metrics.snapshot()["counters"]
+        return counters.get("messages_sent_total", 0) + counters.get("messages_failed_total", 0)
+
+    def progress_line(self) -> str:
+        if self._started_at is None:
+            self._started_at, self._done_at_start = self._clock(), self._done()
+        done = self._done() - self._done_at_start
+        elapsed = max(self._clock() - self._started_at, 1e-9)
+        rate = done / elapsed
+        line = f"Progresso: {int(done)} processados ({rate:.1f} msg/s)"
+        if self.total:
+            remaining = max(0, self.total - done)
+            eta = remaining / rate if rate else float("inf")
+            eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta != float("inf") else "--:--:--"
+            line += f" de {self.total} ({done / self.total:.1%}), ETA {eta_text}"
+        return line
+
+    def write_stats(self) -> None:
+        if not self.stats_file:
+            return
+        tmp_path = f"{self.stats_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.metrics.snapshot(), f, indent=2)
+        os.replace(tmp_path, self.stats_file)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            logging.info(self.progress_line())
+            try:
+                self.write_stats()
+            except OSError as e:
+                logging.warning("Falha ao gravar arquivo de estatísticas: %s", e)
+
+    def start(self) -> "MetricsReporter":
+        self._started_at, self._done_at_start = self._clock(), self._done()
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        try:
+            self.write_stats()
+        except OSError as e:
+            logging.warning("Falha ao gravar arquivo de estatísticas: %s", e)
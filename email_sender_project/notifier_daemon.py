@@ -0,0 +1,521 @@
+"""
+notifier_daemon.py
+
+Serviço de notificações de longa duração. Recebe pedidos de envio por uma API
+HTTP local (TCP ou socket Unix) e/ou por um diretório de spool, grava cada
+destinatário em uma fila SQLite em disco e despacha a fila com o mesmo motor
+do envio em massa, mantendo sessões SMTP, template compilado e cache de anexos
+quentes entre pedidos.
+
+Pedidos transacionais têm prioridade maior que campanhas: como só uma janela
+pequena de trabalhos é retirada da fila por vez, eles passam à frente de uma
+campanha já em andamento.
+
+A entrega é "pelo menos uma vez": trabalhos que estavam em andamento quando o
+processo parou voltam para a fila na próxima inicialização.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import signal
+import socketserver
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from contact_sources import iter_contacts
+from send_journal import FAILED, QUEUED, SENT
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+
+PRIORITY_BULK = 0
+PRIORITY_TRANSACTIONAL = 10
+PRIORITY_NAMES = {
+    "bulk": PRIORITY_BULK,
+    "campanha": PRIORITY_BULK,
+    "transactional": PRIORITY_TRANSACTIONAL,
+    "transacional": PRIORITY_TRANSACTIONAL,
+}
+
+SPOOL_SUFFIXES = (".json", ".ndjson", ".jsonl", ".csv")
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    priority   INTEGER NOT NULL DEFAULT 0,
+    state      TEXT NOT NULL,
+    email      TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    reason     TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_priority ON jobs (state, priority DESC, id);
+"""
+
+Job = Tuple[int, Dict[str, Any]]
+
+
+def parse_priority(value: Any) -> int:
+    if value is None:
+        return PRIORITY_BULK
+    if isinstance(value, str) and not value.lstrip("-").isdigit():
+        if value.lower() not in PRIORITY_NAMES:
+            raise ValueError(f"Prioridade desconhecida: {value}")
+        return PRIORITY_NAMES[value.lower()]
+    return int(value)
+
+
+def parse_submission(body: Any) -> Tuple[List[Dict[str, Any]], int]:
+    """Aceita um contato, uma lista de contatos ou {"contacts": [...], "priority": ...}."""
+    priority = None
+    if isinstance(body, dict) and "contacts" in body:
+        priority = body.get("priority")
+        contacts = body["contacts"]
+    elif isinstance(body, dict):
+        priority = body.get("priority")
+        contacts = [body]
+    else:
+        contacts = body
+    if not isinstance(contacts, list):
+        raise ValueError("Esperado um contato ou uma lista de contatos.")
+
+    jobs = []
+    for contact in contacts:
+        if not isinstance(contact, dict) or not all(
+            isinstance(contact.get(field), str) and contact[field].strip() for field in ("name", "email")
+        ):
+            raise ValueError(f"Contato malformado: {contact}")
+        # Anexos vêm só da configuração do serviço (--anexo): caminhos enviados por
+        # clientes permitiriam mandar por e-mail qualquer arquivo legível pelo processo
+        jobs.append({"name": contact["name"], "email": contact["email"]})
+    return jobs, parse_priority(priority)
+
+
+class JobQueue:
+    """Fila persistente de envios em SQLite (WAL), um trabalho por destinatário."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # Conclusões são acumuladas e gravadas em lote, como no diário de envio
+        self._finished: List[Tuple] = []
+
+    def submit(self, contacts: Iterable[Dict[str, Any]], priority: int = PRIORITY_BULK) -> List[int]:
+        now = time.time()
+        ids = []
+        with self._lock, self._conn:
+            for contact in contacts:
+                cursor = self._conn.execute(
+                    "INSERT INTO jobs (priority, state, email, payload, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (priority, PENDING, contact["email"].casefold(),
+                     json.dumps(contact, ensure_ascii=False), now, now)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def claim(self, limit: int, busy: Set[str]) -> List[Job]:
+        """Retira até ``limit`` trabalhos pendentes, os de maior prioridade primeiro.
+
+        Destinatários em ``busy`` (já em andamento) ficam para depois, para que
+        dois trabalhos do mesmo endereço nunca corram ao mesmo tempo.
+        """
+        if limit <= 0:
+            return []
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, email, payload FROM jobs WHERE state = ? ORDER BY priority DESC, id LIMIT ?",
+                (PENDING, limit + len(busy))
+            ).fetchall()
+            jobs: List[Job] = []
+            taken = set(busy)
+            for job_id, email, payload in rows:
+                if email in taken:
+                    continue
+                taken.add(email)
+                jobs.append((job_id, json.loads(payload)))
+                if len(jobs) == limit:
+                    break
+            self._conn.executemany(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE id = ?",
+                [(RUNNING, time.time(), job_id) for job_id, _ in jobs]
+            )
+        return jobs
+
+    def note_attempt(self, job_id: int, reason: Optional[str]) -> None:
+        with self._lock:
+            self._finished.append((RUNNING, 1, reason, time.time(), job_id))
+
+    def finish(self, job_id: int, state: str, reason: Optional[str] = None) -> None:
+        with self._lock:
+            self._finished.append((state, 1, reason, time.time(), job_id))
+
+    def flush(self) -> None:
+        with self._lock:
+            rows, self._finished = self._finished, []
+            if not rows:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE jobs SET state = ?, attempts = attempts + ?, reason = ?, updated_at = ? WHERE id = ?",
+                    rows
+                )
+
+    def requeue_running(self) -> int:
+        """Devolve à fila os trabalhos interrompidos por uma parada anterior."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE state = ?",
+                (PENDING, time.time(), RUNNING)
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        self.flush()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, priority, state, email, attempts, reason, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "priority", "state", "email", "attempts", "reason", "created_at", "updated_at")
+        return dict(zip(keys, row))
+
+    def stats(self) -> Dict[str, int]:
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+            return dict(rows.fetchall())
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+class _JobRecorder:
+    """Recebe os estados do motor de envio (mesma interface do diário) e conclui os trabalhos."""
+
+    def __init__(self, daemon: "NotifierDaemon") -> None:
+        self.daemon = daemon
+
+    def record(
+        self,
+        email: str,
+        state: str,
+        reason: Optional[str] = None,
+        attempted: Optional[bool] = None
+    ) -> None:
+        if state == QUEUED:
+            job_id = self.daemon._in_flight.get(email.casefold())
+            if job_id is not None:
+                self.daemon.queue.note_attempt(job_id, reason)
+            return
+        self.daemon._finish(email, DONE if state == SENT else FAILED, reason)
+
+
+def _make_handler(daemon: "NotifierDaemon"):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: Any) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self) -> None:
+            if self.path.rstrip("/") != "/jobs":
+                self._reply(404, {"erro": "rota inexistente"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_REQUEST_BYTES:
+                self._reply(413, {"erro": "pedido grande demais"})
+                return
+            try:
+                contacts, priority = parse_submission(json.loads(self.rfile.read(length) or b"null"))
+            except (ValueError, TypeError) as e:
+                self._reply(400, {"erro": str(e)})
+                return
+            self._reply(202, {"ids": daemon.submit(contacts, priority)})
+
+        def do_GET(self) -> None:
+            path = self.path.rstrip("/")
+            if path == "/stats":
+                self._reply(200, daemon.queue.stats())
+                return
+            if path.startswith("/jobs/") and path[6:].isdigit():
+                job = daemon.queue.get(int(path[6:]))
+                if job is not None:
+                    self._reply(200, job)
+                    return
+            self._reply(404, {"erro": "não encontrado"})
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class NotifierDaemon:
+    def __init__(
+        self,
+        sender,
+        queue: JobQueue,
+        attachments: Optional[List[str]] = None,
+        http_address: Optional[Tuple[str, int]] = None,
+        unix_socket: Optional[str] = None,
+        spool_dir: Optional[str] = None,
+        poll_interval: float = 0.5
+    ) -> None:
+        self.sender = sender
+        self.queue = queue
+        self.attachments = attachments
+        self.spool_dir = spool_dir
+        self.poll_interval = poll_interval
+        # Janela pequena de trabalhos retirados por vez: novos pedidos prioritários não esperam a campanha
+        self.window = sender.max_workers * 2
+
+        self._in_flight: Dict[str, int] = {}
+        self._slots = threading.Condition()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._servers: List[socketserver.BaseServer] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._reporter = None
+
+        if http_address is not None:
+            self._servers.append(ThreadingHTTPServer(http_address, _make_handler(self)))
+        if unix_socket is not None:
+            if os.path.exists(unix_socket):
+                os.remove(unix_socket)
+            self._servers.append(_UnixHTTPServer(unix_socket, _make_handler(self)))
+        self.unix_socket = unix_socket
+
+    @property
+    def http_address(self) -> Optional[Tuple[str, int]]:
+        for server in self._servers:
+            if isinstance(server, ThreadingHTTPServer):
+                return server.server_address[:2]
+        return None
+
+    def submit(self, contacts: List[Dict[str, Any]], priority: int = PRIORITY_BULK) -> List[int]:
+        ids = self.queue.submit(contacts, priority)
+        self._wakeup.set()
+        return ids
+
+    def start(self) -> "NotifierDaemon":
+        requeued = self.queue.requeue_running()
+        if requeued:
+            logging.info("%s trabalhos interrompidos voltaram para a fila.", requeued)
+        self.sender.open_sessions()
+        self.sender.set_journal(_JobRecorder(self))
+        self._reporter = self.sender.start_metrics_reporter(None)
+        self._executor = ThreadPoolExecutor(max_workers=self.sender.max_workers, thread_name_prefix="notifier-worker")
+
+        self._threads.append(threading.Thread(target=self._dispatch_loop, name="notifier-dispatch", daemon=True))
+        if self.spool_dir:
+            for sub in ("processados", "erros"):
+                os.makedirs(os.path.join(self.spool_dir, sub), exist_ok=True)
+            self._threads.append(threading.Thread(target=self._spool_loop, name="notifier-spool", daemon=True))
+        for server in self._servers:
+            self._threads.append(threading.Thread(target=server.serve_forever, name="notifier-api", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logging.info("Serviço de notificações iniciado (%s trabalhos pendentes).", self.queue.stats().get(PENDING, 0))
+        return self
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Bloqueia até o spool e a fila esvaziarem e não haver envios nem reenvios em andamento."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            stats = self.queue.stats()
+            if not stats.get(PENDING) and not stats.get(RUNNING) and not self._spool_files():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        for thread in self._threads:
+            thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        # Reenvios ainda agendados são descartados aqui e retomados na próxima inicialização
+        self.sender.close_sessions()
+        self.sender.set_journal(None)
+        if self._reporter is not None:
+            self._reporter.stop()
+        self.queue.flush()
+        if self.unix_socket and os.path.exists(self.unix_socket):
+            os.remove(self.unix_socket)
+        logging.info("Serviço de notificações encerrado: %s", self.queue.stats())
+
+    def _finish(self, email: str, state: str, reason: Optional[str], job_id: Optional[int] = None) -> None:
+        key = email.casefold()
+        with self._slots:
+            current = self._in_flight.get(key)
+            # Com job_id, só conclui se o endereço ainda pertence a esse trabalho
+            if current is None or (job_id is not None and current != job_id):
+                return
+            del self._in_flight[key]
+            self._slots.notify_all()
+        self.queue.finish(current, state, reason)
+
+    def _run_job(self, job_id: int, contact: Dict[str, Any]) -> None:
+        try:
+            outcome = self.sender.process_contact(contact, self.attachments, shard=job_id)
+        except Exception as e:
+            logging.error("Falha inesperada no trabalho %s: %s", job_id, e, exc_info=True)
+            outcome = False
+        # Falhas que não passam pelo diário (ex.: erro inesperado) também encerram o trabalho
+        if outcome is False:
+            self._finish(contact["email"], FAILED, "falha no processamento", job_id)
+
+    def _dispatch_loop(self) -> None:
+        while not self._stop.is_set():
+            self.queue.flush()
+            with self._slots:
+                while len(self._in_flight) >= self.window and not self._stop.is_set():
+                    self._slots.wait(self.poll_interval)
+                free = self.window - len(self._in_flight)
+                busy = set(self._in_flight)
+            if self._stop.is_set():
+                return
+
+            jobs = self.queue.claim(free, busy)
+            if not jobs:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            with self._slots:
+                for job_id, contact in jobs:
+                    self._in_flight[contact["email"].casefold()] = job_id
+            for job_id, contact in jobs:
+                self._executor.submit(self._run_job, job_id, contact)
+
+    def _spool_files(self) -> List[str]:
+        if not self.spool_dir:
+            return []
+        names = [n for n in os.listdir(self.spool_dir) if n.lower().endswith(SPOOL_SUFFIXES)]
+        return sorted(names, key=lambda n: os.path.getmtime(os.path.join(self.spool_dir, n)))
+
+    def _spool_loop(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                names = self._spool_files()
+            except OSError as e:
+                logging.warning("Não foi possível ler o diretório de spool: %s", e)
+                continue
+            for name in names:
+                # Um arquivo problemático não pode parar a leitura do spool
+                try:
+                    self._ingest_spool_file(name)
+                except Exception as e:
+                    logging.error("Spool: falha inesperada com '%s': %s", name, e, exc_info=True)
+
+    def _ingest_spool_file(self, name: str) -> None:
+        path = os.path.join(self.spool_dir, name)
+        try:
+            contacts, priority = _read_spool_file(path)
+            ids = self.submit(contacts, priority)
+            destination = "processados"
+            logging.info("Spool: %s destinatários de '%s' enfileirados.", len(ids), name)
+        except (OSError, ValueError, TypeError) as e:
+            destination = "erros"
+            logging.error("Spool: arquivo '%s' rejeitado: %s", name, e)
+        except Exception as e:
+            destination = "erros"
+            logging.error("Spool: falha inesperada ao ler '%s': %s", name, e, exc_info=True)
+        try:
+            shutil.move(path, os.path.join(self.spool_dir, destination, name))
+        except OSError as e:
+            logging.warning("Spool: não foi possível mover '%s': %s", name, e)
+
+
+def _read_spool_file(path: str) -> Tuple[List[Dict[str, Any]], int]:
+    """Arquivos .json podem trazer {"priority": ..., "contacts": [...]}; os demais são só contatos.
+
+    O prefixo ``transacional-`` no nome do arquivo também marca a prioridade.
+    """
+    name = os.path.basename(path).lower()
+    if name.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            body = json.load(f)
+    else:
+        body = list(iter_contacts(path))
+    contacts, priority = parse_submission(body)
+    if name.startswith(("transacional-", "transactional-")):
+        priority = max(priority, PRIORITY_TRANSACTIONAL)
+    return contacts, priority
+
+
+# 🚀 Ponto de entrada
+if __name__ == "__main__":
+    from email_sender import EmailSender
+    from logging_setup import configurar_logging
+
+    parser = argparse.ArgumentParser(description="Serviço de notificações por e-mail com fila persistente.")
+    parser.add_argument("--fila", default="notifier_queue.db", help="Fila SQLite (padrão: notifier_queue.db)")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço da API HTTP (padrão: 127.0.0.1)")
+    parser.add_argument("--porta", type=int, default=None, help="Porta da API HTTP")
+    parser.add_argument("--socket", default=None, help="Caminho de um socket Unix para a API")
+    parser.add_argument("--spool", default=None, help="Diretório monitorado com arquivos de contatos")
+    parser.add_argument("--anexo", action="append", dest="anexos", help="Anexo padrão dos envios (pode ser repetido)")
+    parser.add_argument("--dry-run", action="store_true", help="Simula o envio sem enviar e-mails")
+    parser.add_argument("--todas-contas", action="store_true",
+                        help="Distribui os envios entre todas as contas de EMAILS_JSON")
+    parser.add_argument("--log", default="email_sender.log", help="Arquivo de log (padrão: email_sender.log)")
+    parser.add_argument("--log-sincrono", action="store_true",
+                        help="Grava o log na própria thread de envio, sem a fila assíncrona")
+    args = parser.parse_args()
+    configurar_logging(args.log, assincrono=not args.log_sincrono)
+
+    if args.porta is None and args.socket is None and args.spool is None:
+        parser.error("informe ao menos uma entrada: --porta, --socket ou --spool")
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    sender = EmailSender(dry_run=args.dry_run, shard_accounts=args.todas_contas)
+    daemon = NotifierDaemon(
+        sender,
+        JobQueue(args.fila),
+        attachments=args.anexos,
+        http_address=(args.host, args.porta) if args.porta is not None else None,
+        unix_socket=args.socket,
+        spool_dir=args.spool
+    ).start()
+    try:
+        stop.wait()
+    finally:
+        daemon.stop()
+        daemon.queue.close()
@@ -0,0 +1,118 @@
+"""
+rate_limiter.py
+
+Controle de ritmo de envio por conta: token bucket para mensagens/segundo e
+janela deslizante para mensagens/hora. Seguro para uso entre threads.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+
+class TokenBucket:
+    """Token bucket clássico: ``rate`` fichas por segundo, no máximo ``capacity`` acumuladas."""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("A taxa do token bucket deve ser positiva.")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._last = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self) -> float:
+        """Segundos até existir uma ficha disponível (0 se já existe)."""
+        self._refill()
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def consume(self) -> None:
+        self._tokens -= 1
+
+
+class SlidingWindow:
+    """Permite no máximo ``limit`` eventos em qualquer janela de ``window`` segundos."""
+
+    def __init__(
+        self,
+        limit: int,
+        window: float,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        if limit <= 0:
+            raise ValueError("O limite da janela deve ser positivo.")
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._events: Deque[float] = deque()
+
+    def wait_time(self) -> float:
+        now = self._clock()
+        while self._events and now - self._events[0] >= self.window:
+            self._events.popleft()
+        if len(self._events) < self.limit:
+            return 0.0
+        return self.window - (now - self._events[0])
+
+    def consume(self) -> None:
+        self._events.append(self._clock())
+
+
+class RateLimiter:
+    """Combina o limite por segundo e o limite por hora de uma conta.
+
+    ``acquire`` bloqueia apenas a thread chamadora até que ambos os limites
+    permitam mais uma mensagem, e devolve o tempo de espera em segundos.
+    """
+
+    def __init__(
+        self,
+        per_second: Optional[float] = None,
+        per_hour: Optional[int] = None,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ) -> None:
+        self._limits = []
+        if per_second:
+            self._limits.append(TokenBucket(per_second, burst, clock))
+        if per_hour:
+            self._limits.append(SlidingWindow(int(per_hour), 3600.0, clock))
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._limits)
+
+    def try_acquire(self) -> float:
+        """Consome uma ficha se possível; caso contrário devolve quanto esperar."""
+        with self._lock:
+            wait = max((limit.wait_time() for limit in self._limits), default=0.0)
+            if wait <= 0:
+                for limit in self._limits:
+                    limit.consume()
+            return wait
+
+    def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return waited
+            self._sleep(wait)
+            waited += wait
@@ -0,0 +1,123 @@
+"""
+retry_queue.py
+
+Classificação de erros SMTP (temporário x permanente) e fila de reenvio
+adiado com backoff exponencial e jitter. Os reenvios rodam em uma thread
+própria, então o laço principal continua enviando enquanto espera.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import smtplib
+import socket
+import threading
+import time
+from typing import Callable, List, Tuple
+
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+
+def classify_smtp_error(error: BaseException) -> str:
+    """Respostas 4xx e falhas de conexão são temporárias; 5xx e o resto, permanentes."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return TRANSIENT if codes and all(400 <= code < 500 for code in codes) else PERMANENT
+    if isinstance(error, smtplib.SMTPResponseException):
+        return TRANSIENT if 400 <= error.smtp_code < 500 else PERMANENT
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, socket.timeout, ConnectionError)):
+        return TRANSIENT
+    return PERMANENT
+
+
+class RetryScheduler:
+    """Agenda tarefas para reexecução após ``base_delay * 2**(tentativa-1)`` segundos
+    (limitado a ``max_delay``), com jitter de até metade do intervalo."""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        rng: Callable[[], float] = random.random
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng
+        self._heap: List[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="retry-scheduler", daemon=True)
+        self._thread.start()
+
+        self.scheduled = 0
+        self.recovered = 0
+        self.exhausted = 0
+        self.permanent = 0
+        self.total_delay = 0.0
+
+    def note_recovered(self) -> None:
+        with self._cond:
+            self.recovered += 1
+
+    def note_permanent(self) -> None:
+        with self._cond:
+            self.permanent += 1
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay / 2 + self._rng() * delay / 2
+
+    def schedule(self, task: Callable[[], None], attempt: int) -> bool:
+        """Agenda a tentativa seguinte à ``attempt``; False se as tentativas se esgotaram."""
+        if attempt >= self.max_attempts:
+            with self._cond:
+                self.exhausted += 1
+            return False
+        delay = self.backoff(attempt)
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), task))
+            self.scheduled += 1
+            self.total_delay += delay
+            self._cond.notify_all()
+        return True
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap) + self._running
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+                _, _, task = heapq.heappop(self._heap)
+                self._running += 1
+            try:
+                task()
+            except Exception as e:
+                logging.error("Falha inesperada em reenvio agendado: %s", e, exc_info=True)
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._cond.notify_all()
+
+    def drain(self) -> None:
+        """Bloqueia até que todas as tentativas agendadas (inclusive as reagendadas) terminem."""
+        with self._cond:
+            while self._heap or self._running:
+                self._cond.wait()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,145 @@
+"""
+send_journal.py
+
+Diário durável de envio por destinatário (SQLite em modo WAL). As gravações
+são acumuladas em memória e persistidas em lotes por uma thread de fundo, com
+um fsync por lote, para não atrasar o laço de envio. Permite retomar uma
+campanha interrompida sem reenviar para quem já recebeu.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+QUEUED = "queued"
+SENT = "sent"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipients (
+    campaign   TEXT NOT NULL,
+    email      TEXT NOT NULL,
+    state      TEXT NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    reason     TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (campaign, email)
+)
+"""
+
+_UPSERT = """
+INSERT INTO recipients (campaign, email, state, attempts, reason, updated_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (campaign, email) DO UPDATE SET
+    state = excluded.state,
+    attempts = recipients.attempts + excluded.attempts,
+    reason = excluded.reason,
+    updated_at = excluded.updated_at
+"""
+
+
+class SendJournal:
+    def __init__(
+        self,
+        path: str,
+        campaign: str,
+        batch_size: int = 500,
+        flush_interval: float = 1.0
+    ) -> None:
+        self.path = path
+        self.campaign = campaign
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: cada commit de lote é um fsync, então nada confirmado se perde
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+        self._buffer: List[Tuple] = []
+        self._buffer_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._completed: Set[str] = set()
+        self._flusher = threading.Thread(target=self._flush_loop, name="send-journal", daemon=True)
+        self._flusher.start()
+
+    def load_completed(self) -> int:
+        """Carrega os destinatários já enviados desta campanha para consulta O(1)."""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT email FROM recipients WHERE campaign = ? AND state = ?",
+                (self.campaign, SENT)
+            )
+            self._completed = {email for (email,) in rows}
+        return len(self._completed)
+
+    def is_completed(self, email: str) -> bool:
+        return email.casefold() in self._completed
+
+    def record(
+        self,
+        email: str,
+        state: str,
+        reason: Optional[str] = None,
+        attempted: Optional[bool] = None
+    ) -> None:
+        # Por padrão só "sent"/"failed" contam tentativa; reenvios adiados passam attempted=True
+        if attempted is None:
+            attempted = state != QUEUED
+        attempts = 1 if attempted else 0
+        row = (self.campaign, email.casefold(), state, attempts, reason, time.time())
+        with self._buffer_lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        # O lock do banco cobre a troca do buffer para que lotes nunca sejam gravados fora de ordem
+        with self._db_lock:
+            with self._buffer_lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return
+            with self._conn:
+                self._conn.executemany(_UPSERT, rows)
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logging.error("Falha ao gravar o diário de envio: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        self.flush()
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM recipients WHERE campaign = ? GROUP BY state",
+                (self.campaign,)
+            )
+            return dict(rows.fetchall())
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._flusher.join()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def __enter__(self) -> "SendJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,176 @@
+"""
+smtp_pool.py
+
+Pool de sessões SMTP autenticadas, reaproveitadas entre mensagens de uma mesma
+campanha para evitar um handshake TLS + login por destinatário.
+"""
+
+import logging
+import queue
+import smtplib
+import ssl
+import threading
+from email.message import EmailMessage
+from typing import Optional, Union
+
+from metrics import Metrics, NullMetrics
+
+
+def connect_smtp(
+    host: str,
+    port: int,
+    security: str = "ssl",
+    timeout: float = 30.0,
+    context: Optional[ssl.SSLContext] = None
+) -> smtplib.SMTP:
+    """Abre uma conexão SMTP segundo o modo de segurança ('ssl', 'starttls' ou 'none')."""
+    if security == "ssl":
+        return smtplib.SMTP_SSL(host, port, timeout=timeout, context=context or ssl.create_default_context())
+    server = smtplib.SMTP(host, port, timeout=timeout)
+    if security == "starttls":
+        server.starttls(context=context or ssl.create_default_context())
+    elif security != "none":
+        server.close()
+        raise ValueError(f"Modo de segurança SMTP desconhecido: {security}")
+    return server
+
+
+class _Session:
+    def __init__(self, server: smtplib.SMTP) -> None:
+        self.server = server
+        self.sent = 0
+
+    def close(self) -> None:
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+
+
+class SMTPSessionPool:
+    """Mantém até ``size`` sessões SMTP abertas e autenticadas.
+
+    Cada sessão é reciclada depois de ``max_messages_per_session`` mensagens,
+    respeitando o limite por sessão dos provedores, e reaberta de forma
+    transparente quando o servidor encerra a conexão.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: Optional[str],
+        password: Optional[str],
+        size: int = 1,
+        max_messages_per_session: int = 100,
+        security: str = "ssl",
+        timeout: float = 30.0,
+        context: Optional[ssl.SSLContext] = None,
+        metrics: Union[Metrics, NullMetrics, None] = None
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = max(1, size)
+        self.max_messages_per_session = max_messages_per_session
+        self.security = security
+        self.timeout = timeout
+        self.context = context
+        self.metrics = metrics or NullMetrics()
+
+        self._idle: "queue.LifoQueue[_Session]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.connections_opened = 0
+        self.reconnects = 0
+        self.rotations = 0
+        self.messages_sent = 0
+
+    @property
+    def handshakes_saved(self) -> int:
+        """Handshakes (TLS + login) evitados em relação a uma conexão por mensagem."""
+        return max(0, self.messages_sent - self.connections_opened)
+
+    def _open_session(self) -> _Session:
+        with self.metrics.timer("smtp_connect_seconds"):
+            server = connect_smtp(self.host, self.port, self.security, self.timeout, self.context)
+        try:
+            if self.user and self.password:
+                with self.metrics.timer("smtp_login_seconds"):
+                    server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        self.metrics.inc("smtp_connections_total")
+        return _Session(server)
+
+    def _send(self, session: _Session, msg: EmailMessage) -> None:
+        with self.metrics.timer("smtp_send_seconds"):
+            session.server.send_message(msg)
+
+    def _take_session(self) -> _Session:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open_session()
+
+    def _release_session(self, session: _Session) -> None:
+        if self._closed:
+            session.close()
+        elif self.max_messages_per_session and session.sent >= self.max_messages_per_session:
+            with self._lock:
+                self.rotations += 1
+            session.close()
+        else:
+            self._idle.put(session)
+
+    def send_message(self, msg: EmailMessage) -> None:
+        if self._closed:
+            raise RuntimeError("Pool de sessões SMTP já foi encerrado.")
+
+        with self._slots:
+            session = self._take_session()
+            try:
+                try:
+                    self._send(session, msg)
+                except smtplib.SMTPServerDisconnected:
+                    # Sessão ociosa derrubada pelo servidor: reconecta e reenvia uma vez
+                    logging.info("Sessão SMTP encerrada pelo servidor, reconectando para %s", msg['To'])
+                    session.server.close()
+                    session = self._open_session()
+                    with self._lock:
+                        self.reconnects += 1
+                    self.metrics.inc("smtp_reconnects_total")
+                    self._send(session, msg)
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # O servidor respondeu, então a sessão continua utilizável
+                self._release_session(session)
+                raise
+            except Exception:
+                session.server.close()
+                raise
+
+            session.sent += 1
+            with self._lock:
+                self.messages_sent += 1
+            self._release_session(session)
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            session.close()
+
+    def __enter__(self) -> "SMTPSessionPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
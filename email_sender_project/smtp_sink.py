@@ -0,0 +1,131 @@
+"""
+smtp_sink.py
+
+Servidor SMTP local e em processo, usado como substituto do provedor real em
+testes e benchmarks. Aceita qualquer credencial, não entrega nada e apenas
+contabiliza conexões e mensagens recebidas.
+"""
+
+import socketserver
+import threading
+from typing import Optional, Tuple
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _readline(self) -> Optional[str]:
+        raw = self.rfile.readline()
+        if not raw:
+            return None
+        return raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+    def handle(self) -> None:
+        sink: "SMTPSink" = self.server.sink
+        sink._register_connection()
+        messages_here = 0
+        self._reply("220 smtp-sink ESMTP pronto")
+
+        while True:
+            line = self._readline()
+            if line is None:
+                return
+            verb = line.split(" ", 1)[0].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-smtp-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                self.wfile.flush()
+            elif verb == "AUTH":
+                parts = line.split()
+                mechanism = parts[1].upper() if len(parts) > 1 else ""
+                if mechanism == "PLAIN" and len(parts) < 3:
+                    self._reply("334 ")
+                    self._readline()
+                elif mechanism == "LOGIN":
+                    if len(parts) < 3:
+                        self._reply("334 VXNlcm5hbWU6")
+                        self._readline()
+                    self._reply("334 UGFzc3dvcmQ6")
+                    self._readline()
+                self._reply("235 2.7.0 Autenticado")
+            elif verb in ("MAIL", "RCPT"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 Termine com <CRLF>.<CRLF>")
+                size = 0
+                while True:
+                    raw = self.rfile.readline()
+                    if not raw or raw in (b".\r\n", b".\n"):
+                        break
+                    size += len(raw)
+                sink._register_message(size)
+                messages_here += 1
+                self._reply("250 OK mensagem aceita")
+                if sink.drop_after and messages_here >= sink.drop_after:
+                    # Simula o provedor encerrando a sessão após N mensagens
+                    return
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Até logo")
+                return
+            else:
+                self._reply("502 Comando não implementado")
+
+
+class _ThreadingSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Servidor SMTP descartável rodando em uma thread de fundo.
+
+    ``drop_after`` derruba a conexão depois de N mensagens, simulando
+    provedores que limitam o número de mensagens por sessão.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        drop_after: int = 0
+    ) -> None:
+        self.drop_after = drop_after
+        self.connections = 0
+        self.messages = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingSMTPServer((host, port), _SMTPSinkHandler)
+        self._server.sink = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def _register_connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def _register_message(self, size: int) -> None:
+        with self._lock:
+            self.messages += 1
+            self.bytes_received += size
+
+    def start(self) -> "SMTPSink":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "SMTPSink":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,639 @@
+"""
+template_build.py
+
+Etapa de build do template HTML, executada uma vez por campanha (ou lida do
+cache em disco pelo hash do template):
+
+- regras CSS simples do ``<style>`` (tag, ``.classe``, ``#id`` e descendentes)
+  são aplicadas como ``style=""`` nos elementos; ``@media`` e seletores que não
+  dá para aplicar elemento a elemento continuam no ``<style>``, minificados
+- o HTML é minificado: comentários e espaços entre blocos saem, espaços no
+  texto e nos atributos ``style`` são colapsados
+- a alternativa em texto puro é gerada a partir do HTML
+
+A saída continua sendo um template Jinja: antes da análise do HTML, cada trecho
+Jinja é trocado por um marcador neutro e recolocado intacto no fim, inclusive
+dentro de atributos (``href="{{ url | default("x") }}"``). Assim o renderizador e
+o caminho rápido funcionam sobre ela. Instruções Jinja dentro de uma tag
+(``<a {% if %}...>``) não são suportadas: o build é ignorado e o template
+original é usado.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import textwrap
+from dataclasses import asdict, dataclass
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Muda quando a saída do build muda, invalidando o cache em disco
+BUILD_VERSION = "2"
+
+_BLOCK_TAGS = {
+    "html", "head", "body", "meta", "title", "style", "link", "script", "div", "p", "br", "hr", "table", "thead",
+    "tbody", "tfoot", "tr", "td", "th", "ul", "ol", "li", "h1", "h2", "h3", "h4", "h5", "h6", "center",
+    "section", "header", "footer", "article", "nav", "blockquote", "!doctype",
+}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_RAW_TAGS = {"pre", "textarea", "script"}
+_PARAGRAPH_TAGS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "table", "ul", "ol", "blockquote"}
+_LINE_TAGS = {"div", "tr", "li", "br", "center", "section", "header", "footer", "article"}
+
+_JINJA_IN_TAG = re.compile(r"<[^<>]*\{[%#]")
+_JINJA_EXPR = re.compile(r"\{\{.*?\}\}|\{%.*?%\}", re.S)
+_JINJA_ANY = re.compile(r"\{\{.*?\}\}|\{%.*?%\}|\{#.*?#\}", re.S)
+# Linhas de até 78 bytes deixam o texto sair em 8bit, sem quoted-printable
+TEXT_WIDTH = 76
+_COMPOUND = re.compile(r"^(?P<tag>[a-z][a-z0-9]*|\*)?(?P<rest>(?:[.#][\w-]+)*)$", re.I)
+_WS = re.compile(r"\s+")
+
+
+@dataclass
+class BuildReport:
+    """Tamanhos (em bytes UTF-8) do template antes e depois do build."""
+    original_bytes: int
+    html_bytes: int
+    text_bytes: int
+    inlined_rules: int
+    kept_rules: int
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - self.html_bytes
+
+    @property
+    def saved_ratio(self) -> float:
+        return self.saved_bytes / self.original_bytes if self.original_bytes else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"HTML {self.original_bytes:,} → {self.html_bytes:,} bytes por mensagem "
+            f"({self.saved_bytes:,} bytes a menos, {self.saved_ratio:.0%}); "
+            f"{self.inlined_rules} regras CSS aplicadas nos elementos, {self.kept_rules} mantidas no <style>; "
+            f"texto puro: {self.text_bytes:,} bytes"
+        )
+
+
+@dataclass
+class BuiltTemplate:
+    html: str
+    text: str
+    report: BuildReport
+
+
+# --- CSS ----------------------------------------------------------------
+
+
+def minify_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = _WS.sub(" ", css)
+    css = re.sub(r"\s*([{}:;,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def parse_declarations(style: str) -> Dict[str, str]:
+    """``"a: 1; b: 2"`` → ``{"a": "1", "b": "2"}``, mantendo a ordem."""
+    declarations: Dict[str, str] = {}
+    for item in style.split(";"):
+        name, sep, value = item.partition(":")
+        if sep and name.strip() and value.strip():
+            declarations[name.strip().lower()] = _WS.sub(" ", value.strip())
+    return declarations
+
+
+def format_declarations(declarations: Dict[str, str]) -> str:
+    return ";".join(f"{name}:{value}" for name, value in declarations.items())
+
+
+def _split_blocks(css: str) -> List[Tuple[str, str]]:
+    """Divide o CSS em (prelúdio, corpo) no nível superior, respeitando chaves aninhadas."""
+    blocks = []
+    depth, start, brace = 0, 0, 0
+    for i, char in enumerate(css):
+        if char == "{":
+            if depth == 0:
+                brace = i
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:brace].strip(), css[brace + 1:i]))
+                start = i + 1
+    return blocks
+
+
+@dataclass
+class _Rule:
+    selector: List[Tuple[Optional[str], Tuple[str, ...], Optional[str]]]
+    specificity: Tuple[int, int, int]
+    order: int
+    declarations: Dict[str, str]
+
+
+def _parse_selector(selector: str) -> Optional[List[Tuple[Optional[str], Tuple[str, ...], Optional[str]]]]:
+    """Seletor de descendentes simples → lista de (tag, classes, id); None se não suportado."""
+    compounds = []
+    for part in selector.split():
+        m = _COMPOUND.match(part)
+        if not m or not part:
+            return None
+        tag = m.group("tag")
+        rest = m.group("rest")
+        classes = tuple(re.findall(r"\.([\w-]+)", rest))
+        ids = re.findall(r"#([\w-]+)", rest)
+        if len(ids) > 1:
+            return None
+        compounds.append((None if tag in (None, "*") else tag.lower(), classes, ids[0] if ids else None))
+    return compounds or None
+
+
+def split_stylesheet(css: str) -> Tuple[List[_Rule], List[str]]:
+    """Separa as regras aplicáveis elemento a elemento das que precisam ficar no ``<style>``."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    rules: List[_Rule] = []
+    kept: List[str] = []
+    for prelude, body in _split_blocks(css):
+        if prelude.startswith("@"):
+            kept.append(f"{prelude}{{{body}}}")
+            continue
+        declarations = parse_declarations(body)
+        unsupported = []
+        for selector in prelude.split(","):
+            selector = selector.strip()
+            parsed = _parse_selector(selector)
+            if parsed is None:
+                unsupported.append(selector)
+                continue
+            specificity = (
+                sum(1 for _, _, id_ in parsed if id_),
+                sum(len(classes) for _, classes, _ in parsed),
+                sum(1 for tag, _, _ in parsed if tag),
+            )
+            rules.append(_Rule(parsed, specificity, len(rules), declarations))
+        if unsupported:
+            kept.append(f"{','.join(unsupported)}{{{body}}}")
+    return rules, kept
+
+
+def _matches(compound: Tuple[Optional[str], Tuple[str, ...], Optional[str]], element: Tuple[str, set, str]) -> bool:
+    tag, classes, id_ = compound
+    el_tag, el_classes, el_id = element
+    return (tag is None or tag == el_tag) and all(c in el_classes for c in classes) and (id_ is None or id_ == el_id)
+
+
+def _rule_matches(rule: _Rule, element: Tuple[str, set, str], ancestors: List[Tuple[str, set, str]]) -> bool:
+    *parents, last = rule.selector
+    if not _matches(last, element):
+        return False
+    # Descendentes: cada composto anterior precisa casar com algum ancestral, em ordem
+    depth = len(ancestors)
+    for compound in reversed(parents):
+        while depth and not _matches(compound, ancestors[depth - 1]):
+            depth -= 1
+        if not depth:
+            return False
+        depth -= 1
+    return True
+
+
+# --- HTML ---------------------------------------------------------------
+
+
+def _mask_jinja(source: str) -> Tuple[str, Callable[[str], str]]:
+    """Troca cada trecho Jinja por um marcador que o HTMLParser não altera; devolve o texto e a função que os recoloca.
+
+    Sem isso, aspas e espaços de ``{{ ... }}`` dentro de atributos seriam
+    escapados ou normalizados, e o template deixaria de compilar.
+    """
+    # Letras minúsculas e dígitos: sobrevivem a atributos, CSS e nomes de atributo
+    prefix = "jinja"
+    while prefix in source:
+        prefix += "x"
+    expressions: List[str] = []
+
+    def mask(m: "re.Match[str]") -> str:
+        expressions.append(m.group())
+        return f"{prefix}{len(expressions) - 1}q"
+
+    marker = re.compile(re.escape(prefix) + r"(\d+)q")
+    return _JINJA_ANY.sub(mask, source), lambda text: marker.sub(lambda m: expressions[int(m.group(1))], text)
+
+
+def _escape_attr(value: str) -> str:
+    return value.replace("&", "&amp;").replace('"', "&quot;")
+
+
+class _Builder(HTMLParser):
+    def __init__(self, rules: List[_Rule], minify: bool) -> None:
+        super().__init__(convert_charrefs=False)
+        self.rules = rules
+        self.minify = minify
+        self.style_slot: Optional[int] = None
+        self.out: List[str] = []
+        self.stack: List[Tuple[str, set, str]] = []
+        self.raw_depth = 0
+        self.in_style = False
+        self.trim_next = True
+
+    # Texto ---------------------------------------------------------------
+
+    def _text(self, text: str) -> None:
+        if self.in_style:
+            return
+        if not self.minify or self.raw_depth:
+            self.out.append(text)
+            return
+        text = _WS.sub(" ", text)
+        if self.trim_next:
+            text = text.lstrip()
+        if text:
+            self.out.append(text)
+            self.trim_next = False
+
+    def _block_boundary(self) -> None:
+        # Espaço encostado em um bloco não aparece na renderização
+        if self.minify and not self.raw_depth and self.out and not self.out[-1].startswith("<"):
+            self.out[-1] = self.out[-1].rstrip()
+            if not self.out[-1]:
+                self.out.pop()
+        self.trim_next = True
+
+    def handle_data(self, data: str) -> None:
+        self._text(data)
+
+    def handle_entityref(self, name: str) -> None:
+        self._text(f"&{name};")
+
+    def handle_charref(self, name: str) -> None:
+        self._text(f"&#{name};")
+
+    def handle_comment(self, data: str) -> None:
+        # Comentários condicionais do Outlook precisam continuar no HTML
+        if not self.minify or data.lstrip().startswith("[if") or data.rstrip().endswith("<![endif]"):
+            self.out.append(f"<!--{data}-->")
+
+    def handle_decl(self, decl: str) -> None:
+        self.out.append(f"<!{decl}>")
+        self.trim_next = True
+
+    # Tags ----------------------------------------------------------------
+
+    def _format_tag(self, tag: str, attrs: List[Tuple[str, Optional[str]]], close: bool) -> str:
+        element = (tag, set((dict(attrs).get("class") or "").split()), dict(attrs).get("id") or "")
+        inline = None
+        if self.rules:
+            matched = [r for r in self.rules if _rule_matches(r, element, self.stack)]
+            if matched:
+                inline = {}
+                for rule in sorted(matched, key=lambda r: (r.specificity, r.order)):
+                    inline.update(rule.declarations)
+
+        parts = [tag]
+        has_style = False
+        for name, value in attrs:
+            if name == "style":
+                has_style = True
+                value = self._style_value(value or "", inline)
+            if value is None:
+                parts.append(name)
+            else:
+                parts.append(f'{name}="{_escape_attr(value)}"')
+        if inline and not has_style:
+            parts.append(f'style="{_escape_attr(self._style_value("", inline))}"')
+        return f"<{' '.join(parts)}{' /' if close else ''}>"
+
+    def _style_value(self, style: str, inline: Optional[Dict[str, str]]) -> str:
+        if not inline and not self.minify:
+            return style
+        declarations = dict(inline or {})
+        # O style original vence, exceto contra !important da folha de estilo
+        for name, value in parse_declarations(style).items():
+            if "!important" not in declarations.get(name, "") or "!important" in value:
+                declarations.pop(name, None)
+                declarations[name] = value
+        return format_declarations(declarations)
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag == "style":
+            # A folha de estilo é reescrita no fim, no lugar do primeiro <style>
+            self.in_style = True
+            if self.style_slot is None:
+                self._block_boundary()
+                self.style_slot = len(self.out)
+                # Marcador no formato de tag, para não ser tratado como texto
+                self.out.append("<style>")
+            return
+        if tag in _BLOCK_TAGS:
+            self._block_boundary()
+        self.out.append(self._format_tag(tag, attrs, close=False))
+        if tag in _RAW_TAGS:
+            self.raw_depth += 1
+        if tag not in _VOID_TAGS:
+            self.stack.append((tag, set((dict(attrs).get("class") or "").split()), dict(attrs).get("id") or ""))
+        if tag in _BLOCK_TAGS:
+            self.trim_next = True
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in _BLOCK_TAGS:
+            self._block_boundary()
+        self.out.append(self._format_tag(tag, attrs, close=True))
+        if tag in _BLOCK_TAGS:
+            self.trim_next = True
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "style" and self.in_style:
+            self.in_style = False
+            return
+        if tag in _VOID_TAGS:
+            return
+        if tag in _BLOCK_TAGS:
+            self._block_boundary()
+        self.out.append(f"</{tag}>")
+        if tag in _RAW_TAGS and self.raw_depth:
+            self.raw_depth -= 1
+        # Fecha também o que ficou aberto dentro (HTML permissivo)
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                del self.stack[i:]
+                break
+        if tag in _BLOCK_TAGS:
+            self.trim_next = True
+
+
+class _TextExtractor(HTMLParser):
+    """HTML → texto puro: blocos viram quebras de linha e links, "texto (url)"."""
+
+    def __init__(self, restore: Callable[[str], str] = lambda text: text) -> None:
+        super().__init__(convert_charrefs=True)
+        self.restore = restore
+        self.parts: List[str] = []
+        self.skip_depth = 0
+        self.skip_stack: List[str] = []
+        self.links: List[Optional[str]] = []
+        self.link_start: List[int] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        attributes = dict(attrs)
+        style = (attributes.get("style") or "").replace(" ", "").lower()
+        if self.skip_depth or tag in ("head", "style", "script", "title") or "display:none" in style:
+            if tag not in _VOID_TAGS:
+                self.skip_depth += 1
+            return
+        if tag in _PARAGRAPH_TAGS:
+            self.parts.append("\n\n")
+        elif tag in _LINE_TAGS:
+            self.parts.append("\n")
+        if tag == "li":
+            self.parts.append("- ")
+        if tag == "a":
+            self.links.append(attributes.get("href"))
+            self.link_start.append(len(self.parts))
+
+    def handle_endtag(self, tag: str) -> None:
+        if self.skip_depth:
+            if tag not in _VOID_TAGS:
+                self.skip_depth -= 1
+            return
+        if tag in _PARAGRAPH_TAGS:
+            self.parts.append("\n\n")
+        elif tag in _LINE_TAGS and tag != "br":
+            self.parts.append("\n")
+        if tag == "a" and self.links:
+            href, start = self.links.pop(), self.link_start.pop()
+            label = _WS.sub(" ", "".join(self.parts[start:])).strip()
+            if href and href != label and not href.startswith(("#", "mailto:")):
+                self.parts.append(f" ({href})")
+
+    def handle_data(self, data: str) -> None:
+        if not self.skip_depth:
+            self.parts.append(_WS.sub(" ", data))
+
+    def text(self) -> str:
+        expressions: List[str] = []
+
+        def protect(m: "re.Match[str]") -> str:
+            # Expressões Jinja não podem ser quebradas ao meio
+            expressions.append(m.group())
+            return f"\x00{len(expressions) - 1}\x00"
+
+        def restore(text: str) -> str:
+            return re.sub(r"\x00(\d+)\x00", lambda m: expressions[int(m.group(1))], text)
+
+        raw = _JINJA_EXPR.sub(protect, self.restore("".join(self.parts)))
+        lines = []
+        for line in raw.split("\n"):
+            line = re.sub(" {2,}", " ", line).strip()
+            # O limite do MIME é em bytes: acentos ocupam dois, então a largura diminui até caber
+            width = TEXT_WIDTH
+            while True:
+                wrapped = textwrap.wrap(line, width, break_long_words=False, break_on_hyphens=False) or [""]
+                if width <= 40 or all(len(restore(w).encode("utf-8")) <= TEXT_WIDTH for w in wrapped):
+                    break
+                width -= 2
+            lines.extend(wrapped)
+        return restore(re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip() + "\n")
+
+
+def html_to_text(source: str) -> str:
+    masked, restore = _mask_jinja(source)
+    extractor = _TextExtractor(restore)
+    extractor.feed(masked)
+    extractor.close()
+    return extractor.text()
+
+
+def wrap_html(source: str, width: int = TEXT_WIDTH) -> str:
+    """Quebra o HTML minificado em linhas de até ``width`` bytes, só onde uma quebra equivale a espaço.
+
+    Pontos de quebra: espaços no texto e entre atributos, fronteiras de tags de
+    bloco, e no CSS (``<style>`` e atributos ``style``) espaços fora de aspas e o
+    fim de cada declaração. Nada é quebrado dentro de expressões Jinja, de
+    ``<pre>``/``<textarea>``/``<script>`` ou de valores de outros atributos.
+    Com todas as linhas curtas, o MIME envia o HTML em 8bit em vez de quoted-printable.
+    """
+    out: List[str] = []
+    line_bytes = 0
+    last_break: Optional[Tuple[int, bool]] = None  # (posição, substitui um espaço)
+    in_tag = in_css = css_value = False
+    raw_end = quote = css_quote = jinja_end = tag_text = ""
+    previous_tag = ""
+    i = 0
+    while i < len(source):
+        char = source[i]
+        # "space": o próprio caractere vira quebra; "before"/"after": quebra inserida ao lado dele
+        kind = ""
+        if jinja_end:
+            if source.startswith(jinja_end, i):
+                out.append(source[i])
+                line_bytes += 1
+                i += 1
+                char = source[i]
+                jinja_end = ""
+        elif source.startswith(("{{", "{%"), i):
+            jinja_end = "}}" if source[i + 1] == "{" else "%}"
+        elif raw_end:
+            if source.startswith(raw_end, i):
+                raw_end, in_tag, tag_text = "", True, ""
+        elif in_tag:
+            if quote:
+                if char == quote and not css_quote:
+                    quote, css_value = "", False
+                elif css_value:
+                    if css_quote:
+                        css_quote = "" if char == css_quote else css_quote
+                    elif char in "'\"":
+                        css_quote = char
+                    elif char in " ;":
+                        kind = "space" if char == " " else "after"
+            elif char in "\"'":
+                quote = char
+                css_value = bool(re.search(r"\sstyle=$", tag_text))
+            elif char == ">":
+                in_tag = False
+                name = re.match(r"</?\s*([a-zA-Z0-9!]+)", tag_text)
+                previous_tag = name.group(1).lower() if name else ""
+                if name and not tag_text.startswith("</"):
+                    if previous_tag == "style":
+                        in_css = True
+                    elif previous_tag in _RAW_TAGS:
+                        raw_end = f"</{name.group(1)}"
+            elif char == " ":
+                kind = "space"
+            tag_text += char
+        elif in_css:
+            if css_quote:
+                css_quote = "" if char == css_quote else css_quote
+            elif char in "'\"":
+                css_quote = char
+            elif source.startswith("</style", i):
+                in_css, in_tag, tag_text = False, True, char
+                kind = "before"
+            elif char in " ;{}":
+                kind = "space" if char == " " else "after"
+        elif char == "<":
+            in_tag, tag_text = True, char
+            name = re.match(r"</?\s*([a-zA-Z0-9!]+)", source[i:i + 20])
+            # Entre tags encostadas, se uma delas é de bloco, o espaço não aparece: a quebra não muda nada
+            if out and out[-1] == ">" and (previous_tag in _BLOCK_TAGS or (name and name.group(1).lower() in _BLOCK_TAGS)):
+                kind = "before"
+        elif char == " ":
+            kind = "space"
+
+        if kind == "before":
+            last_break = (len(out), False)
+        out.append(char)
+        if char == "\n":
+            line_bytes, last_break = 0, None
+        else:
+            line_bytes += len(char.encode("utf-8"))
+            if kind == "space":
+                last_break = (len(out) - 1, True)
+        if line_bytes > width and last_break is not None:
+            position, replace = last_break
+            if replace:
+                out[position] = "\n"
+            else:
+                out.insert(position, "\n")
+            line_bytes = sum(len(c.encode("utf-8")) for c in out[position + 1:])
+            last_break = None
+        # Quebra depois do caractere só vale se ele coube na linha
+        if kind == "after":
+            last_break = (len(out), False)
+        i += 1
+    return "".join(out)
+
+
+def build_template(source: str, inline_css: bool = True, minify: bool = True) -> BuiltTemplate:
+    """Aplica o CSS, minifica e gera o texto puro de um template HTML."""
+    original_bytes = len(source.encode("utf-8"))
+    text = html_to_text(source)
+    if _JINJA_IN_TAG.search(source):
+        logging.warning("Template com instruções Jinja dentro de tags: CSS e minificação não aplicados.")
+        report = BuildReport(original_bytes, original_bytes, len(text.encode("utf-8")), 0, 0)
+        return BuiltTemplate(source, text, report)
+
+    masked, restore = _mask_jinja(source)
+    # As regras precisam ser conhecidas antes de percorrer os elementos
+    stylesheet = "\n".join(re.findall(r"<style[^>]*>(.*?)</style>", masked, flags=re.S | re.I))
+    if inline_css:
+        rules, kept = split_stylesheet(stylesheet)
+    else:
+        rules, kept = [], [stylesheet]
+
+    builder = _Builder(rules, minify)
+    builder.feed(masked)
+    builder.close()
+    if builder.style_slot is not None:
+        remaining = "".join(minify_css(block) if minify else block for block in kept)
+        builder.out[builder.style_slot] = f'<style type="text/css">{remaining}</style>' if remaining.strip() else ""
+    built = restore("".join(builder.out))
+    if minify:
+        built = wrap_html(built)
+
+    report = BuildReport(
+        original_bytes=original_bytes,
+        html_bytes=len(built.encode("utf-8")),
+        text_bytes=len(text.encode("utf-8")),
+        inlined_rules=len(rules),
+        kept_rules=len(kept),
+    )
+    return BuiltTemplate(built, text, report)
+
+
+def build_template_cached(
+    source: str,
+    cache_dir: Optional[str] = None,
+    inline_css: bool = True,
+    minify: bool = True
+) -> Tuple[BuiltTemplate, bool]:
+    """Como ``build_template``, com cache em disco pelo hash do template; devolve (resultado, veio_do_cache)."""
+    if not cache_dir:
+        return build_template(source, inline_css, minify), False
+
+    key = hashlib.sha256(f"{BUILD_VERSION}:{inline_css}:{minify}:{source}".encode("utf-8")).hexdigest()
+    path = os.path.join(cache_dir, f"{key}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return BuiltTemplate(data["html"], data["text"], BuildReport(**data["report"])), True
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logging.warning("Cache do build de template ignorado (%s): %s", path, e)
+
+    built = build_template(source, inline_css, minify)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"html": built.html, "text": built.text, "report": asdict(built.report)}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning("Não foi possível gravar o cache do build de template: %s", e)
+    return built, False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build do template HTML: CSS aplicado nos elementos, minificação e texto puro.")
+    parser.add_argument("template", help="Arquivo HTML do template")
+    parser.add_argument("-o", "--saida", help="Grava o HTML resultante (e o texto puro em <saida>.txt)")
+    parser.add_argument("--sem-inline", action="store_true", help="Não aplica o CSS nos elementos")
+    parser.add_argument("--sem-minificar", action="store_true", help="Não minifica o HTML")
+    args = parser.parse_args()
+
+    with open(args.template, "r", encoding="utf-8") as f:
+        built = build_template(f.read(), not args.sem_inline, not args.sem_minificar)
+    print(built.report.summary())
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(built.html)
+        with open(f"{args.saida}.txt", "w", encoding="utf-8") as f:
+            f.write(built.text)
+
+
+if __name__ == "__main__":
+    main()
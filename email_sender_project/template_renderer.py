@@ -0,0 +1,140 @@
+"""
+template_renderer.py
+
+Renderização dos templates HTML com o template compilado uma única vez por
+execução, cache opcional de bytecode em disco e um caminho rápido para
+templates que só interpolam uma variável simples (ex.: ``{{ nome }}``).
+
+Com ``build=True`` o template passa antes pela etapa de ``template_build``
+(CSS aplicado nos elementos, minificação e alternativa em texto puro).
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, nodes
+
+from template_build import BuildReport, build_template_cached
+
+# Marcador improvável de aparecer em um template real
+_SENTINEL = "\x00__fast_path__\x00"
+
+
+def split_simple_template(env: Environment, source: str) -> Optional[Tuple[str, str, str]]:
+    """Devolve (prefixo, variável, sufixo) se o template só contém texto e um único ``{{ var }}``."""
+    if env.autoescape:
+        return None
+    tree = env.parse(source)
+    variable: Optional[str] = None
+    for node in tree.body:
+        if not isinstance(node, nodes.Output):
+            return None
+        for child in node.nodes:
+            if isinstance(child, nodes.TemplateData):
+                continue
+            if isinstance(child, nodes.Name) and child.ctx == "load" and variable is None:
+                variable = child.name
+                continue
+            return None
+    if variable is None:
+        return None
+
+    rendered = env.from_string(source).render(**{variable: _SENTINEL})
+    if rendered.count(_SENTINEL) != 1:
+        return None
+    prefix, suffix = rendered.split(_SENTINEL)
+    return prefix, variable, suffix
+
+
+class TemplateRenderer:
+    def __init__(
+        self,
+        template_dir: str,
+        template_file: str,
+        bytecode_cache_dir: Optional[str] = None,
+        fast_path: bool = True,
+        build: bool = False,
+        build_cache_dir: Optional[str] = None,
+        inline_css: bool = True,
+        minify: bool = True,
+        plain_text: bool = True
+    ) -> None:
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+
+        # auto_reload=False: sem checagem de mtime do arquivo a cada renderização
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            auto_reload=False,
+            bytecode_cache=bytecode_cache
+        )
+        self.template_file = template_file
+        self.fast_path = fast_path
+        self.build = build
+        self.build_cache_dir = build_cache_dir
+        self.inline_css = inline_css
+        self.minify = minify
+        self.plain_text = plain_text
+        self.build_report: Optional[BuildReport] = None
+        self._template: Optional[Template] = None
+        self._parts: Optional[Tuple[str, str, str]] = None
+        self._text_template: Optional[Template] = None
+        self._text_parts: Optional[Tuple[str, str, str]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def uses_fast_path(self) -> bool:
+        self._load()
+        return self._parts is not None
+
+    def _load(self) -> Template:
+        if self._template is None:
+            with self._lock:
+                if self._template is None:
+                    if self.build:
+                        self._load_built()
+                    else:
+                        template = self.env.get_template(self.template_file)
+                        if self.fast_path:
+                            source, _, _ = self.env.loader.get_source(self.env, self.template_file)
+                            self._parts = split_simple_template(self.env, source)
+                        self._template = template
+        return self._template
+
+    def _load_built(self) -> None:
+        source, _, _ = self.env.loader.get_source(self.env, self.template_file)
+        built, cached = build_template_cached(source, self.build_cache_dir, self.inline_css, self.minify)
+        logging.info("Template '%s' otimizado%s: %s", self.template_file,
+                     " (cache)" if cached else "", built.report.summary())
+        self.build_report = built.report
+        # Compilados a partir do resultado do build; o cache do build faz o papel do cache de bytecode
+        if self.fast_path:
+            self._parts = split_simple_template(self.env, built.html)
+        if self.plain_text:
+            if self.fast_path:
+                self._text_parts = split_simple_template(self.env, built.text)
+            self._text_template = self.env.from_string(built.text)
+        self._template = self.env.from_string(built.html)
+
+    @staticmethod
+    def _render(template: Template, parts: Optional[Tuple[str, str, str]], context: Dict[str, str]) -> str:
+        if parts is not None:
+            prefix, variable, suffix = parts
+            # Variável ausente renderiza vazio, como o Undefined padrão do Jinja
+            value = context.get(variable, "")
+            return prefix + str(value) + suffix
+        return template.render(**context)
+
+    def render(self, context: Dict[str, str]) -> str:
+        return self._render(self._load(), self._parts, context)
+
+    def render_text(self, context: Dict[str, str]) -> Optional[str]:
+        """Alternativa em texto puro gerada pelo build; None sem build ou com ``plain_text=False``."""
+        self._load()
+        if self._text_template is None:
+            return None
+        return self._render(self._text_template, self._text_parts, context)
@@ -1,5 +1,73 @@
+import json
+import logging
+import os
+import smtplib
+import tempfile
 import unittest
+import urllib.error
+import urllib.request
+from email.message import EmailMessage
+from unittest import mock
+
+import jinja2
+
 from email_sender import EmailSender
+from rate_limiter import RateLimiter
+from smtp_pool import SMTPSessionPool
+from smtp_sink import SMTPSink
+from email_validator import EmailUndeliverableError
+from validation import EmailValidationStage
+from send_journal import SendJournal
+from metrics import Metrics, MetricsReporter, NullMetrics
+from retry_queue import PERMANENT, TRANSIENT, RetryScheduler, classify_smtp_error
+from template_renderer import TemplateRenderer
+from template_build import TEXT_WIDTH, build_template, build_template_cached, html_to_text
+from attachment_cache import AttachmentCache
+from contact_sources import MediaContactIndex, iter_contacts, iter_json_array, iter_media_contacts
+from logging_setup import EventLog, configurar_logging
+from notifier_daemon import PRIORITY_TRANSACTIONAL, JobQueue, NotifierDaemon, parse_submission
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+TEST_ACCOUNT = "remetente@example.com"
+
+
+def make_sender(accounts=None, shard_accounts=False, **config_overrides):
+    """Cria um EmailSender não interativo com config temporária."""
+    config = {
+        "smtp_server": "127.0.0.1",
+        "smtp_port": 0,
+        "smtp_security": "none",
+        "subject": "Teste",
+        "template_file": "email_template.html",
+        "sleep_time": 0,
+        "check_deliverability": False
+    }
+    config.update(config_overrides)
+    fd, config_path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    env = {"EMAILS_JSON": json.dumps(accounts or {TEST_ACCOUNT: "senha"})}
+    try:
+        with mock.patch.dict(os.environ, env):
+            return EmailSender(
+                config_path=config_path,
+                env_path=os.devnull,
+                selected_email=None if shard_accounts else TEST_ACCOUNT,
+                shard_accounts=shard_accounts
+            )
+    finally:
+        os.remove(config_path)
+
+
+def make_message(recipient="destino@example.com"):
+    msg = EmailMessage()
+    msg['Subject'] = "Teste"
+    msg['From'] = TEST_ACCOUNT
+    msg['To'] = recipient
+    msg.set_content("corpo")
+    return msg
+
 
 class TestEmailSender(unittest.TestCase):
     def setUp(self):
@@ -22,5 +90,703 @@ class TestEmailSender(unittest.TestCase):
         self.assertEqual(msg['To'], "teste@example.com")
         self.assertIn("Teste", msg.get_body(preferencelist=('html')).get_content())
 
+class TestSMTPSessionPool(unittest.TestCase):
+    def setUp(self):
+        self.sink = SMTPSink().start()
+        self.addCleanup(self.sink.stop)
+        host, port = self.sink.address
+        self.pool_args = dict(host=host, port=port, user=TEST_ACCOUNT, password="senha", security="none")
+
+    def test_reuses_session_across_messages(self):
+        with SMTPSessionPool(**self.pool_args) as pool:
+            for _ in range(5):
+                pool.send_message(make_message())
+        self.assertEqual(self.sink.messages, 5)
+        self.assertEqual(self.sink.connections, 1)
+        self.assertEqual(pool.handshakes_saved, 4)
+
+    def test_rotates_after_max_messages(self):
+        with SMTPSessionPool(max_messages_per_session=2, **self.pool_args) as pool:
+            for _ in range(5):
+                pool.send_message(make_message())
+        self.assertEqual(self.sink.connections, 3)
+        self.assertEqual(pool.rotations, 2)
+
+    def test_reconnects_when_server_disconnects(self):
+        self.sink.drop_after = 2
+        with SMTPSessionPool(**self.pool_args) as pool:
+            for _ in range(4):
+                pool.send_message(make_message())
+        self.assertEqual(self.sink.messages, 4)
+        self.assertEqual(pool.reconnects, 1)
+
+
+class TestBulkSendWithSink(unittest.TestCase):
+    def test_bulk_send_uses_single_session(self):
+        with SMTPSink() as sink:
+            sender = make_sender(smtp_port=sink.address[1])
+            contacts = [{"name": f"Contato {i}", "email": f"contato{i}@example.com"} for i in range(3)]
+            sender.send_bulk_emails(contacts)
+        self.assertEqual(sink.messages, 3)
+        self.assertEqual(sink.connections, 1)
+
+
+    def test_concurrent_bulk_send(self):
+        with SMTPSink() as sink:
+            sender = make_sender(smtp_port=sink.address[1], max_workers=4, smtp_pool_size=2)
+            contacts = [{"name": f"Contato {i}", "email": f"contato{i}@example.com"} for i in range(20)]
+            sender.send_bulk_emails(iter(contacts))
+        self.assertEqual(sink.messages, 20)
+        self.assertLessEqual(sink.connections, 2)
+
+
+class TestAccountSharding(unittest.TestCase):
+    accounts = {"a@example.com": "x", "b@example.com": "y", "c@example.com": "z"}
+
+    def _contacts(self, n):
+        return [{"name": f"Contato {i}", "email": f"contato{i}@example.com"} for i in range(n)]
+
+    def _send(self, sender, contacts, fail_from=()):
+        senders = []
+
+        def fake_send(msg):
+            if msg['From'] in fail_from:
+                raise smtplib.SMTPDataError(421, b"Too many messages")
+            senders.append(msg['From'])
+
+        with mock.patch.object(sender, "send_email", side_effect=fake_send):
+            sender.send_bulk_emails(contacts)
+        return senders
+
+    def test_contacts_are_spread_across_accounts(self):
+        sender = make_sender(accounts=self.accounts, shard_accounts=True)
+        senders = self._send(sender, self._contacts(6))
+        self.assertEqual(sorted(senders.count(a) for a in self.accounts), [2, 2, 2])
+
+    def test_throttled_account_fails_over(self):
+        sender = make_sender(accounts=self.accounts, shard_accounts=True)
+        senders = self._send(sender, self._contacts(6), fail_from={"b@example.com"})
+        self.assertEqual(len(senders), 6)
+        self.assertNotIn("b@example.com", senders)
+
+    def test_daily_quota_per_account(self):
+        sender = make_sender(
+            accounts=self.accounts,
+            shard_accounts=True,
+            daily_quota=2,
+            account_limits={"c@example.com": {"daily_quota": 0}}
+        )
+        senders = self._send(sender, self._contacts(6))
+        self.assertEqual(len(senders), 4)
+        self.assertNotIn("c@example.com", senders)
+
+    def test_dry_run_does_not_spend_the_daily_quota(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            state = os.path.join(tmp, "cotas.json")
+            sender = make_sender(accounts=self.accounts, shard_accounts=True, daily_quota=2, quota_state_file=state)
+            sender.dry_run = True
+            sender.send_bulk_emails(self._contacts(6))
+            self.assertEqual([a.sent_today for a in sender.accounts], [0, 0, 0])
+            self.assertFalse(os.path.exists(state))
+
+
+class TestTemplateRenderer(unittest.TestCase):
+    def test_fast_path_matches_jinja(self):
+        fast = TemplateRenderer(TEMPLATE_DIR, "email_template.html")
+        slow = TemplateRenderer(TEMPLATE_DIR, "email_template.html", fast_path=False)
+        self.assertTrue(fast.uses_fast_path)
+        for context in ({"nome": "Fulano"}, {"nome": "<b>&</b>"}, {}):
+            self.assertEqual(fast.render(context), slow.render(context))
+
+    def test_complex_template_falls_back(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "t.html"), "w", encoding="utf-8") as f:
+                f.write("{% if nome %}Olá {{ nome|upper }}{% endif %}")
+            renderer = TemplateRenderer(tmp, "t.html", bytecode_cache_dir=os.path.join(tmp, "cache"))
+            self.assertFalse(renderer.uses_fast_path)
+            self.assertEqual(renderer.render({"nome": "ana"}), "Olá ANA")
+            self.assertTrue(os.listdir(os.path.join(tmp, "cache")))
+
+
+class TestTemplateBuild(unittest.TestCase):
+    def _source(self, name="email_template.html"):
+        with open(os.path.join(TEMPLATE_DIR, name), encoding="utf-8") as f:
+            return f.read()
+
+    def test_inlines_simple_rules_and_keeps_media_queries(self):
+        built = build_template(
+            "<html><head><style>p { color: red; } .x { font-size: 12px } div p { margin: 0 } a:hover { color: blue }"
+            " @media (max-width: 600px) { .x { font-size: 10px !important } }</style></head>"
+            '<body><div>\n  <p class="x" style="color: blue">Olá,   {{ nome }}!</p>\n</div><p>fim</p></body></html>'
+        )
+        # As quebras de linha do build só aparecem onde um espaço é equivalente
+        html = built.html.replace("\n", " ")
+        self.assertIn('<p class="x" style="margin:0;font-size:12px;color:blue">Olá, {{ nome }}!</p>', html)
+        self.assertIn('<p style="color:red">fim</p>', html)
+        self.assertIn("a:hover{color:blue}", html)
+        self.assertIn("@media (max-width:600px){.x{font-size:10px !important}}", html)
+        self.assertEqual(built.report.inlined_rules, 3)
+
+    def test_jinja_literals_in_attributes_survive_the_build(self):
+        source = (
+            "<html><body><p title='{{ \"Olá\" }}' style=\"color: {{ cor | default('red') }}\">"
+            '<a href="{{ url | default("https://x.org/a b") }}">Link &amp; mais {{ nome }}</a></p></body></html>'
+        )
+        built = build_template(source)
+        self.assertIn('href="{{ url | default("https://x.org/a b") }}"', built.html)
+        self.assertIn("color:{{ cor | default('red') }}", built.html)
+        rendered = jinja2.Environment().from_string(built.html).render(nome="Ana")
+        self.assertIn('title="Olá"', rendered)
+        self.assertIn('href="https://x.org/a b"', rendered)
+        self.assertIn("color:red", rendered)
+        text = jinja2.Environment().from_string(built.text).render(nome="Ana")
+        self.assertIn("Link & mais Ana (https://x.org/a b)", text)
+
+    def test_output_is_smaller_equivalent_and_fits_mime_lines(self):
+        source = self._source()
+        built = build_template(source)
+        self.assertLess(built.report.html_bytes, built.report.original_bytes)
+        self.assertEqual(html_to_text(built.html), html_to_text(source))
+        for text in (built.html, built.text):
+            self.assertLessEqual(max(len(line.encode("utf-8")) for line in text.splitlines()), TEXT_WIDTH)
+        self.assertIn("Confirmar minha adesão (https://asppibra.org/adesao)", built.text)
+        self.assertNotIn("font-family", built.text)
+
+    def test_build_is_cached_by_template_hash(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first, cached = build_template_cached(self._source(), tmp)
+            self.assertFalse(cached)
+            second, cached = build_template_cached(self._source(), tmp)
+            self.assertTrue(cached)
+            self.assertEqual((second.html, second.text, second.report), (first.html, first.text, first.report))
+
+    def test_sender_uses_built_html_and_text_alternative(self):
+        sender = make_sender(template_build={"enabled": True})
+        self.assertTrue(sender.renderer.uses_fast_path)
+        context = {"nome": "Ana"}
+        body_html = sender.render_template(context)
+        body_text = sender.render_text(context)
+        self.assertIn("Olá, Ana!", body_text)
+
+        msg = sender.create_email("destino@example.com", "Ana", body_html, body_text=body_text)
+        html_part = msg.get_body(preferencelist=("html",))
+        self.assertEqual(msg.get_body(preferencelist=("plain",)).get_content().strip(), body_text.strip())
+        self.assertIn("<strong>Ana</strong>", html_part.get_content())
+        # Linhas curtas: o HTML vai em 8bit, sem o inchaço do quoted-printable
+        self.assertEqual(html_part["Content-Transfer-Encoding"], "8bit")
+        self.assertLess(len(html_part.get_content().encode("utf-8")), sender.renderer.build_report.original_bytes)
+
+
+class TestAttachmentCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "anexo.bin")
+        with open(self.path, "wb") as f:
+            f.write(b"\x00\x01" * 1000)
+
+    def test_part_is_encoded_once_and_shared(self):
+        sender = make_sender()
+        first = sender.create_email("a@example.com", "A", "<p>A</p>", [self.path])
+        second = sender.create_email("b@example.com", "B", "<p>B</p>", [self.path])
+        part_a = next(first.iter_attachments())
+        part_b = next(second.iter_attachments())
+        self.assertIs(part_a, part_b)
+        self.assertEqual(part_a.get_content(), b"\x00\x01" * 1000)
+        self.assertEqual((sender.attachment_cache.misses, sender.attachment_cache.hits), (1, 1))
+
+    def test_invalidated_when_file_changes(self):
+        cache = AttachmentCache()
+        cache.get(self.path)
+        with open(self.path, "ab") as f:
+            f.write(b"mais")
+        self.assertTrue(cache.get(self.path).get_content().endswith(b"mais"))
+        self.assertEqual(cache.invalidations, 1)
+
+    def test_memory_stays_bounded(self):
+        cache = AttachmentCache(max_bytes=100)
+        self.assertIsNotNone(cache.get(self.path))
+        self.assertEqual(cache.total_bytes, 0)
+
+
+class TestContactSources(unittest.TestCase):
+    contacts = [{"name": f"Contato {i}", "email": f"contato{i}@example.com"} for i in range(50)]
+
+    def _write(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_json_array_is_parsed_incrementally(self):
+        path = self._write(".json", json.dumps(self.contacts, indent=2))
+        for chunk_size in (1, 7, 4096):
+            self.assertEqual(list(iter_json_array(path, chunk_size)), self.contacts)
+        # O primeiro contato sai antes do arquivo inteiro ser lido
+        stream = iter_json_array(path, chunk_size=64)
+        self.assertEqual(next(stream), self.contacts[0])
+
+    def test_malformed_item_stops_at_size_limit(self):
+        head = json.dumps(self.contacts[:3])[:-1] + ", "
+        path = self._write(".json", head + '{"name": "sem fim, ' + json.dumps(self.contacts)[1:])
+        stream = iter_json_array(path, chunk_size=64, max_item_size=500)
+        self.assertEqual([next(stream) for _ in range(3)], self.contacts[:3])
+        with self.assertRaisesRegex(ValueError, f"posição {len(head)} "):
+            next(stream)
+
+    def test_ndjson_and_csv(self):
+        ndjson = self._write(".ndjson", "\n".join(json.dumps(c) for c in self.contacts) + "\n\n{ruim\n")
+        self.assertEqual(list(iter_contacts(ndjson)), self.contacts)
+        rows = "\n".join(f"{c['name']},{c['email']}" for c in self.contacts)
+        csv_path = self._write(".csv", "nome,email\n" + rows)
+        self.assertEqual(list(iter_contacts(csv_path)), self.contacts)
+
+    def test_rejects_non_array(self):
+        path = self._write(".json", '{"name": "x"}')
+        with self.assertRaises(ValueError):
+            list(iter_contacts(path))
+
+
+class TestMediaContacts(unittest.TestCase):
+    def test_flattens_and_deduplicates(self):
+        brasil = {
+            "estados": [
+                {"estado": "Acre", "jornais": [
+                    {"nome": "Jornal A", "email": "Redacao@JornalA.com.br, comercial@jornala.com.br"},
+                    {"nome": "Jornal B", "email": "Não disponível publicamente"},
+                    {"nome": "Jornal C", "email": None},
+                ]},
+                {"estado": "Bahia", "blogs_e_sites_independentes": [
+                    {"nome": "Jornal A (BA)", "email": "redacao@jornala.com.br"},
+                ]},
+            ]
+        }
+        gemini = {"pais": "Nigéria", "portais_de_noticias": [{"nome": "Portal", "email": "news@portal.ng"}]}
+        paths = []
+        for data in (brasil, gemini):
+            fd, path = tempfile.mkstemp(suffix=".json")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            self.addCleanup(os.remove, path)
+            paths.append(path)
+
+        index = MediaContactIndex()
+        contacts = list(iter_media_contacts(paths, index))
+        self.assertEqual(
+            [c["email"] for c in contacts],
+            ["Redacao@JornalA.com.br", "comercial@jornala.com.br", "news@portal.ng"]
+        )
+        self.assertEqual(contacts[0]["name"], "Jornal A")
+        self.assertEqual(contacts[0]["estado"], "Acre")
+        self.assertEqual(contacts[0]["categoria"], "jornais")
+        self.assertEqual(contacts[2]["pais"], "Nigéria")
+        self.assertEqual((index.duplicates, index.without_email), (1, 2))
+
+
+class TestEmailValidationStage(unittest.TestCase):
+    def setUp(self):
+        self.lookups = []
+
+    def resolver(self, domain, domain_i18n):
+        self.lookups.append(domain)
+        if domain == "sem-mx.com.br":
+            raise EmailUndeliverableError("O domínio não aceita e-mails.")
+
+    def test_domain_lookup_is_memoized(self):
+        stage = EmailValidationStage(workers=8, resolver=self.resolver)
+        contacts = [{"name": "x", "email": f"pessoa{i}@gmail.com"} for i in range(200)]
+        contacts.append({"name": "y", "email": "alguem@sem-mx.com.br"})
+        contacts.append({"name": "z", "email": "email@invalido"})
+        results = list(stage.run(contacts))
+        self.assertEqual([c for c, _ in results], contacts)
+        self.assertEqual([ok for _, ok in results], [True] * 200 + [False, False])
+        self.assertEqual(sorted(self.lookups), ["gmail.com", "sem-mx.com.br"])
+
+    def test_resolver_errors_only_invalidate_that_contact(self):
+        def resolver(domain, domain_i18n):
+            if domain == "timeout.com":
+                raise OSError("DNS indisponível")
+
+        stage = EmailValidationStage(workers=4, resolver=resolver)
+        contacts = [{"name": "a", "email": "a@timeout.com"}, {"name": "b", "email": "b@gmail.com"}]
+        self.assertEqual([ok for _, ok in stage.run(contacts)], [False, True])
+        # Sem caminho de cache, nenhum endereço fica em memória
+        self.assertEqual(stage.addresses._entries, {})
+
+    def test_persistent_address_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = os.path.join(tmp, "validacao.json")
+            stage = EmailValidationStage(cache_path=cache_path, resolver=self.resolver)
+            stage.validate("a@gmail.com")
+            stage.validate("b@sem-mx.com.br")
+            stage.save()
+
+            self.lookups.clear()
+            again = EmailValidationStage(cache_path=cache_path, resolver=self.resolver)
+            self.assertEqual(again.validate("A@gmail.com"), (True, None))
+            self.assertFalse(again.validate("b@sem-mx.com.br")[0])
+            self.assertEqual(self.lookups, [])
+            self.assertEqual(again.address_hits, 2)
+
+
+class TestSendJournal(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "journal.db")
+        self.contacts = [{"name": f"Contato {i}", "email": f"contato{i}@example.com"} for i in range(5)]
+
+    def _run(self, resume, fail=()):
+        sender = make_sender()
+        sent = []
+
+        def fake_send(msg):
+            if msg['To'] in fail:
+                raise smtplib.SMTPDataError(554, b"Rejeitado")
+            sent.append(msg['To'])
+
+        with SendJournal(self.path, "campanha") as journal, \
+                mock.patch.object(sender, "send_email", side_effect=fake_send):
+            sender.send_bulk_emails(self.contacts + [{"name": "Ruim", "email": "email@invalido"}],
+                                    journal=journal, resume=resume)
+            stats = journal.stats()
+        return sent, stats
+
+    def test_records_state_per_recipient(self):
+        _, stats = self._run(resume=False, fail={"contato3@example.com"})
+        self.assertEqual(stats, {"sent": 4, "failed": 2})
+
+    def test_contact_without_name_is_not_left_queued(self):
+        self.contacts.append({"email": "sem-nome@example.com"})
+        _, stats = self._run(resume=False)
+        self.assertEqual(stats, {"sent": 5, "failed": 2})
+
+    def test_resume_skips_completed_recipients(self):
+        self._run(resume=False, fail={"contato3@example.com"})
+        sent, stats = self._run(resume=True)
+        self.assertEqual(sent, ["contato3@example.com"])
+        self.assertEqual(stats["sent"], 5)
+
+
+class TestRetryScheduling(unittest.TestCase):
+    def test_classification(self):
+        self.assertEqual(classify_smtp_error(smtplib.SMTPDataError(451, b"Tente mais tarde")), TRANSIENT)
+        self.assertEqual(classify_smtp_error(smtplib.SMTPServerDisconnected()), TRANSIENT)
+        self.assertEqual(classify_smtp_error(smtplib.SMTPDataError(550, b"Caixa inexistente")), PERMANENT)
+        refused = smtplib.SMTPRecipientsRefused({"a@example.com": (452, b"Cheia")})
+        self.assertEqual(classify_smtp_error(refused), TRANSIENT)
+
+    def test_backoff_grows_exponentially_with_jitter(self):
+        scheduler = RetryScheduler(base_delay=2, max_delay=10, rng=lambda: 1.0)
+        self.addCleanup(scheduler.close)
+        self.assertEqual([scheduler.backoff(a) for a in (1, 2, 3, 4)], [2, 4, 8, 10])
+        jittered = RetryScheduler(base_delay=2, rng=lambda: 0.0)
+        self.addCleanup(jittered.close)
+        self.assertEqual(jittered.backoff(2), 2)
+
+    def test_transient_failures_are_deferred_and_permanent_are_not(self):
+        sender = make_sender(retry_base_delay=0.01, retry_max_attempts=3)
+        calls = {}
+
+        def fake_send(msg):
+            calls[msg['To']] = calls.get(msg['To'], 0) + 1
+            if msg['To'] == "temporario@example.com" and calls[msg['To']] < 3:
+                raise smtplib.SMTPDataError(451, b"Tente mais tarde")
+            if msg['To'] == "permanente@example.com":
+                raise smtplib.SMTPDataError(550, b"Caixa inexistente")
+            if msg['To'] == "sempre@example.com":
+                raise smtplib.SMTPServerDisconnected()
+
+        contacts = [
+            {"name": "T", "email": "temporario@example.com"},
+            {"name": "P", "email": "permanente@example.com"},
+            {"name": "S", "email": "sempre@example.com"},
+            {"name": "O", "email": "ok@example.com"},
+        ]
+        with mock.patch.object(sender, "send_email", side_effect=fake_send), \
+                self.assertLogs(level="INFO") as logs:
+            sender.send_bulk_emails(contacts)
+        self.assertEqual(calls, {
+            "temporario@example.com": 3,
+            "permanente@example.com": 1,
+            "sempre@example.com": 3,
+            "ok@example.com": 1,
+        })
+        summary = [line for line in logs.output if "Resumo do envio" in line]
+        self.assertIn("2 enviados com sucesso, 2 falharam", summary[0])
+        retries = [line for line in logs.output if "Reenvios:" in line]
+        self.assertIn("4 agendados, 1 recuperados, 1 esgotados, 1 falhas permanentes", retries[0])
+
+
+class TestAccountSelection(unittest.TestCase):
+    def _sender(self, accounts):
+        env = {"EMAILS_JSON": json.dumps(accounts)}
+        with mock.patch.dict(os.environ, env), mock.patch("sys.stdin") as stdin, \
+                mock.patch("builtins.input", side_effect=AssertionError("input() chamado")):
+            stdin.isatty.return_value = False
+            return EmailSender(env_path=os.devnull)
+
+    def test_single_account_is_selected_without_prompt(self):
+        self.assertEqual(self._sender({TEST_ACCOUNT: "senha"}).email_user, TEST_ACCOUNT)
+
+    def test_multiple_accounts_without_terminal_fail_fast(self):
+        with self.assertRaises(ValueError):
+            self._sender({"a@example.com": "x", "b@example.com": "y"})
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def test_pipeline_benchmark_reports_every_stage(self):
+        import benchmark
+        with mock.patch.dict(os.environ, {"EMAILS_JSON": '{"real@example.com": "x"}'}):
+            result = benchmark.bench_pipeline(20, workers=2)
+            # As credenciais falsas do benchmark não vazam para quem chamou
+            self.assertEqual(os.environ["EMAILS_JSON"], '{"real@example.com": "x"}')
+        self.assertEqual(result["mensagens_recebidas"], 20)
+        self.assertEqual(
+            set(result["estagios"]),
+            {"carregar", "validar", "renderizar", "montar_mime", "smtp", "mensagem"}
+        )
+        self.assertEqual(result["estagios"]["smtp"]["chamadas"], 20)
+        self.assertGreater(result["latencia_ms"]["p99"], 0)
+        json.dumps(result)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_disabled_by_default(self):
+        self.assertIsInstance(make_sender().metrics, NullMetrics)
+
+    def test_bulk_send_records_stage_metrics(self):
+        with tempfile.TemporaryDirectory() as tmp, SMTPSink() as sink:
+            stats_file = os.path.join(tmp, "stats.json")
+            sender = make_sender(smtp_port=sink.address[1], metrics={"enabled": True, "stats_file": stats_file})
+            contacts = [{"name": f"Contato {i}", "email": f"contato{i}@example.com"} for i in range(5)]
+            sender.send_bulk_emails(contacts + [{"name": "Ruim", "email": "email@invalido"}])
+            with open(stats_file, encoding="utf-8") as f:
+                stats = json.load(f)
+        self.assertEqual(stats["counters"]["messages_sent_total"], 5)
+        self.assertEqual(stats["counters"]["messages_failed_total"], 1)
+        self.assertEqual(stats["counters"]["smtp_connections_total"], 1)
+        for stage in ("render_seconds", "mime_build_seconds", "smtp_connect_seconds",
+                      "smtp_login_seconds", "smtp_send_seconds"):
+            self.assertIn(stage, stats["histograms"])
+        self.assertEqual(stats["histograms"]["smtp_send_seconds"]["count"], 5)
+
+    def test_prometheus_endpoint_and_progress_eta(self):
+        from urllib.request import urlopen
+        metrics = Metrics()
+        metrics.inc("messages_sent_total", 50)
+        metrics.observe("render_seconds", 0.002)
+        reporter = MetricsReporter(metrics, prometheus_port=0, total=100).start()
+        try:
+            host, port = reporter.address
+            body = urlopen(f"http://{host}:{port}/metrics").read().decode()
+        finally:
+            reporter.stop()
+        self.assertIn("email_sender_messages_sent_total 50", body)
+        self.assertIn('email_sender_render_seconds_bucket{le="0.0025"} 1', body)
+        self.assertIn("ETA", reporter.progress_line())
+
+    def test_progress_rate_counts_from_start(self):
+        clock = FakeClock()
+        metrics = Metrics()
+        metrics.inc("messages_sent_total", 50)
+        clock.sleep(1000)
+        reporter = MetricsReporter(metrics, total=100, clock=clock).start()
+        self.addCleanup(reporter.stop)
+        metrics.inc("messages_sent_total", 20)
+        clock.sleep(10)
+        self.assertEqual(reporter.progress_line(),
+                         "Progresso: 20 processados (2.0 msg/s) de 100 (20.0%), ETA 00:00:40")
+
+    def test_retry_queue_depth_returns_to_zero(self):
+        with SMTPSink() as sink:
+            sender = make_sender(smtp_port=sink.address[1], metrics={"enabled": True},
+                                 retry_base_delay=0.01, retry_max_delay=0.01)
+            calls = []
+            real_send = sender.send_email
+
+            def flaky_send(msg):
+                calls.append(msg["To"])
+                if len(calls) == 1:
+                    raise smtplib.SMTPServerDisconnected("queda")
+                real_send(msg)
+
+            with mock.patch.object(sender, "send_email", side_effect=flaky_send):
+                sender.send_bulk_emails([{"name": "C", "email": "c@example.com"}])
+        snapshot = sender.metrics.snapshot()
+        self.assertEqual(snapshot["counters"]["retries_scheduled_total"], 1)
+        self.assertEqual(snapshot["gauges"]["retry_queue_depth"], 0)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestAsyncLogging(unittest.TestCase):
+    def setUp(self):
+        root = logging.getLogger()
+        saved = (root.level, list(root.handlers))
+        root.handlers = []
+
+        def restore():
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+                handler.close()
+            root.setLevel(saved[0])
+            root.handlers = saved[1]
+
+        self.addCleanup(restore)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def test_queue_listener_formats_and_writes(self):
+        log_path = os.path.join(self.dir, "envio.log")
+        with mock.patch("sys.stderr"):
+            listener = configurar_logging(log_path)
+            logging.info("Enviado para %s", "contato@example.com")
+            listener.stop()
+        with open(log_path, encoding="utf-8") as f:
+            self.assertIn("INFO - Enviado para contato@example.com", f.read())
+
+    def test_event_log_writes_json_lines_per_recipient(self):
+        events_path = os.path.join(self.dir, "eventos.jsonl")
+        sender = make_sender(event_log_file=events_path)
+
+        def fake_send(msg):
+            if msg['To'] == "contato1@example.com":
+                raise smtplib.SMTPDataError(554, b"Rejeitado")
+
+        contacts = [{"name": f"Contato {i}", "email": f"contato{i}@example.com"} for i in range(3)]
+        with mock.patch.object(sender, "send_email", side_effect=fake_send):
+            sender.send_bulk_emails(contacts)
+        with open(events_path, encoding="utf-8") as f:
+            events = [json.loads(line) for line in f]
+        self.assertEqual([e["event"] for e in events], ["sent", "failed", "sent"])
+        self.assertEqual(events[1]["account"], TEST_ACCOUNT)
+        self.assertEqual(events[1]["attempt"], 1)
+        self.assertIn("Rejeitado", events[1]["reason"])
+
+    def test_event_log_flushes_in_batches(self):
+        events_path = os.path.join(self.dir, "eventos.jsonl")
+        with EventLog(events_path, batch_size=10, flush_interval=60) as event_log:
+            for i in range(25):
+                event_log.emit("sent", email=f"contato{i}@example.com")
+        with open(events_path, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 25)
+
+
+class TestNotifierDaemon(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.queue = JobQueue(os.path.join(self.dir, "fila.db"))
+        self.addCleanup(self.queue.close)
+
+    def test_transactional_jobs_jump_ahead_of_bulk(self):
+        self.queue.submit([{"name": f"C{i}", "email": f"c{i}@example.com"} for i in range(5)])
+        [urgent] = self.queue.submit([{"name": "T", "email": "t@example.com"}], PRIORITY_TRANSACTIONAL)
+        jobs = self.queue.claim(2, busy=set())
+        self.assertEqual(jobs[0][0], urgent)
+        self.assertEqual(self.queue.stats(), {"pending": 4, "running": 2})
+
+    def test_interrupted_jobs_are_requeued(self):
+        self.queue.submit([{"name": "C", "email": "c@example.com"}])
+        self.queue.claim(1, busy=set())
+        self.assertEqual(self.queue.requeue_running(), 1)
+        self.assertEqual(self.queue.stats(), {"pending": 1})
+
+    def test_client_attachment_paths_are_ignored(self):
+        jobs, _ = parse_submission({"name": "C", "email": "c@example.com", "attachments": [".env"]})
+        self.assertEqual(jobs, [{"name": "C", "email": "c@example.com"}])
+
+    def test_non_string_fields_are_rejected_over_http_and_spool(self):
+        for contact in ({"name": "x", "email": 123}, {"name": ["x"], "email": "x@example.com"},
+                        {"name": "x", "email": "   "}):
+            with self.assertRaises(ValueError):
+                parse_submission(contact)
+
+        spool = os.path.join(self.dir, "spool")
+        os.makedirs(spool)
+        daemon = NotifierDaemon(make_sender(), self.queue, http_address=("127.0.0.1", 0),
+                                spool_dir=spool, poll_interval=0.05).start()
+        try:
+            host, port = daemon.http_address
+            body = json.dumps({"name": "x", "email": 123}).encode()
+            request = urllib.request.Request(f"http://{host}:{port}/jobs", data=body, method="POST")
+            with self.assertRaises(urllib.error.HTTPError) as erro:
+                urllib.request.urlopen(request)
+            self.assertEqual(erro.exception.code, 400)
+            erro.exception.close()
+
+            with open(os.path.join(spool, "ruim.json"), "w", encoding="utf-8") as f:
+                json.dump([{"name": "x", "email": 123}], f)
+            self.assertTrue(daemon.wait_idle(timeout=10))
+            self.assertTrue(os.path.exists(os.path.join(spool, "erros", "ruim.json")))
+        finally:
+            daemon.stop()
+        self.assertEqual(self.queue.stats(), {})
+
+    def test_http_and_spool_submissions_are_sent_with_warm_session(self):
+        spool = os.path.join(self.dir, "spool")
+        os.makedirs(spool)
+        with SMTPSink() as sink:
+            sender = make_sender(smtp_port=sink.address[1], max_workers=2)
+            daemon = NotifierDaemon(sender, self.queue, http_address=("127.0.0.1", 0),
+                                    spool_dir=spool, poll_interval=0.05).start()
+            try:
+                host, port = daemon.http_address
+                body = json.dumps({"contacts": [{"name": f"Contato {i}", "email": f"contato{i}@example.com"}
+                                                for i in range(3)], "priority": "transacional"}).encode()
+                request = urllib.request.Request(f"http://{host}:{port}/jobs", data=body, method="POST")
+                with urllib.request.urlopen(request) as response:
+                    self.assertEqual(response.status, 202)
+                    ids = json.load(response)["ids"]
+                with open(os.path.join(spool, "campanha.json"), "w", encoding="utf-8") as f:
+                    json.dump([{"name": "Spool", "email": "spool@example.com"}], f)
+                self.assertTrue(daemon.wait_idle(timeout=10))
+                with urllib.request.urlopen(f"http://{host}:{port}/jobs/{ids[0]}") as response:
+                    self.assertEqual(json.load(response)["state"], "done")
+            finally:
+                daemon.stop()
+        self.assertEqual(sink.messages, 4)
+        self.assertLessEqual(sink.connections, 2)
+        self.assertEqual(self.queue.stats(), {"done": 4})
+        self.assertTrue(os.path.exists(os.path.join(spool, "processados", "campanha.json")))
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_per_second_bucket_paces_after_burst(self):
+        clock = FakeClock()
+        limiter = RateLimiter(per_second=2, burst=2, clock=clock, sleep=clock.sleep)
+        for _ in range(6):
+            limiter.acquire()
+        # 2 fichas iniciais + 4 a 2 msg/s
+        self.assertAlmostEqual(clock.now, 2.0)
+
+    def test_per_hour_window_is_never_exceeded(self):
+        clock = FakeClock()
+        limiter = RateLimiter(per_hour=3, clock=clock, sleep=clock.sleep)
+        for _ in range(3):
+            self.assertEqual(limiter.acquire(), 0.0)
+        self.assertGreater(limiter.try_acquire(), 0)
+        limiter.acquire()
+        self.assertAlmostEqual(clock.now, 3600.0)
+
+    def test_sleep_time_becomes_rate(self):
+        sender = make_sender(sleep_time=0.5)
+        self.assertTrue(sender.rate_limiter.enabled)
+        self.assertFalse(make_sender().rate_limiter.enabled)
+
+
 if __name__ == '__main__':
     unittest.main()
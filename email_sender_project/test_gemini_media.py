@@ -0,0 +1,199 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+from contact_sources import iter_media_contacts
+from gemini_media import CATEGORIAS, ColetorGemini
+from media_extractor import NAO_DISPONIVEL, ExtratorJSON, MasterMidia, extrair_registros, normalizar_registro
+
+
+class _FakeGemini(BaseHTTPRequestHandler):
+    """Responde como o generateContent; o primeiro pedido de cada prompt com "jornais" recebe 429."""
+
+    def do_POST(self):
+        servidor = self.server
+        corpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = corpo["contents"][0]["parts"][0]["text"]
+        with servidor.lock:
+            servidor.pedidos.append(prompt)
+            limitar = "jornais" in prompt and prompt not in servidor.limitados
+            servidor.limitados.add(prompt)
+        if limitar:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        if "Atlântida" in prompt:
+            self.send_response(400)
+            self.end_headers()
+            return
+        if "Lemúria" in prompt:
+            texto = "Desculpe, não tenho informações sobre esse país."
+        else:
+            texto = json.dumps([{"nome": prompt[:20], "cidade": "X"}])
+        resposta = json.dumps({"candidates": [{"content": {"parts": [{"text": texto}]}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(resposta)))
+        self.end_headers()
+        self.wfile.write(resposta)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestColetorGemini(unittest.TestCase):
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _FakeGemini)
+        self.servidor.pedidos, self.servidor.limitados, self.servidor.lock = [], set(), threading.Lock()
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = tmp.name
+        self.endpoint = f"http://127.0.0.1:{self.servidor.server_address[1]}/v1beta/models/fake:generateContent"
+
+    def _coletar(self, paises, **kwargs):
+        concluidos = []
+        with ColetorGemini(endpoint=self.endpoint, api_key="teste", max_workers=4, por_segundo=None,
+                           diretorio_cache=self.cache, sleep=lambda s: None, **kwargs) as coletor, \
+                redirect_stdout(StringIO()):
+            resultados = coletor.coletar_lote(paises, ao_concluir=lambda pais, dados: concluidos.append(pais))
+        return coletor, resultados, concluidos
+
+    def test_collects_countries_concurrently_and_retries_429(self):
+        coletor, resultados, concluidos = self._coletar(["Brasil", "Nigéria", "Brasil"])
+        self.assertEqual(sorted(resultados), ["Brasil", "Nigéria"])
+        self.assertEqual(sorted(concluidos), ["Brasil", "Nigéria"])
+        for pais, dados in resultados.items():
+            for categoria in CATEGORIAS:
+                self.assertEqual(len(dados[categoria]), 1, (pais, categoria))
+        self.assertEqual(coletor.estatisticas["respostas_429"], 2)
+        self.assertEqual(coletor.estatisticas["consultas"], 8)
+
+    def test_rerun_is_served_from_cache(self):
+        self._coletar(["Brasil"])
+        pedidos = len(self.servidor.pedidos)
+        coletor, resultados, _ = self._coletar(["Brasil"])
+        self.assertEqual(len(self.servidor.pedidos), pedidos)
+        self.assertEqual(coletor.estatisticas["cache"], len(CATEGORIAS))
+        self.assertEqual(len(resultados["Brasil"]["jornais"]), 1)
+
+    def test_failures_are_not_cached(self):
+        coletor, resultados, _ = self._coletar(["Atlântida"], tentativas=2)
+        self.assertEqual(resultados["Atlântida"]["portais_de_noticias"], [])
+        self.assertEqual(coletor.estatisticas["falhas"], len(CATEGORIAS))
+        pedidos = len(self.servidor.pedidos)
+        self._coletar(["Atlântida"], tentativas=2)
+        self.assertEqual(len(self.servidor.pedidos), pedidos + len(CATEGORIAS))
+
+
+    def test_replies_without_records_are_not_cached(self):
+        coletor, resultados, _ = self._coletar(["Lemúria"])
+        self.assertEqual(resultados["Lemúria"]["jornais"], [])
+        self.assertEqual(coletor.estatisticas["falhas"], len(CATEGORIAS))
+        pedidos = len(self.servidor.pedidos)
+        coletor, _, _ = self._coletar(["Lemúria"])
+        self.assertEqual(len(self.servidor.pedidos), pedidos + len(CATEGORIAS))
+        self.assertEqual(coletor.estatisticas["cache"], 0)
+
+
+class TestExtratorJSON(unittest.TestCase):
+    RESPOSTA = (
+        'Claro! Aqui estão os veículos [1]:\n\n```json\n[\n'
+        '  {"nome": "Folha", "site": "folha.com.br", "e-mail": ["Redacao@folha.com.br"], "telefone": "11 1234"},\n'
+        "  {'name': 'Blog {cripto}', city: \"Rio\", \"url\": \"https://b.io/\",},\n"
+        '  {"nome": "Cortado", "cidade": "Sal'
+    )
+
+    def test_recovers_complete_records_from_fenced_truncated_text(self):
+        extrator = ExtratorJSON()
+        registros = []
+        for i in range(0, len(self.RESPOSTA), 5):
+            registros.extend(extrator.alimentar(self.RESPOSTA[i:i + 5]))
+        extrator.finalizar()
+        self.assertEqual([r.get("nome") or r.get("name") for r in registros], ["Folha", "Blog {cripto}"])
+        self.assertEqual(extrator.truncados, 1)
+
+    def test_wrapped_and_single_objects(self):
+        self.assertEqual(extrair_registros('{"jornais": [{"nome": "A", "extra": {"x": [1]}}]}'),
+                         [{"nome": "A", "extra": {"x": [1]}}])
+        self.assertEqual(extrair_registros('Resultado: {"nome": "Solo"}. Fim [ok]'), [{"nome": "Solo"}])
+
+    def test_normalizes_to_contacts_midia_schema(self):
+        registro = normalizar_registro({"Nome": "Folha", "Site": "folha.com.br/", "E-mail": ["Redacao@folha.com.br"],
+                                        "Telefone": "11 1234", "Endereço": "N/A", "abrangencia": "Nacional"})
+        self.assertEqual(registro, {
+            "nome": "Folha", "cidade": NAO_DISPONIVEL, "url": "https://folha.com.br/", "contato": "11 1234",
+            "email": "redacao@folha.com.br", "endereco": NAO_DISPONIVEL, "abrangencia": "Nacional",
+        })
+        self.assertIsNone(normalizar_registro({"cidade": "Lagos"}))
+
+
+class TestMasterMidia(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.caminho = os.path.join(tmp.name, "mestre.jsonl")
+
+    def _registro(self, nome, email=NAO_DISPONIVEL, cidade=NAO_DISPONIVEL):
+        return normalizar_registro({"nome": nome, "email": email, "cidade": cidade})
+
+    def test_merge_appends_and_completes_existing_records(self):
+        mestre = MasterMidia(self.caminho)
+        self.assertEqual(mestre.mesclar([self._registro("A", "a@x.com"), self._registro("B")], "Brasil", "jornais"),
+                         {"novos": 2, "atualizados": 0, "inalterados": 0})
+        tamanho = os.path.getsize(self.caminho)
+        with open(self.caminho, "rb") as f:
+            inicio = f.read()
+
+        contagem = mestre.mesclar([self._registro("A2", "A@x.com", "Recife"), self._registro("B")], "Brasil", "jornais")
+        self.assertEqual(contagem, {"novos": 0, "atualizados": 1, "inalterados": 1})
+        # O que já estava gravado não é reescrito
+        with open(self.caminho, "rb") as f:
+            self.assertEqual(f.read(tamanho), inicio)
+
+        atual = MasterMidia(self.caminho).obter("email:a@x.com")
+        self.assertEqual((atual["nome"], atual["cidade"], atual["pais"]), ("A", "Recife", "Brasil"))
+        self.assertEqual(len(list(MasterMidia(self.caminho))), 2)
+
+    def test_key_stays_stable_when_a_later_reply_adds_an_email(self):
+        mestre = MasterMidia(self.caminho)
+        registro = normalizar_registro({"nome": "A", "site": "a.com"})
+        mestre.mesclar([registro], "Brasil", "jornais")
+        completo = normalizar_registro({"nome": "A", "site": "https://a.com", "email": "x@a.com", "cidade": "Rio"})
+        self.assertEqual(mestre.mesclar([completo], "Brasil", "jornais"),
+                         {"novos": 0, "atualizados": 1, "inalterados": 0})
+
+        mestre = MasterMidia(self.caminho)
+        self.assertEqual(len(mestre), 1)
+        self.assertEqual(mestre.obter("email:x@a.com")["_chave"], "url:a.com")
+        self.assertEqual(mestre.obter("url:a.com")["cidade"], "Rio")
+
+    def test_media_contacts_use_only_current_versions(self):
+        mestre = MasterMidia(self.caminho)
+        mestre.mesclar([self._registro("A", "a@x.com")], "Brasil", "jornais")
+        mestre.mesclar([self._registro("A", "a@x.com", "Rio")], "Brasil", "jornais")
+        contatos = list(iter_media_contacts([self.caminho]))
+        self.assertEqual([(c["email"], c["cidade"]) for c in contatos], [("a@x.com", "Rio")])
+
+    def test_index_is_rebuilt_when_stale_and_feeds_media_contacts(self):
+        mestre = MasterMidia(self.caminho)
+        mestre.mesclar([self._registro("A", "a@x.com")], "Brasil", "jornais")
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"_chave": "email:b@x.com", "nome": "B", "email": "b@x.com"}) + "\n")
+        self.assertIn("email:b@x.com", MasterMidia(self.caminho))
+
+        contatos = list(iter_media_contacts([self.caminho]))
+        self.assertEqual([(c["name"], c["email"]) for c in contatos], [("A", "a@x.com"), ("B", "b@x.com")])
+        self.assertNotIn("_chave", contatos[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
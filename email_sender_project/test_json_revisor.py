@@ -0,0 +1,245 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import json_revisor
+from json_revisor import (
+    CORRIGIDO, IGNORADO, IRREPARAVEL, REPARAVEL, VALIDO,
+    ReparadorJSON, aplicar_correcoes_json, expandir_entradas, fazer_backup, listar_backups, main, reparar_fluxo,
+    restaurar_backup, resumir, revisar_e_corrigir_json, revisar_lote
+)
+
+
+class TestReparadorJSON(unittest.TestCase):
+    def test_repairs_common_defects(self):
+        texto = "{a: 1, 'b': 'it\\'s', \"c\": NaN, d: [1, 2,, 3,], e: -Infinity, f: undefined,}"
+        corrigido, correcoes = aplicar_correcoes_json(texto)
+        self.assertEqual(json.loads(corrigido),
+                         {"a": 1, "b": "it's", "c": None, "d": [1, 2, 3], "e": None, "f": None})
+        self.assertIn("Remoção de vírgulas duplicadas.", correcoes)
+        self.assertIn("Adição de aspas em chaves não entre aspas. (4x)", correcoes)
+
+    def test_string_contents_are_left_alone(self):
+        texto = '{"texto": "NaN, undefined, chave: \'x\', fim,}", "n": 1}'
+        corrigido, correcoes = aplicar_correcoes_json(texto)
+        self.assertEqual(corrigido, texto)
+        self.assertEqual(correcoes, [])
+
+    def test_escapes_raw_newlines_only_inside_strings(self):
+        corrigido, _ = aplicar_correcoes_json('{\n  "endereco": "Rua 1\nCentro"\n}')
+        self.assertEqual(corrigido, '{\n  "endereco": "Rua 1\\nCentro"\n}')
+
+    def test_balances_brackets(self):
+        self.assertEqual(aplicar_correcoes_json('[{"a": [1, 2}')[0], '[{"a": [1, 2]}]')
+        self.assertEqual(aplicar_correcoes_json('[1, 2]]')[0], '[1, 2]')
+
+    def test_chunked_output_matches_single_pass(self):
+        texto = '{estados: [{nome: "A", "email": \'a@x.com\', n: NaN,}, {"nome": "B\nC", "n": -1.5e3, m: -Infinity,},],}' * 3
+        esperado, _ = aplicar_correcoes_json(texto)
+        for tamanho in (1, 2, 3, 5, 7, 64):
+            reparador = ReparadorJSON()
+            partes = [reparador.alimentar(texto[i:i + tamanho]) for i in range(0, len(texto), tamanho)]
+            partes.append(reparador.finalizar())
+            self.assertEqual("".join(partes), esperado)
+
+    def test_reparar_fluxo_streams_between_files(self):
+        saida = io.StringIO()
+        correcoes = reparar_fluxo(io.StringIO('[{a: 1},]'), saida, tamanho_bloco=3)
+        self.assertEqual(json.loads(saida.getvalue()), [{"a": 1}])
+        self.assertEqual(len(correcoes), 2)
+
+
+class TestRevisarArquivo(unittest.TestCase):
+    def test_repairs_file_after_confirmation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            caminho = os.path.join(tmp, "contatos.json")
+            with open(caminho, "w", encoding="utf-8") as f:
+                f.write('{"contatos": [{nome: "A", "email": "a@x.com",},]}')
+            with mock.patch("json_revisor.perguntar_confirmacao", return_value=True):
+                self.assertTrue(revisar_e_corrigir_json(caminho, aplicar_corrigir=True))
+            with open(caminho, encoding="utf-8") as f:
+                dados = json.load(f)
+            self.assertEqual(dados["contatos"], [{"nome": "A", "email": "a@x.com"}])
+            self.assertIn("versao", dados)
+            self.assertFalse(os.path.exists(caminho + ".reparo.tmp"))
+
+    def test_single_file_cli_honours_backup_directory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            caminho = os.path.join(tmp, "contatos.json")
+            backups = os.path.join(tmp, "backups")
+            with open(caminho, "w", encoding="utf-8") as f:
+                f.write('[{nome: "A",},]')
+            argv = ["json_revisor.py", caminho, "--backups", backups, "--manter", "3"]
+            with mock.patch("sys.argv", argv), mock.patch("json_revisor.perguntar_confirmacao", return_value=True):
+                main()
+            self.assertEqual(len(listar_backups(caminho, backups)), 1)
+            self.assertFalse(os.path.exists(os.path.join(tmp, ".json_backups")))
+
+
+class TestRevisaoEmLote(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        os.makedirs(os.path.join(self.dir, "midia"))
+        self.arquivos = {
+            "valido.json": '{"a": 1}',
+            os.path.join("midia", "quebrado.json"): '[{nome: "A",},]',
+            os.path.join("midia", "perdido.json"): '{"a" "b"}',
+        }
+        for nome, conteudo in self.arquivos.items():
+            with open(os.path.join(self.dir, nome), "w", encoding="utf-8") as f:
+                f.write(conteudo)
+        self.cache = os.path.join(self.dir, "cache.json")
+
+    def _status(self, resultados):
+        return {os.path.relpath(r["arquivo"], self.dir): r["status"] for r in resultados}
+
+    def test_expands_directories_and_globs(self):
+        arquivos = expandir_entradas([self.dir, os.path.join(self.dir, "*.json")])
+        self.assertEqual(sorted(os.path.relpath(a, self.dir) for a in arquivos), sorted(self.arquivos))
+
+    def test_validate_policy_never_writes(self):
+        resultados = revisar_lote(expandir_entradas([self.dir]), politica="validar", processos=2, caminho_cache=None)
+        self.assertEqual(self._status(resultados), {
+            "valido.json": VALIDO,
+            os.path.join("midia", "quebrado.json"): REPARAVEL,
+            os.path.join("midia", "perdido.json"): IRREPARAVEL,
+        })
+        with open(os.path.join(self.dir, "midia", "quebrado.json"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), self.arquivos[os.path.join("midia", "quebrado.json")])
+
+    def test_repairs_in_parallel_and_skips_clean_files_on_next_run(self):
+        arquivos = expandir_entradas([self.dir])
+        primeira = revisar_lote(arquivos, politica="reparar", processos=2, caminho_cache=self.cache)
+        self.assertEqual(self._status(primeira)[os.path.join("midia", "quebrado.json")], CORRIGIDO)
+
+        segunda = revisar_lote(arquivos, politica="reparar", processos=2, caminho_cache=self.cache)
+        status = self._status(segunda)
+        self.assertEqual(status["valido.json"], IGNORADO)
+        self.assertEqual(status[os.path.join("midia", "quebrado.json")], IGNORADO)
+        self.assertEqual(status[os.path.join("midia", "perdido.json")], IRREPARAVEL)
+        self.assertEqual(resumir(segunda)["por_status"], {IGNORADO: 2, IRREPARAVEL: 1})
+
+
+class TestBackups(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.backups = os.path.join(self.dir, "backups")
+        self.arquivo = os.path.join(self.dir, "contatos.json")
+
+    def _escrever(self, conteudo, arquivo=None):
+        with open(arquivo or self.arquivo, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+
+    def _objetos(self):
+        return [os.path.join(raiz, nome)
+                for raiz, _, nomes in os.walk(os.path.join(self.backups, "objetos")) for nome in nomes]
+
+    def test_unchanged_content_is_not_backed_up_again(self):
+        self._escrever('{"a": 1}')
+        primeira = fazer_backup(self.arquivo, diretorio=self.backups)
+        segunda = fazer_backup(self.arquivo, diretorio=self.backups)
+        self.assertEqual(primeira, segunda)
+        self.assertEqual(len(listar_backups(self.arquivo, self.backups)), 1)
+
+    def test_identical_files_share_one_object(self):
+        outro = os.path.join(self.dir, "copia.json")
+        self._escrever('{"a": 1}')
+        self._escrever('{"a": 1}', outro)
+        fazer_backup(self.arquivo, diretorio=self.backups)
+        fazer_backup(outro, diretorio=self.backups)
+        self.assertEqual(len(self._objetos()), 1)
+
+    def test_shared_directory_keeps_same_named_files_apart(self):
+        outro = os.path.join(self.dir, "b", "contatos.json")
+        os.makedirs(os.path.dirname(outro))
+        self._escrever('{"de": "a"}')
+        self._escrever('{"de": "b"}', outro)
+        fazer_backup(self.arquivo, diretorio=self.backups)
+        fazer_backup(outro, diretorio=self.backups)
+        self.assertEqual(len(listar_backups(self.arquivo, self.backups)), 1)
+
+        self._escrever("quebrado")
+        self.assertTrue(restaurar_backup(self.arquivo, 1, self.backups))
+        with open(self.arquivo, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"de": "a"})
+
+    def test_retention_keeps_last_versions_and_removes_objects(self):
+        for i in range(5):
+            self._escrever(json.dumps({"n": i}))
+            fazer_backup(self.arquivo, diretorio=self.backups, manter=2)
+        self.assertEqual([v["versao"] for v in listar_backups(self.arquivo, self.backups)], [4, 5])
+        self.assertEqual(len(self._objetos()), 2)
+
+    def test_restore_rebuilds_any_version(self):
+        for i in range(3):
+            self._escrever(json.dumps({"n": i}))
+            fazer_backup(self.arquivo, diretorio=self.backups)
+        self._escrever("quebrado")
+
+        self.assertTrue(restaurar_backup(self.arquivo, 2, self.backups))
+        with open(self.arquivo, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"n": 1})
+        # O conteúdo substituído também virou uma versão
+        self.assertEqual(len(listar_backups(self.arquivo, self.backups)), 4)
+        self.assertFalse(restaurar_backup(self.arquivo, 99, self.backups))
+
+    def test_restores_oldest_version_when_retention_is_full(self):
+        for i in range(3):
+            self._escrever(json.dumps({"n": i}))
+            fazer_backup(self.arquivo, diretorio=self.backups, manter=3)
+        self._escrever("quebrado")
+
+        self.assertTrue(restaurar_backup(self.arquivo, 1, self.backups, manter=3))
+        with open(self.arquivo, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"n": 0})
+        # O conteúdo substituído entrou e a versão mais antiga saiu pela retenção
+        self.assertEqual([v["versao"] for v in listar_backups(self.arquivo, self.backups)], [2, 3, 4])
+
+    def test_object_collected_by_another_process_is_written_again(self):
+        outro = os.path.join(self.dir, "copia.json")
+        self._escrever('{"a": 1}')
+        self._escrever('{"a": 1}', outro)
+        fazer_backup(self.arquivo, diretorio=self.backups)
+        [objeto] = self._objetos()
+        travar = json_revisor._travar_backups
+
+        def coleta_concorrente(diretorio):
+            # Outro processo coleta o objeto depois da verificação e antes da trava
+            os.remove(objeto)
+            return travar(diretorio)
+
+        with mock.patch("json_revisor._travar_backups", side_effect=coleta_concorrente):
+            versao = fazer_backup(outro, diretorio=self.backups)
+        self.assertTrue(os.path.exists(os.path.join(self.backups, versao["objeto"])))
+        self.assertFalse(os.path.exists(os.path.join(self.backups, ".trava")))
+
+    def test_stale_lock_is_discarded(self):
+        os.makedirs(self.backups)
+        trava = os.path.join(self.backups, ".trava")
+        open(trava, "w").close()
+        os.utime(trava, (0, 0))
+        self._escrever('{"a": 1}')
+        self.assertIsNotNone(fazer_backup(self.arquivo, diretorio=self.backups))
+        self.assertFalse(os.path.exists(trava))
+
+    def test_revision_backs_up_into_hidden_directory(self):
+        self._escrever('[{nome: "A",},]')
+        resultados = revisar_lote([self.arquivo], politica="reparar", processos=1, caminho_cache=None)
+        self.assertEqual(resultados[0]["status"], CORRIGIDO)
+        versoes = listar_backups(self.arquivo)
+        self.assertEqual(len(versoes), 1)
+        self.assertTrue(restaurar_backup(self.arquivo))
+        with open(self.arquivo, encoding="utf-8") as f:
+            self.assertEqual(f.read(), '[{nome: "A",},]')
+        self.assertEqual(expandir_entradas([self.dir]), [self.arquivo])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+"""
+validation.py
+
+Estágio de validação de e-mails separado do laço de envio: valida o fluxo de
+contatos em paralelo, memoiza a verificação de MX/DNS por domínio (LRU com
+TTL) e mantém em disco um cache de endereços sabidamente bons e ruins entre
+execuções.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Optional, Tuple
+
+from email_validator import EmailNotValidError, validate_email
+from email_validator.deliverability import validate_email_deliverability
+
+# (domínio ASCII, domínio i18n) -> levanta EmailNotValidError se não entregável
+DomainResolver = Callable[[str, str], Any]
+
+Result = Tuple[bool, Optional[str]]
+
+
+class DomainCache:
+    """LRU com TTL para o resultado da verificação de entregabilidade por domínio.
+
+    Consultas simultâneas ao mesmo domínio compartilham uma única resolução.
+    """
+
+    def __init__(
+        self,
+        resolver: DomainResolver,
+        max_size: int = 10000,
+        ttl: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.resolver = resolver
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def check(self, domain: str, domain_i18n: str) -> Optional[str]:
+        """Devolve None se o domínio aceita e-mail, ou o motivo da recusa."""
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is not None and self._clock() - entry[0] < self.ttl:
+                self._entries.move_to_end(domain)
+                self.hits += 1
+                return entry[1]
+            future = self._in_flight.get(domain)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[domain] = future
+                self.lookups += 1
+            else:
+                self.hits += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            self.resolver(domain, domain_i18n)
+            reason: Optional[str] = None
+        except EmailNotValidError as e:
+            reason = str(e)
+        except Exception as e:
+            # Falha inesperada de resolução não é cacheada como recusa
+            with self._lock:
+                del self._in_flight[domain]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._entries[domain] = (self._clock(), reason)
+            self._entries.move_to_end(domain)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            del self._in_flight[domain]
+        future.set_result(reason)
+        return reason
+
+
+class AddressCache:
+    """Cache persistente (JSON) de endereços já validados: {endereço: [ok, motivo, timestamp]}.
+
+    Sem ``path`` nada é guardado: a memória não cresce com o número de contatos
+    e a repetição de domínios continua coberta pelo ``DomainCache``.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 30 * 24 * 3600) -> None:
+        self.path = path
+        self.ttl = ttl
+        self._entries: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning("Cache de validação ignorado (%s): %s", path, e)
+
+    def get(self, address: str) -> Optional[Result]:
+        entry = self._entries.get(address.casefold())
+        if entry is None or time.time() - entry[2] > self.ttl:
+            return None
+        return entry[0], entry[1]
+
+    def put(self, address: str, result: Result) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            self._entries[address.casefold()] = [result[0], result[1], time.time()]
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as e:
+                logging.warning("Não foi possível salvar o cache de validação: %s", e)
+
+
+def default_resolver(domain: str, domain_i18n: str) -> Any:
+    return validate_email_deliverability(domain, domain_i18n)
+
+
+class EmailValidationStage:
+    def __init__(
+        self,
+        check_deliverability: bool = True,
+        workers: int = 8,
+        domain_cache_size: int = 10000,
+        domain_ttl: float = 3600.0,
+        cache_path: Optional[str] = None,
+        resolver: Optional[DomainResolver] = None
+    ) -> None:
+        self.check_deliverability = check_deliverability
+        self.workers = max(1, workers)
+        self.domains = DomainCache(resolver or default_resolver, domain_cache_size, domain_ttl)
+        self.addresses = AddressCache(cache_path)
+        self.validated = 0
+        self.address_hits = 0
+
+    def validate(self, email: str) -> Result:
+        cached = self.addresses.get(email)
+        if cached is not None:
+            self.address_hits += 1
+            return cached
+
+        self.validated += 1
+        try:
+            info = validate_email(email, check_deliverability=False)
+            reason = None
+            if self.check_deliverability:
+                reason = self.domains.check(info.ascii_domain, info.domain)
+            result: Result = (reason is None, reason)
+        except EmailNotValidError as e:
+            result = (False, str(e))
+        except Exception as e:
+            # Erro inesperado de DNS invalida só este contato e não entra no cache
+            logging.error("Falha ao verificar o domínio de %s: %s", email, e)
+            return False, f"falha na verificação do domínio: {e}"
+        self.addresses.put(email, result)
+        return result
+
+    def _validate_contact(self, contact: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        email = contact.get('email')
+        if not email:
+            # Contatos malformados seguem adiante para serem relatados pelo envio
+            return contact, False
+        ok, reason = self.validate(email)
+        if not ok:
+            logging.warning("Email inválido: %s - %s", email, reason)
+        return contact, ok
+
+    def run(self, contacts: Iterable[Dict[str, Any]]) -> Iterator[Tuple[Dict[str, Any], bool]]:
+        """Valida à frente do consumidor, em paralelo, preservando a ordem dos contatos."""
+        if self.workers == 1:
+            for contact in contacts:
+                yield self._validate_contact(contact)
+            return
+
+        window: Deque[Future] = deque()
+        max_window = self.workers * 4
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="email-validation") as executor:
+            for contact in contacts:
+                window.append(executor.submit(self._validate_contact, contact))
+                if len(window) >= max_window:
+                    yield window.popleft().result()
+            while window:
+                yield window.popleft().result()
+
+    def save(self) -> None:
+        self.addresses.save()